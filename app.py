@@ -1,8 +1,17 @@
 import os
 import logging
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from quart import Quart, jsonify, Response, request
+from quart_cors import cors
 from config import Config
+from database.mongodb import db
+from database.cache import shared_cache
+from database.admin_sets import admin_sets
+from bypasser.telemetry import event_recorder
+from bypasser.scoreboard import strategy_scoreboard
+from bypasser.http import browser_pool
+from bypasser.jobs import job_worker
+from monitoring.metrics import loop_monitor, render_metrics
+from monitoring.watchdog import loop_watchdog, label_task
 from web.routes import setup_routes
 
 # Configure logging
@@ -13,46 +22,89 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app
-app = Flask(__name__)
+# Initialize Quart app (ASGI, one long-lived event loop per worker)
+app = Quart(__name__)
 app.config['SECRET_KEY'] = Config.FLASK_SECRET_KEY
-CORS(app)
+# main.py serves the app next to the bot and owns the shared services there
+app.config['MANAGE_SERVICES'] = True
+app = cors(app)
 
 # Setup routes
 setup_routes(app)
 
+@app.before_serving
+async def startup():
+    """Connect the clients shared by every request of this worker and start the job worker"""
+    if not app.config['MANAGE_SERVICES']:
+        return
+    await shared_cache.connect()
+    await db.connect(create_indexes=False)
+    await admin_sets.start(db)
+    await event_recorder.start(db)
+    await strategy_scoreboard.start(db)
+    await job_worker.start(db)
+    await loop_monitor.start()
+    await loop_watchdog.start()
+
+@app.after_serving
+async def shutdown():
+    """Flush pending writes and release pools"""
+    if not app.config['MANAGE_SERVICES']:
+        return
+    await loop_watchdog.stop()
+    await loop_monitor.stop()
+    await job_worker.stop()
+    await strategy_scoreboard.stop()
+    await event_recorder.stop()
+    await admin_sets.stop()
+    await browser_pool.close()
+    await db.close()
+    await shared_cache.close()
+
+@app.before_request
+async def label_request():
+    """Name the request in event loop stall reports"""
+    label_task(handler=f"web:{request.endpoint}")
+
 # Health check endpoint
 @app.route('/')
-def index():
+async def index():
     return jsonify({
         'status': 'online',
         'service': 'Link Bypasser Bot',
         'version': '2.0.0',
         'endpoints': {
             'health': '/health',
-            'webhook': '/webhook',
+            'docs': '/docs',
+            'metrics': '/metrics',
             'api': '/api/bypass'
         }
     }), 200
 
 @app.route('/health')
-def health():
+async def health():
     """Health check endpoint for monitoring"""
     return jsonify({
         'status': 'healthy',
         'timestamp': os.environ.get('HEROKU_RELEASE_CREATED_AT', 'N/A')
     }), 200
 
+@app.route('/metrics')
+async def metrics():
+    """Prometheus metrics of this process"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 @app.errorhandler(404)
-def not_found(error):
+async def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
 @app.errorhandler(500)
-def internal_error(error):
+async def internal_error(error):
     logger.error(f"Internal error: {error}")
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
     port = Config.PORT
-    logger.info(f"Starting Flask server on port {port}")
+    logger.info(f"Starting Quart server on port {port}")
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,117 @@
+"""Cost of each stage of base64 link scanning
+
+Runs the old scan (every [A-Za-z0-9+/]{20,} run decoded) and the bounded one
+(prefix-anchored candidates, length cap, dedup, decode) over the recorded
+fixtures and two synthetic pages: one with a large inline image and script
+bundle, one with repeated, URL-safe and double-encoded links.
+
+    python benchmarks/base64_bench.py
+    python benchmarks/base64_bench.py -n 20 --only inline
+"""
+import os
+import re
+import sys
+import time
+import base64
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bypasser.patterns import BASE64_URL, BASE64_TWICE_URL, MAX_BASE64_CANDIDATE, decode_base64_link, is_direct_link
+from extraction_bench import load_manifest, load_body
+
+OLD_PATTERN = re.compile(r'[A-Za-z0-9+/]{20,}={0,2}')
+
+def synthetic_pages():
+    rng = random.Random(1)
+    image = base64.b64encode(rng.randbytes(1024 * 1024)).decode()
+    bundle = base64.b64encode(rng.randbytes(256 * 1024)).decode()
+    tokens = " ".join(base64.b64encode(rng.randbytes(rng.randrange(16, 64))).decode() for _ in range(2000))
+    inline = (
+        f'<html><body><img src="data:image/png;base64,{image}">'
+        f'<script>var b="{bundle}";</script><p>{tokens}</p>'
+        f'<a data-x="{base64.b64encode(b"https://cdn.example/get/inline.zip").decode()}">x</a></body></html>'
+    )
+
+    link = b"https://files.example/get/Report-2024.pdf?token=~~??"
+    encoded = [
+        base64.b64encode(link).decode(),
+        base64.urlsafe_b64encode(link).decode().rstrip('='),
+        base64.b64encode(base64.b64encode(link)).decode(),
+        base64.b64encode(b"https://example.com/about").decode(),
+    ]
+    links = "<html><body>" + "".join(f'<span data-k="{encoded[i % len(encoded)]}"></span>' for i in range(400)) + "</body></html>"
+    return [("synthetic_inline_assets", inline), ("synthetic_encoded_links", links)]
+
+def timed(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = func()
+    return result, (time.perf_counter() - started) * 1000 / iterations
+
+def old_scan(html):
+    return OLD_PATTERN.findall(html)
+
+def old_decode(candidates):
+    links = []
+    for candidate in candidates:
+        try:
+            decoded = base64.b64decode(candidate).decode('utf-8', errors='ignore')
+        except Exception:
+            continue
+        if is_direct_link(decoded):
+            links.append(decoded)
+    return links
+
+def new_scan(html):
+    return [(m.start(), m.end()) for pattern in (BASE64_URL, BASE64_TWICE_URL) for m in pattern.finditer(html)]
+
+def decode_all(candidates):
+    decode_base64_link.cache_clear()
+    return [link for link in map(decode_base64_link, candidates) if link]
+
+def bench_page(name, html, iterations):
+    old_candidates, old_scan_ms = timed(lambda: old_scan(html), iterations)
+    old_links, old_decode_ms = timed(lambda: old_decode(old_candidates), iterations)
+
+    spans, scan_ms = timed(lambda: new_scan(html), iterations)
+    bounded = [html[start:end] for start, end in spans if end - start <= MAX_BASE64_CANDIDATE]
+    unique = list(dict.fromkeys(bounded))
+    links, decode_ms = timed(lambda: decode_all(unique), iterations)
+
+    return {
+        "name": name,
+        "kb": len(html) // 1024,
+        "old": (len(old_candidates), old_scan_ms, old_decode_ms, len(old_links)),
+        "new": (len(spans), len(bounded), len(unique), scan_ms, decode_ms, len(links)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=5)
+    parser.add_argument("--only", help="Only pages whose name contains this")
+    args = parser.parse_args()
+
+    pages = [(f["name"], load_body(f).decode("utf-8", errors="replace")) for f in load_manifest() if f.get("file")]
+    pages += synthetic_pages()
+    if args.only:
+        pages = [(name, html) for name, html in pages if args.only in name]
+
+    print(f"{'page':26} {'KB':>6} | {'old: runs':>9} {'scan ms':>8} {'decode ms':>9} {'links':>5} | "
+          f"{'prefixed':>8} {'capped':>6} {'unique':>6} {'scan ms':>8} {'decode ms':>9} {'links':>5}")
+    totals = [0.0, 0.0, 0.0, 0.0]
+    for name, html in pages:
+        r = bench_page(name, html, args.iterations)
+        runs, old_scan_ms, old_decode_ms, old_links = r["old"]
+        prefixed, capped, unique, scan_ms, decode_ms, links = r["new"]
+        totals = [totals[0] + old_scan_ms, totals[1] + old_decode_ms, totals[2] + scan_ms, totals[3] + decode_ms]
+        print(f"{name:26} {r['kb']:6} | {runs:9} {old_scan_ms:8.2f} {old_decode_ms:9.2f} {old_links:5} | "
+              f"{prefixed:8} {capped:6} {unique:6} {scan_ms:8.2f} {decode_ms:9.2f} {links:5}")
+
+    print(f"\nOld total:     {totals[0] + totals[1]:.2f} ms per pass (scan {totals[0]:.2f}, decode {totals[1]:.2f})")
+    print(f"Bounded total: {totals[2] + totals[3]:.2f} ms per pass (scan {totals[2]:.2f}, decode {totals[3]:.2f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Load test for the bot's message handlers
+
+Feeds bursts of synthetic Pyrogram updates straight into the handlers
+(handle_url -> process_bypass for private chats, handle_group_url for groups)
+with a fake Telegram client, so no bot token or network is needed. Fresh
+bypasses hit the local stub origin from extraction_bench.py; MongoDB is
+mongomock unless --mongo-uri points at a real (throwaway) database:
+
+    python benchmarks/bot_load.py -n 2000 -c 100
+    python benchmarks/bot_load.py -n 5000 -c 500 --hit-ratio 0.9 --group-ratio 0.5
+    python benchmarks/bot_load.py --storm-ratio 0.5 --mongo-uri mongodb://localhost:27017
+
+Reports p50/p99 handler latency by update kind, MongoDB operations per update
+and peak memory.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyrogram.enums import ChatType
+from pyrogram.types import Chat, Message, User
+from config import Config
+from extraction_bench import StubServer, load_manifest
+
+# Operations counted as one round trip each
+DB_METHODS = {
+    "find", "find_one", "find_one_and_update", "insert_one", "insert_many",
+    "update_one", "update_many", "delete_one", "delete_many", "count_documents",
+    "aggregate", "bulk_write", "distinct"
+}
+
+class CountingCollection:
+    """Collection proxy counting operations by collection and method"""
+
+    def __init__(self, collection, counts: Counter):
+        self._collection = collection
+        self._counts = counts
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in DB_METHODS:
+            def counted(*args, **kwargs):
+                self._counts[f"{self._collection.name}.{name}"] += 1
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+class FakeTelegram:
+    """Stands in for pyrogram.Client; every API call takes ``latency`` seconds"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self._ids = iter(range(10**9, 2 * 10**9))
+
+    async def _call(self, method: str):
+        self.calls[method] += 1
+        await asyncio.sleep(self.latency)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call("send_message")
+        return Message(id=next(self._ids), chat=Chat(id=chat_id, type=ChatType.PRIVATE), text=text, client=self)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self._call("edit_message_text")
+        return Message(id=message_id, chat=Chat(id=chat_id, type=ChatType.PRIVATE), text=text, client=self)
+
+    async def get_chat_member(self, chat_id, user_id):
+        await self._call("get_chat_member")
+        from pyrogram.enums import ChatMemberStatus
+        from pyrogram.types import ChatMember
+        return ChatMember(status=ChatMemberStatus.MEMBER, user=User(id=user_id), client=self)
+
+def build_workload(args, origin):
+    """(kind, chat type, user id, text) for every update, in arrival order"""
+    pages = [f["path"] for f in load_manifest() if f.get("extractor") in ("extract_direct_link", "generic_bypass", "bypass_shortener")]
+    storm_url = f"{origin}{pages[0]}?storm=1"
+    rng = random.Random(args.seed)
+
+    updates = []
+    for index in range(args.updates):
+        group = rng.random() < args.group_ratio
+        roll = rng.random()
+        if roll < args.storm_ratio:
+            kind, url = "storm", storm_url
+        elif roll < args.storm_ratio + args.hit_ratio:
+            kind, url = "hit", f"{origin}{rng.choice(pages)}?hot={rng.randrange(args.hot_links)}"
+        else:
+            kind, url = "miss", f"{origin}{rng.choice(pages)}?n={index}"
+        user_id = 100000 + rng.randrange(args.users)
+        updates.append((kind, ChatType.SUPERGROUP if group else ChatType.PRIVATE, user_id, f"check this {url}"))
+    return updates, pages
+
+async def run(args):
+    from database.mongodb import db
+    from database.cache import shared_cache
+    from database.admin_sets import admin_sets
+    from bypasser.telemetry import event_recorder
+    from bot.handlers import bypass as handlers
+    from bypasser.service import bypass_service
+
+    if not args.mongo_uri:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("Install mongomock-motor or pass --mongo-uri")
+        import database.mongodb as mongodb
+        mongodb.AsyncIOMotorClient = lambda uri, **kwargs: AsyncMongoMockClient()
+    else:
+        Config.MONGODB_URI = args.mongo_uri
+    Config.DATABASE_NAME = args.database
+
+    await shared_cache.connect()
+    await db.connect()
+    await admin_sets.start(db)
+    await event_recorder.start(db)
+
+    counts = Counter()
+    for name, value in list(vars(db).items()):
+        if name not in ("client", "db") and value is not None:
+            setattr(db, name, CountingCollection(value, counts))
+
+    telegram = FakeTelegram(args.telegram_latency / 1000)
+    latencies = {}
+    peak = 0
+
+    with StubServer(load_manifest()) as stub:
+        updates, pages = build_workload(args, stub.origin)
+        # Route the stub host through the universal extractors
+        bypass_service.bypasser.supported_sites["benchmark"] = ["127.0.0.1"]
+
+        # Hot links are already in the link cache before the burst
+        for page in pages:
+            for hot in range(args.hot_links):
+                await db.save_bypass_result(f"{stub.origin}{page}?hot={hot}", f"{stub.alt_origin}/files/{hot}.zip", "benchmark")
+        if Config.WORK_IN_GROUPS_ONLY:
+            await db.add_allowed_group(-100123, "benchmark", 0)
+        counts.clear()
+
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def feed(index, kind, chat_type, user_id, text):
+            group = chat_type != ChatType.PRIVATE
+            message = Message(
+                id=index + 1,
+                chat=Chat(id=-100123 if group else user_id, type=chat_type),
+                from_user=User(id=user_id, first_name=f"user{user_id}", is_bot=False),
+                date=datetime.utcnow(),
+                text=text,
+                client=telegram
+            )
+            handler = handlers.handle_group_url if group else handlers.handle_url
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    await handler(telegram, message)
+                except Exception as e:
+                    logging.getLogger(__name__).error(f"Handler error: {e}")
+                latencies.setdefault(f"{'group' if group else 'private'}/{kind}", []).append(
+                    (time.perf_counter() - started) * 1000
+                )
+
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(feed(i, *update) for i, update in enumerate(updates)))
+        elapsed = time.perf_counter() - started
+        if args.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    await event_recorder.stop()
+    await admin_sets.stop()
+    await db.close()
+    await shared_cache.close()
+
+    report(args, latencies, counts, telegram, elapsed, peak)
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+def report(args, latencies, counts, telegram, elapsed, peak):
+    total = sum(len(values) for values in latencies.values())
+    everything = [value for values in latencies.values() for value in values]
+
+    print(f"Updates:      {total} in {elapsed:.2f}s ({total / elapsed:.1f}/s) at concurrency {args.concurrency}")
+    print(f"{'kind':18} {'count':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for kind in sorted(latencies):
+        values = latencies[kind]
+        print(f"{kind:18} {len(values):7} {percentile(values, 0.50):9.1f} {percentile(values, 0.99):9.1f}")
+    print(f"{'all':18} {total:7} {percentile(everything, 0.50):9.1f} {percentile(everything, 0.99):9.1f}")
+
+    print(f"\nDB ops/update: {sum(counts.values()) / max(total, 1):.2f}")
+    for name, count in counts.most_common(8):
+        print(f"  {name:40} {count / max(total, 1):6.2f}")
+    print(f"Telegram calls/update: {sum(telegram.calls.values()) / max(total, 1):.2f} {dict(telegram.calls)}")
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"\nPeak RSS:     {maxrss / 1024:.1f} MB")
+    if peak:
+        print(f"Peak traced:  {peak / 1024 / 1024:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--updates", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=50, help="Updates handled at once")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--group-ratio", type=float, default=0.3, help="Share of updates from groups")
+    parser.add_argument("--hit-ratio", type=float, default=0.6, help="Share of updates with a cached link")
+    parser.add_argument("--storm-ratio", type=float, default=0.1, help="Share of updates with the same uncached link")
+    parser.add_argument("--hot-links", type=int, default=20, help="Cached links per fixture page")
+    parser.add_argument("--telegram-latency", type=float, default=30, help="Milliseconds per Telegram API call")
+    parser.add_argument("--mongo-uri", help="Real MongoDB instead of mongomock")
+    parser.add_argument("--database", default="bot_load_test")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report tracemalloc peak (slower)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    # Measure handler cost, not the daily quota or log channel
+    Config.FREE_USER_LIMIT = 10**9
+    Config.LOG_CHANNEL = ""
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
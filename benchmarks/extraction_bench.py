@@ -0,0 +1,288 @@
+"""Offline benchmark for the extraction engine
+
+Replays the recorded pages in benchmarks/fixtures (gzip HTML plus manifest.json)
+from a local stub HTTP server through the extractors, and reports throughput,
+process CPU time (pages are parsed on executor threads), peak allocations and
+whether each extractor still returns the expected link:
+
+    python benchmarks/extraction_bench.py
+    python benchmarks/extraction_bench.py -n 50 --only gdtot --save before.json
+    python benchmarks/extraction_bench.py --compare before.json --tolerance 0.25
+
+With --compare the exit status is 1 when a fixture stops matching its expected
+link or its CPU time grows by more than the tolerance.
+
+Record a new fixture from a live page (the expected link is checked later):
+
+    python benchmarks/extraction_bench.py --record https://example.com/page \\
+        --name example_page --kind generic --extractor extract_direct_link \\
+        --expected https://cdn.example.com/file.zip
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import logging
+import argparse
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bypasser.sites import universal
+from bypasser.cloudflare import CloudflareBypasser
+from bypasser.http import BROWSER_USER_AGENT
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST = os.path.join(FIXTURES_DIR, "manifest.json")
+
+def load_manifest():
+    with open(MANIFEST) as f:
+        return json.load(f)["fixtures"]
+
+def load_body(fixture):
+    if not fixture.get("file"):
+        return b""
+    with gzip.open(os.path.join(FIXTURES_DIR, fixture["file"]), "rb") as f:
+        return f.read()
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Extractors stop reading early on purpose (early stop, byte cap)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class StubServer:
+    """Serves the fixtures on 127.0.0.1; ``localhost`` on the same port acts as a second host"""
+
+    def __init__(self, fixtures):
+        self.routes = {}
+        for fixture in fixtures:
+            self.routes[fixture["path"]] = (fixture.get("status", 200), fixture.get("headers", {}), load_body(fixture))
+        self.server = QuietServer(("127.0.0.1", 0), self._handler())
+        self.origin = f"http://127.0.0.1:{self.server.server_port}"
+        self.alt_origin = f"http://localhost:{self.server.server_port}"
+
+    def expand(self, value):
+        if value is None:
+            return None
+        return value.replace("{origin}", self.origin).replace("{alt_origin}", self.alt_origin)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self):
+                status, headers, body = stub.routes.get(urlsplit(self.path).path, (404, {}, b"<html>Not found</html>"))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, stub.expand(value))
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve()
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                self._serve()
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def make_runner(fixture, url, body):
+    """Coroutine factory calling the fixture's extractor, returning the link or None"""
+    extractor = fixture["extractor"]
+
+    if extractor == "extract_direct_link":
+        async def run():
+            result = await universal.extract_direct_link(url)
+            return result.get("bypassed_url") if result["success"] else None
+    elif extractor == "generic_bypass":
+        async def run():
+            result = await universal.generic_bypass(url)
+            return result.get("bypassed_url") if result["success"] else None
+    elif extractor == "bypass_shortener":
+        async def run():
+            result = await universal.bypass_shortener(url, fixture.get("site_type", "shortener"))
+            return result.get("bypassed_url") if result["success"] else None
+    elif extractor == "cloudflare_extract_link":
+        cloudflare = CloudflareBypasser()
+        html = body.decode("utf-8", errors="replace")
+
+        async def run():
+            return cloudflare._extract_link(html, url)
+    else:
+        raise ValueError(f"Unknown extractor: {extractor}")
+    return run
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+async def bench_fixture(stub, fixture, iterations):
+    url = stub.origin + fixture["path"]
+    run = make_runner(fixture, url, load_body(fixture))
+    expected = stub.expand(fixture.get("expected"))
+
+    # Warm up imports, connection pools and regex caches
+    got = await run()
+
+    wall, cpu = [], []
+    for _ in range(iterations):
+        started_wall, started_cpu = time.perf_counter(), time.process_time()
+        await run()
+        cpu.append((time.process_time() - started_cpu) * 1000)
+        wall.append((time.perf_counter() - started_wall) * 1000)
+
+    # Allocations in a separate pass; tracing slows everything down
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    await run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": fixture["name"],
+        "kind": fixture["kind"],
+        "extractor": fixture["extractor"],
+        "correct": got == expected,
+        "got": got,
+        "expected": expected,
+        "wall_p50_ms": round(percentile(wall, 0.50), 3),
+        "wall_p99_ms": round(percentile(wall, 0.99), 3),
+        "cpu_ms": round(sum(cpu) / len(cpu), 3),
+        "peak_kb": round(peak / 1024, 1),
+        "per_second": round(len(wall) / (sum(wall) / 1000), 1) if sum(wall) else 0.0
+    }
+
+def print_report(results, elapsed, calls):
+    print(f"{'fixture':28} {'extractor':24} {'ok':>3} {'p50 ms':>8} {'p99 ms':>8} {'cpu ms':>8} {'peak KB':>9} {'/s':>8}")
+    for r in results:
+        print(f"{r['name']:28} {r['extractor']:24} {'yes' if r['correct'] else 'NO':>3} "
+              f"{r['wall_p50_ms']:8.2f} {r['wall_p99_ms']:8.2f} {r['cpu_ms']:8.2f} {r['peak_kb']:9.1f} {r['per_second']:8.1f}")
+
+    by_extractor = {}
+    for r in results:
+        by_extractor.setdefault(r["extractor"], []).append(r["cpu_ms"])
+    print("\nCPU per call by extractor:")
+    for name, values in sorted(by_extractor.items()):
+        print(f"  {name:24} {sum(values) / len(values):8.2f} ms over {len(values)} fixtures")
+
+    wrong = [r for r in results if not r["correct"]]
+    print(f"\nCorrect:    {len(results) - len(wrong)}/{len(results)}")
+    print(f"Throughput: {calls / elapsed:.1f} extractions/s overall")
+    for r in wrong:
+        print(f"  {r['name']}: expected {r['expected']!r}, got {r['got']!r}")
+
+def compare(results, baseline_path, tolerance):
+    """Regressions against a saved run: lost correctness or slower CPU"""
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in results:
+        before = baseline.get(r["name"])
+        if not before:
+            continue
+        if before["correct"] and not r["correct"]:
+            regressions.append(f"{r['name']}: no longer returns the expected link")
+        if before["cpu_ms"] > 0 and r["cpu_ms"] > before["cpu_ms"] * (1 + tolerance):
+            regressions.append(f"{r['name']}: CPU {before['cpu_ms']:.2f} -> {r['cpu_ms']:.2f} ms")
+    return regressions
+
+def record(args):
+    """Fetch a live page and store it as a fixture"""
+    import requests
+
+    response = requests.get(args.record, headers={"User-Agent": BROWSER_USER_AGENT}, timeout=30)
+    path = urlsplit(response.url).path or "/"
+    fixture = {
+        "name": args.name,
+        "kind": args.kind,
+        "extractor": args.extractor,
+        "path": f"/recorded/{args.name}{path}",
+        "status": 200,
+        "expected": args.expected,
+        "file": f"{args.name}.html.gz"
+    }
+    with gzip.open(os.path.join(FIXTURES_DIR, fixture["file"]), "wb", compresslevel=9) as f:
+        f.write(response.content)
+
+    fixtures = [f for f in load_manifest() if f["name"] != args.name] + [fixture]
+    with open(MANIFEST, "w") as f:
+        json.dump({"fixtures": fixtures}, f, indent=2)
+        f.write("\n")
+    print(f"Recorded {args.record} as {fixture['file']} ({len(response.content)} bytes)")
+
+async def run(args):
+    fixtures = [f for f in load_manifest() if f.get("extractor")]
+    if args.only:
+        fixtures = [f for f in fixtures if args.only in (f["kind"], f["extractor"], f["name"])]
+
+    results = []
+    with StubServer(load_manifest()) as stub:
+        started = time.perf_counter()
+        for fixture in fixtures:
+            results.append(await bench_fixture(stub, fixture, args.iterations))
+        elapsed = time.perf_counter() - started
+
+    print_report(results, elapsed, len(results) * (args.iterations + 2))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"iterations": args.iterations, "results": results}, f, indent=2)
+        print(f"\nSaved to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    parser.add_argument("--only", help="Only fixtures of this kind, extractor or name")
+    parser.add_argument("--save", help="Write results as JSON")
+    parser.add_argument("--compare", help="Baseline JSON from --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed CPU growth, 0.25 = 25%%")
+    parser.add_argument("--record", metavar="URL", help="Record a live page as a new fixture")
+    parser.add_argument("--name")
+    parser.add_argument("--kind", default="generic")
+    parser.add_argument("--extractor", default="extract_direct_link")
+    parser.add_argument("--expected")
+    args = parser.parse_args()
+
+    # Extractor failures are expected on some fixtures; keep the report readable
+    logging.basicConfig(level=logging.CRITICAL)
+
+    if args.record:
+        if not args.name:
+            parser.error("--record needs --name")
+        record(args)
+        return
+
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""HTTP load test for the web API
+
+Sends requests with fixed concurrency and reports requests per second and
+latency percentiles, so a deployment can be compared before and after a change:
+
+    python benchmarks/load_test.py http://localhost:5000/health -c 50 -n 2000
+    python benchmarks/load_test.py http://localhost:5000/api/bypass -c 20 -n 500 \\
+        --json '{"url": "https://example.com/cached-link"}' -H "X-API-Key: nb_..."
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+async def run(url, concurrency, total, method, payload, timeout, headers=None):
+    latencies = []
+    statuses = {}
+    errors = 0
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(timeout=timeout, headers=headers, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            for _ in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, json=payload)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"URL:          {method} {url}")
+    print(f"Concurrency:  {concurrency}")
+    print(f"Requests:     {total} in {elapsed:.2f}s ({errors} errors)")
+    print(f"Throughput:   {len(latencies) / elapsed:.1f} req/s")
+    print(f"Latency p50:  {percentile(latencies, 0.50):.1f} ms")
+    print(f"Latency p95:  {percentile(latencies, 0.95):.1f} ms")
+    print(f"Latency p99:  {percentile(latencies, 0.99):.1f} ms")
+    print(f"Status codes: {dict(sorted(statuses.items()))}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("--json", help="JSON body; the method defaults to POST when given")
+    parser.add_argument("--method")
+    parser.add_argument("-H", "--header", action="append", default=[], help="Extra header as 'Name: value'")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    payload = json.loads(args.json) if args.json else None
+    method = args.method or ("POST" if payload is not None else "GET")
+    headers = dict(header.split(":", 1) for header in args.header)
+    headers = {name.strip(): value.strip() for name, value in headers.items()}
+    asyncio.run(run(args.url, args.concurrency, args.requests, method, payload, args.timeout, headers))
+
+if __name__ == "__main__":
+    main()
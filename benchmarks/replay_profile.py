@@ -0,0 +1,104 @@
+"""Benchmark or profile a site handler against a recorded HTTP cassette
+
+Record once with network access, either by running the bot with
+HTTP_TRANSPORT_MODE=record, or with this script:
+
+    python benchmarks/replay_profile.py record cassettes/gdtot.jsonl gdtot \\
+        https://new.gdtot.example/file/123 --crypt <crypt>
+
+Then replay offline, as often as needed, with optional per-request latency:
+
+    python benchmarks/replay_profile.py replay cassettes/gdtot.jsonl gdtot \\
+        https://new.gdtot.example/file/123 --crypt x -n 200 --latency 40 --profile
+
+Handlers: gdtot, sharerw, terabox, uptobox, shortener, generic, direct.
+"""
+import os
+import sys
+import time
+import asyncio
+import cProfile
+import pstats
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+def handler_for(args):
+    """Coroutine factory for the chosen site handler"""
+    from bypasser.sites import gdtot, sharerw, universal
+
+    handlers = {
+        "gdtot": lambda: gdtot.bypass(args.url, args.crypt or ""),
+        "sharerw": lambda: sharerw.bypass(args.url, args.xsrf_token or "", args.laravel_session or ""),
+        "terabox": lambda: universal.bypass_terabox(args.url, args.cookie),
+        "uptobox": lambda: universal.bypass_uptobox(args.url, args.token),
+        "shortener": lambda: universal.bypass_shortener(args.url, "shortener"),
+        "generic": lambda: universal.generic_bypass(args.url),
+        "direct": lambda: universal.extract_direct_link(args.url),
+    }
+    return handlers[args.handler]
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+async def run(args):
+    call = handler_for(args)
+
+    if args.mode == "record":
+        result = await call()
+        print(f"Recorded into {Config.HTTP_CASSETTE}: {result}")
+        return
+
+    first = await call()
+    print(f"Result: {first}")
+
+    profiler = cProfile.Profile() if args.profile else None
+    latencies = []
+    if profiler:
+        profiler.enable()
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    if profiler:
+        profiler.disable()
+
+    total = sum(latencies) / 1000
+    print(f"Iterations:   {args.iterations} in {total:.2f}s ({args.iterations / total:.1f}/s)")
+    print(f"Latency p50:  {percentile(latencies, 0.50):.2f} ms")
+    print(f"Latency p99:  {percentile(latencies, 0.99):.2f} ms")
+    if profiler:
+        pstats.Stats(profiler).sort_stats(args.sort).print_stats(args.top)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("cassette")
+    parser.add_argument("handler", choices=["gdtot", "sharerw", "terabox", "uptobox", "shortener", "generic", "direct"])
+    parser.add_argument("url")
+    parser.add_argument("-n", "--iterations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds added to each replayed request")
+    parser.add_argument("--profile", action="store_true", help="Print cProfile stats of the replayed runs")
+    parser.add_argument("--sort", default="cumulative")
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--crypt")
+    parser.add_argument("--xsrf-token")
+    parser.add_argument("--laravel-session")
+    parser.add_argument("--cookie")
+    parser.add_argument("--token")
+    args = parser.parse_args()
+
+    # The transport is chosen when bypasser.http is imported
+    Config.HTTP_TRANSPORT_MODE = args.mode
+    Config.HTTP_CASSETTE = args.cassette
+    Config.HTTP_REPLAY_LATENCY = args.latency
+    if args.mode == "record" and os.path.exists(args.cassette):
+        os.remove(args.cassette)
+
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,10 @@ from database.mongodb import db
 from bot.utils.keyboards import Keyboards
 from bot.utils.helpers import (
     parse_duration, format_duration, format_bot_stats,
-    parse_command_args, get_domain
+    format_domain_stats, parse_command_args, get_domain
 )
 from bot.middlewares.auth import admin_only
+from monitoring.metrics import record_flood_wait
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +115,65 @@ Use /reset command to use this key.
             f"**By:** {message.from_user.first_name} (`{message.from_user.id}`)"
         )
 
+# Generate API Key Command
+@Client.on_message(filters.command("generate_apikey") & filters.private)
+@admin_only
+async def generate_apikey_command(client: Client, message: Message):
+    """Generate a web API key for a user"""
+    args = parse_command_args(message.text)
+    
+    if not args:
+        await message.reply_text(
+            "**Usage:** `/generate_apikey <user_id> [name]`\n\n"
+            "**Example:** `/generate_apikey 123456789 my-scraper`\n"
+            "The key uses this user's daily limit and premium status."
+        )
+        return
+    
+    try:
+        user_id = int(args[0])
+    except ValueError:
+        await message.reply_text("❌ Invalid user ID!")
+        return
+    
+    if not await db.get_user(user_id, {"user_id": 1}):
+        await message.reply_text("❌ User not found! They must /start the bot first.")
+        return
+    
+    name = " ".join(args[1:]) or "default"
+    key = await db.create_api_key(user_id, name, message.from_user.id)
+    
+    await message.reply_text(
+        f"🔐 **API Key Generated**\n\n"
+        f"**Key:** `{key}`\n"
+        f"**User ID:** `{user_id}`\n"
+        f"**Name:** {name}\n\n"
+        f"Send it as the `X-API-Key` header. It is shown only once.\n"
+        f"Revoke with `/revoke_apikey {key[:11]}`"
+    )
+
+# Revoke API Key Command
+@Client.on_message(filters.command("revoke_apikey") & filters.private)
+@admin_only
+async def revoke_apikey_command(client: Client, message: Message):
+    """Revoke a web API key by its prefix"""
+    args = parse_command_args(message.text)
+    
+    if not args:
+        await message.reply_text("**Usage:** `/revoke_apikey <key prefix>`")
+        return
+    
+    revoked = await db.revoke_api_key(args[0][:11])
+    
+    if revoked:
+        await message.reply_text(
+            f"✅ **API Key Revoked**\n\n"
+            f"**Prefix:** `{args[0][:11]}`\n"
+            f"Cached copies expire within {int(Config.API_KEY_CACHE_TTL)} seconds."
+        )
+    else:
+        await message.reply_text("❌ No active key with that prefix!")
+
 # Add Group Command
 @Client.on_message(filters.command("add_group"))
 @admin_only
@@ -242,6 +302,24 @@ async def bot_stats_command(client: Client, message: Message):
     
     await message.reply_text(stats_text)
 
+# Domain Statistics Command
+@Client.on_message(filters.command("domainstats") & filters.private)
+@admin_only
+async def domain_stats_command(client: Client, message: Message):
+    """Show per-domain latency and success rates"""
+    args = parse_command_args(message.text)
+    
+    domain = None
+    hours = 24
+    for arg in args:
+        if arg.isdigit():
+            hours = int(arg)
+        else:
+            domain = get_domain(arg) if "://" in arg else arg.lower()
+    
+    stats = await db.get_domain_stats(domain=domain, hours=hours)
+    await message.reply_text(format_domain_stats(stats, hours))
+
 # Set User Limit Command
 @Client.on_message(filters.command("set_limit"))
 @admin_only
@@ -295,7 +373,7 @@ async def ban_user_command(client: Client, message: Message):
             await message.reply_text("❌ Invalid user ID!")
             return
     
-    await db.update_user(user_id, {"is_banned": True})
+    await db.set_user_banned(user_id, True)
     
     await message.reply_text(
         f"✅ **User Banned**\n\n"
@@ -315,7 +393,7 @@ async def unban_user_command(client: Client, message: Message):
     
     try:
         user_id = int(args[0])
-        await db.update_user(user_id, {"is_banned": False})
+        await db.set_user_banned(user_id, False)
         
         await message.reply_text(
             f"✅ **User Unbanned**\n\n"
@@ -390,6 +468,7 @@ async def broadcast_callback(client: Client, callback: CallbackQuery):
             await asyncio.sleep(0.05)  # Avoid flood
             
         except FloodWait as e:
+            record_flood_wait("copy_message", e.value)
             await asyncio.sleep(e.value)
             continue
         except (UserIsBlocked, InputUserDeactivated):
@@ -1,18 +1,22 @@
 import logging
 import asyncio
+import time
 from pyrogram import Client, filters
+from pyrogram.errors import FloodWait, MessageNotModified
 from pyrogram.types import Message
 from config import Config
 from database.mongodb import db
-from bot.utils.helpers import extract_urls, get_domain, truncate_text
+from bot.utils.helpers import extract_urls, format_size, get_domain, truncate_text
 from bot.utils.keyboards import Keyboards
-from bot.middlewares.auth import protected_command, rate_limit_required
-from bypasser.core import LinkBypasser
+from bot.middlewares.auth import protected_command, rate_limit_required, check_rate_limit
+from bot.middlewares.context import get_context
+from bypasser.service import bypass_service, unique_urls
+from monitoring.metrics import record_flood_wait
 
 logger = logging.getLogger(__name__)
 
-# Initialize bypasser
-bypasser = LinkBypasser()
+# Telegram rejects longer messages
+MESSAGE_LIMIT = 4000
 
 # Bypass Command Handler
 @Client.on_message(filters.command(["bypass", "b"]) & (filters.private | filters.group))
@@ -62,9 +66,11 @@ async def handle_url(client: Client, message: Message):
         # Not a URL, might be a command or regular text
         return
     
-    # Process first URL
-    url = urls[0]
-    await process_bypass(client, message, url)
+    urls = unique_urls(urls)
+    if len(urls) == 1:
+        await process_bypass(client, message, urls[0])
+    else:
+        await process_batch(client, message, urls, get_context().rate_limit)
 
 async def process_bypass(client: Client, message: Message, url: str):
     """Process bypass request"""
@@ -86,12 +92,11 @@ async def process_bypass(client: Client, message: Message, url: str):
     )
     
     try:
-        # Check cache first
-        cached = await db.get_cached_link(url)
+        # Served from cache when possible, otherwise bypassed fresh
+        result = await bypass_service.resolve(url)
         
-        if cached:
-            bypassed_link = cached["bypassed_link"]
-            await db.increment_link_usage(url)
+        if result["success"] and result["source"] == "cache":
+            bypassed_link = result["bypassed_url"]
             
             result_text = f"""
 ✅ **Link Bypassed Successfully!**
@@ -103,7 +108,7 @@ async def process_bypass(client: Client, message: Message, url: str):
 `{bypassed_link}`
 
 **Source:** 💾 Cache
-**Bypass Type:** {cached.get('bypass_type', 'Unknown')}
+**Bypass Type:** {result.get('type', 'Unknown')}
 
 Click the button below to open the link!
 """
@@ -119,20 +124,16 @@ Click the button below to open the link!
             logger.info(f"Cache hit for {url} by user {message.from_user.id}")
             return
         
-        # No cache, perform bypass
-        await processing_msg.edit_text(
-            "🔄 **Bypassing link...**\n\n"
-            "⏳ This might take 10-30 seconds..."
-        )
-        
-        result = await bypasser.bypass(url)
-        
         if result["success"]:
             bypassed_link = result["bypassed_url"]
             bypass_type = result.get("type", "unknown")
             
-            # Save to cache
-            await db.save_bypass_result(url, bypassed_link, bypass_type)
+            # Known when the link was already a file
+            file_details = ""
+            if result.get("file_name"):
+                file_details += f"**File:** `{truncate_text(result['file_name'], 60)}`\n"
+            if result.get("file_size") is not None:
+                file_details += f"**Size:** {format_size(result['file_size'])}\n"
             
             result_text = f"""
 ✅ **Link Bypassed Successfully!**
@@ -143,7 +144,7 @@ Click the button below to open the link!
 **Bypassed Link:**
 `{bypassed_link}`
 
-**Source:** 🔥 Fresh Bypass
+{file_details}**Source:** 🔥 Fresh Bypass
 **Bypass Type:** {bypass_type.title()}
 
 Click the button below to open the link!
@@ -199,7 +200,105 @@ Click the button below to open the link!
             reply_markup=Keyboards.back_button()
         )
 
-# Batch URL Handler (for groups with multiple links)
+async def _edit_progress(progress_msg: Message, text: str, wait: bool = False):
+    """Edit the batch reply; FloodWait is waited out only for the final edit"""
+    try:
+        await progress_msg.edit_text(text, disable_web_page_preview=True)
+    except MessageNotModified:
+        pass
+    except FloodWait as e:
+        record_flood_wait("edit_message_text", e.value)
+        if not wait:
+            return
+        await asyncio.sleep(e.value)
+        await _edit_progress(progress_msg, text)
+
+def _batch_line(number: int, url: str, result: dict) -> str:
+    """One line of the batch reply"""
+    if result is None:
+        return f"{number}. ⏳ `{truncate_text(url, 60)}`"
+    if result["success"]:
+        source = "💾" if result.get("source") == "cache" else "🔥"
+        return f"{number}. ✅ {source} `{result['bypassed_url']}`"
+    return f"{number}. ❌ `{truncate_text(url, 60)}` - {truncate_text(result.get('error', 'Failed'), 60)}"
+
+def render_batch(urls: list, results: list, skipped: int = 0) -> list:
+    """Render batch progress as one or more message texts"""
+    done = sum(1 for result in results if result is not None)
+    succeeded = sum(1 for result in results if result and result["success"])
+    
+    header = "✅ **Batch Complete**" if done == len(urls) else "🔄 **Bypassing links...**"
+    header += f"\n\n**Progress:** {done}/{len(urls)} | **Bypassed:** {succeeded}\n"
+    if skipped:
+        header += f"⚠️ {skipped} more links skipped (batch or daily limit reached)\n"
+    
+    chunks, current = [], header + "\n"
+    for number, (url, result) in enumerate(zip(urls, results), 1):
+        line = _batch_line(number, url, result) + "\n"
+        if len(current) + len(line) > MESSAGE_LIMIT:
+            chunks.append(current)
+            current = ""
+        current += line
+    chunks.append(current)
+    return chunks
+
+async def process_batch(client: Client, message: Message, urls: list, rate_check: dict = None):
+    """Bypass many links into one progressively edited reply"""
+    # Never bypass more links than the user has left today
+    limit = Config.BATCH_MAX_LINKS
+    remaining = rate_check.get("remaining") if rate_check else None
+    if isinstance(remaining, int):
+        limit = min(limit, remaining)
+    skipped = max(0, len(urls) - limit)
+    urls = urls[:limit]
+    
+    results = [None] * len(urls)
+    progress_msg = await message.reply_text(render_batch(urls, results, skipped)[0], disable_web_page_preview=True)
+    
+    last_edit = time.monotonic()
+    editing = asyncio.Lock()
+    
+    async def on_result(index: int, result: dict):
+        nonlocal last_edit
+        results[index] = result
+        # Throttle edits to stay clear of Telegram flood limits
+        if editing.locked() or time.monotonic() - last_edit < Config.BATCH_EDIT_INTERVAL:
+            return
+        async with editing:
+            last_edit = time.monotonic()
+            await _edit_progress(progress_msg, render_batch(urls, results, skipped)[0])
+    
+    try:
+        results = await bypass_service.resolve_many(urls, user_id=message.from_user.id, on_result=on_result)
+    except Exception as e:
+        logger.error(f"Error in batch bypass: {str(e)}")
+    
+    # Charge quota per bypassed link
+    succeeded = sum(1 for result in results if result and result["success"])
+    if succeeded:
+        await db.increment_user_usage(message.from_user.id, succeeded)
+    
+    async with editing:
+        chunks = render_batch(urls, results, skipped)
+        await _edit_progress(progress_msg, chunks[0], wait=True)
+        for chunk in chunks[1:]:
+            await message.reply_text(chunk, disable_web_page_preview=True)
+    
+    # Log to channel
+    if Config.LOG_CHANNEL and succeeded:
+        try:
+            await client.send_message(
+                Config.LOG_CHANNEL,
+                f"✅ **New Batch Bypass**\n\n"
+                f"**User:** {message.from_user.first_name} (`{message.from_user.id}`)\n"
+                f"**Links:** {succeeded}/{len(urls)} bypassed"
+            )
+        except:
+            pass
+    
+    logger.info(f"Batch of {len(urls)} links by user {message.from_user.id}: {succeeded} bypassed")
+
+# Group URL Handler
 @Client.on_message(filters.text & filters.group)
 @protected_command
 async def handle_group_url(client: Client, message: Message):
@@ -210,52 +309,37 @@ async def handle_group_url(client: Client, message: Message):
     if not urls:
         return
     
-    # Check rate limit
-    from bot.middlewares.auth import check_rate_limit
-    rate_check = await check_rate_limit(message.from_user.id)
+    # Check rate limit against the user loaded for this update
+    ctx = get_context()
+    rate_check = await check_rate_limit(ctx.user_id, ctx.user)
     
     if not rate_check["allowed"]:
         # Silently ignore in groups if limit exceeded
         return
     
-    # Process only first URL in groups
-    url = urls[0]
+    # Silently skip restricted sites
+    urls = [url for url in unique_urls(urls) if not await db.is_site_restricted(url)]
     
-    # Check if site is restricted
-    if await db.is_site_restricted(url):
+    if len(urls) > 1:
+        await process_batch(client, message, urls, rate_check)
         return
     
-    # Check cache
-    cached = await db.get_cached_link(url)
-    
-    if cached:
-        bypassed_link = cached["bypassed_link"]
-        await db.increment_link_usage(url)
-        
-        await message.reply_text(
-            f"✅ **Link Bypassed!**\n\n"
-            f"`{bypassed_link}`\n\n"
-            f"💾 From Cache",
-            reply_markup=Keyboards.bypass_result_keyboard(url, bypassed_link)
-        )
-        
-        await db.increment_user_usage(message.from_user.id)
+    if not urls:
         return
     
-    # Perform bypass
+    url = urls[0]
+    
     try:
-        result = await bypasser.bypass(url)
+        result = await bypass_service.resolve(url)
         
         if result["success"]:
             bypassed_link = result["bypassed_url"]
-            bypass_type = result.get("type", "unknown")
-            
-            await db.save_bypass_result(url, bypassed_link, bypass_type)
+            source = "💾 From Cache" if result["source"] == "cache" else "🔥 Fresh Bypass"
             
             await message.reply_text(
                 f"✅ **Link Bypassed!**\n\n"
                 f"`{bypassed_link}`\n\n"
-                f"🔥 Fresh Bypass",
+                f"{source}",
                 reply_markup=Keyboards.bypass_result_keyboard(url, bypassed_link)
             )
             
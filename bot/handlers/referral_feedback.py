@@ -6,6 +6,7 @@ from database.mongodb import db
 from bot.utils.keyboards import Keyboards
 from bot.utils.helpers import parse_command_args, get_domain
 from bot.middlewares.auth import protected_command, admin_only
+from bot.middlewares.context import get_context
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +23,7 @@ async def referral_command(client: Client, message: Message):
         )
         return
     
-    user = await db.get_user(message.from_user.id)
+    user = get_context().user
     stats = await db.get_referral_stats(message.from_user.id)
     
     referral_link = f"https://t.me/{(await client.get_me()).username}?start=ref_{message.from_user.id}"
@@ -148,11 +149,10 @@ async def feedback_command(client: Client, message: Message):
     content = args[1]
     
     # Send directly to all admins
+    user = get_context().user
     feedback_sent = False
     for admin_id in Config.ADMIN_IDS:
         try:
-            # Get user info
-            user = await db.get_user(message.from_user.id)
             user_status = "👑 Premium" if user and user.get("is_premium") else "🆓 Free"
             
             keyboard = InlineKeyboardMarkup([
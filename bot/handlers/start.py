@@ -6,6 +6,7 @@ from database.mongodb import db
 from bot.utils.keyboards import Keyboards
 from bot.utils.helpers import format_user_stats, get_user_mention
 from bot.middlewares.auth import protected_command, check_user
+from bot.middlewares.context import get_context
 from bot.handlers.notifications import notification_system
 
 logger = logging.getLogger(__name__)
@@ -15,7 +16,7 @@ logger = logging.getLogger(__name__)
 @protected_command
 async def start_command(client: Client, message: Message):
     """Handle /start command"""
-    user = await db.get_user(message.from_user.id)
+    user = get_context().user
     
     # Check for referral code
     if len(message.text.split()) > 1:
@@ -165,7 +166,7 @@ Contact: @YourSupportUsername
 @protected_command
 async def stats_command(client: Client, message: Message):
     """Handle /stats command"""
-    user = await db.get_user(message.from_user.id)
+    user = get_context().user
     
     if not user:
         await message.reply_text("❌ User not found!")
@@ -274,7 +275,7 @@ async def about_callback(client: Client, callback: CallbackQuery):
 • Python 3.11
 • Pyrogram
 • MongoDB
-• Flask
+• Quart
 • Cloudscraper
 
 **Support:**
@@ -1,11 +1,13 @@
 import logging
+from typing import Optional
 from pyrogram import Client, filters
-from pyrogram.types import Message, CallbackQuery
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.types import Message, CallbackQuery, ChatMemberUpdated
 from config import Config
 from database.mongodb import db
 from bot.utils.keyboards import Keyboards
 from bot.utils.helpers import format_duration
-from bot.middlewares.auth import check_subscription
+from bot.middlewares.auth import check_subscription, set_membership, chat_peer
 from bot.handlers.notifications import notification_system
 
 logger = logging.getLogger(__name__)
@@ -158,7 +160,8 @@ async def redeem_token_callback(client: Client, callback: CallbackQuery):
 @Client.on_callback_query(filters.regex("^check_subscription$"))
 async def check_subscription_callback(client: Client, callback: CallbackQuery):
     """Check if user has subscribed to required channels"""
-    sub_status = await check_subscription(client, callback.from_user.id)
+    # The user says they just joined: don't trust cached "not a member" results
+    sub_status = await check_subscription(client, callback.from_user.id, recheck=True)
     
     if sub_status["subscribed"]:
         await callback.message.edit_text(
@@ -181,6 +184,33 @@ async def check_subscription_callback(client: Client, callback: CallbackQuery):
             show_alert=True
         )
 
+# Keep the membership cache in sync with joins and leaves in force-sub chats
+FORCE_SUB_CHATS = [chat for chat in (Config.FORCE_SUB_CHANNEL, Config.FORCE_SUB_GROUP) if chat]
+
+def configured_chat(chat) -> Optional[str]:
+    """The FORCE_SUB_CHATS entry naming a chat, by ID or username"""
+    for entry in FORCE_SUB_CHATS:
+        peer = chat_peer(entry)
+        if peer == chat.id or (isinstance(peer, str) and peer.lower() == (chat.username or "").lower()):
+            return entry
+    return None
+
+@Client.on_chat_member_updated(filters.chat([chat_peer(chat) for chat in FORCE_SUB_CHATS]))
+async def force_sub_member_updated(client: Client, update: ChatMemberUpdated):
+    """Update cached membership when a user joins or leaves"""
+    member = update.new_chat_member or update.old_chat_member
+    chat = configured_chat(update.chat)
+    if not member or not member.user or not chat:
+        return
+    
+    if update.new_chat_member:
+        is_member = update.new_chat_member.status not in (ChatMemberStatus.BANNED, ChatMemberStatus.LEFT)
+    else:
+        is_member = None  # Unknown, check again next time
+    
+    # Keyed like check_subscription's lookups, which use the configured name
+    await set_membership(chat, member.user.id, is_member)
+
 # Premium Features Info
 @Client.on_message(filters.command("premium") & filters.private)
 async def premium_info_command(client: Client, message: Message):
@@ -1,3 +1,7 @@
 from .auth import *
+from .context import RequestContext, get_context, load_context, middleware_chain
 
-__all__ = ['check_user', 'check_admin', 'check_subscription', 'check_group_permission']
+__all__ = [
+    'check_user', 'check_admin', 'check_subscription', 'check_group_permission',
+    'RequestContext', 'get_context', 'load_context', 'middleware_chain'
+]
@@ -1,25 +1,31 @@
 import logging
 from functools import wraps
 from pyrogram import Client
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import UserNotParticipant
 from pyrogram.types import Message, CallbackQuery
 from config import Config
 from database.mongodb import db
+from database.cache import shared_cache
 from bot.utils.helpers import is_group_chat, is_private_chat
+from bot.middlewares.context import RequestContext, load_context, middleware_chain
 
 logger = logging.getLogger(__name__)
 
 async def check_user(client: Client, message: Message):
     """Check and create user if not exists"""
-    user_id = message.from_user.id
-    user = await db.get_user(user_id)
+    ctx = await load_context(message)
+    user_id = ctx.user_id
+    user = ctx.user
     
     if not user:
         # Create new user
-        user = await db.create_user(
+        user = ctx.user = await db.create_user(
             user_id=user_id,
             username=message.from_user.username,
             first_name=message.from_user.first_name
         )
+        ctx.is_new_user = True
         logger.info(f"New user created: {user_id}")
         
         # Send welcome notification to log channel
@@ -36,7 +42,7 @@ async def check_user(client: Client, message: Message):
                 pass
     else:
         # Check if premium expired
-        await db.check_premium_expired(user_id)
+        await db.check_premium_expired(user_id, user)
     
     return user
 
@@ -54,70 +60,93 @@ def check_admin(user_id: int) -> bool:
     """Check if user is admin"""
     return user_id in Config.ADMIN_IDS
 
-async def check_subscription(client: Client, user_id: int) -> dict:
+def chat_peer(chat: str):
+    """A configured chat as Pyrogram takes it: numeric ID as int, else username without @"""
+    chat = chat.replace("@", "")
+    return int(chat) if chat.lstrip("-").isdigit() else chat
+
+def _membership_key(chat: str, user_id: int) -> str:
+    return f"member:{chat.replace('@', '').lower()}:{user_id}"
+
+async def set_membership(chat: str, user_id: int, is_member: bool = None):
+    """Store a known membership state, or drop it when unknown"""
+    key = _membership_key(chat, user_id)
+    if is_member is None:
+        await shared_cache.delete(key)
+    else:
+        ttl = Config.MEMBERSHIP_CACHE_TTL if is_member else Config.MEMBERSHIP_NEGATIVE_TTL
+        await shared_cache.set(key, "1" if is_member else "0", ttl=ttl)
+
+async def is_chat_member(client: Client, chat: str, user_id: int, recheck: bool = False) -> bool:
+    """Check membership through the cache; ``recheck`` ignores cached negatives"""
+    cached = await shared_cache.get(_membership_key(chat, user_id))
+    if cached == "1" or (cached == "0" and not recheck):
+        return cached == "1"
+    
+    try:
+        member = await client.get_chat_member(chat_peer(chat), user_id)
+        is_member = member.status not in (ChatMemberStatus.BANNED, ChatMemberStatus.LEFT)
+    except UserNotParticipant:
+        is_member = False
+    except Exception as e:
+        # Not cached: the next message retries
+        logger.error(f"Error checking membership in {chat}: {e}")
+        return False
+    
+    await set_membership(chat, user_id, is_member)
+    return is_member
+
+async def check_subscription(client: Client, user_id: int, recheck: bool = False) -> dict:
     """Check if user has subscribed to required channels/groups"""
     result = {"subscribed": True, "missing": []}
     
     # Check channel subscription
     if Config.FORCE_SUB_CHANNEL:
-        try:
-            channel_username = Config.FORCE_SUB_CHANNEL.replace("@", "")
-            member = await client.get_chat_member(channel_username, user_id)
-            if member.status in ["kicked", "left"]:
-                result["subscribed"] = False
-                result["missing"].append(("channel", Config.FORCE_SUB_CHANNEL))
-        except Exception as e:
-            logger.error(f"Error checking channel subscription: {e}")
+        if not await is_chat_member(client, Config.FORCE_SUB_CHANNEL, user_id, recheck):
             result["subscribed"] = False
             result["missing"].append(("channel", Config.FORCE_SUB_CHANNEL))
     
     # Check group subscription
     if Config.FORCE_SUB_GROUP:
-        try:
-            group_username = Config.FORCE_SUB_GROUP.replace("@", "")
-            member = await client.get_chat_member(group_username, user_id)
-            if member.status in ["kicked", "left"]:
-                result["subscribed"] = False
-                result["missing"].append(("group", Config.FORCE_SUB_GROUP))
-        except Exception as e:
-            logger.error(f"Error checking group subscription: {e}")
+        if not await is_chat_member(client, Config.FORCE_SUB_GROUP, user_id, recheck):
             result["subscribed"] = False
             result["missing"].append(("group", Config.FORCE_SUB_GROUP))
     
     return result
 
-def subscription_required(func):
-    """Decorator to check subscription before executing command"""
-    @wraps(func)
-    async def wrapper(client: Client, message: Message):
-        sub_status = await check_subscription(client, message.from_user.id)
+async def subscription_step(client: Client, message: Message, ctx: RequestContext) -> bool:
+    """Middleware step: stop users missing a required subscription"""
+    sub_status = await check_subscription(client, ctx.user_id)
+    
+    if not sub_status["subscribed"]:
+        from bot.utils.keyboards import Keyboards
         
-        if not sub_status["subscribed"]:
-            from bot.utils.keyboards import Keyboards
-            
-            # Build subscription message
-            text = "⚠️ **Subscription Required**\n\n"
-            text += "Please join the following to use this bot:\n\n"
-            
-            channel_url = None
-            group_url = None
-            
-            for item_type, item_name in sub_status["missing"]:
-                if item_type == "channel":
-                    text += f"📢 Channel: {item_name}\n"
-                    channel_url = f"https://t.me/{item_name.replace('@', '')}"
-                elif item_type == "group":
-                    text += f"👥 Group: {item_name}\n"
-                    group_url = f"https://t.me/{item_name.replace('@', '')}"
-            
-            await message.reply_text(
-                text,
-                reply_markup=Keyboards.force_sub_keyboard(channel_url, group_url)
-            )
-            return
+        # Build subscription message
+        text = "⚠️ **Subscription Required**\n\n"
+        text += "Please join the following to use this bot:\n\n"
         
-        return await func(client, message)
-    return wrapper
+        channel_url = None
+        group_url = None
+        
+        for item_type, item_name in sub_status["missing"]:
+            if item_type == "channel":
+                text += f"📢 Channel: {item_name}\n"
+                channel_url = f"https://t.me/{item_name.replace('@', '')}"
+            elif item_type == "group":
+                text += f"👥 Group: {item_name}\n"
+                group_url = f"https://t.me/{item_name.replace('@', '')}"
+        
+        await message.reply_text(
+            text,
+            reply_markup=Keyboards.force_sub_keyboard(channel_url, group_url)
+        )
+        return False
+    
+    return True
+
+def subscription_required(func):
+    """Decorator to check subscription before executing command"""
+    return middleware_chain(subscription_step)(func)
 
 async def check_group_permission(client: Client, chat_id: int) -> bool:
     """Check if bot has permission to work in this group"""
@@ -129,41 +158,43 @@ async def check_group_permission(client: Client, chat_id: int) -> bool:
     is_allowed = await db.is_group_allowed(chat_id)
     return is_allowed
 
+async def group_permission_step(client: Client, message: Message, ctx: RequestContext) -> bool:
+    """Middleware step: stop chats the bot is not allowed to work in"""
+    # Skip check for private chats
+    if is_private_chat(message.chat.type):
+        # If bot should work only in groups, block private chats
+        if Config.WORK_IN_GROUPS_ONLY:
+            await message.reply_text(
+                "⚠️ **Bot Works Only in Groups**\n\n"
+                "This bot is configured to work only in authorized groups.\n"
+                "Please contact the admin to add your group."
+            )
+            return False
+        # Otherwise allow private chats
+        return True
+    
+    # For group chats, check permission
+    if is_group_chat(message.chat.type):
+        has_permission = await check_group_permission(client, message.chat.id)
+        
+        if not has_permission:
+            await message.reply_text(
+                "⚠️ **Unauthorized Group**\n\n"
+                "This bot is not authorized to work in this group.\n"
+                "Please contact the admin to request access."
+            )
+            return False
+    
+    return True
+
 def group_permission_required(func):
     """Decorator to check group permission"""
-    @wraps(func)
-    async def wrapper(client: Client, message: Message):
-        # Skip check for private chats
-        if is_private_chat(message.chat.type):
-            # If bot should work only in groups, block private chats
-            if Config.WORK_IN_GROUPS_ONLY:
-                await message.reply_text(
-                    "⚠️ **Bot Works Only in Groups**\n\n"
-                    "This bot is configured to work only in authorized groups.\n"
-                    "Please contact the admin to add your group."
-                )
-                return
-            # Otherwise allow private chats
-            return await func(client, message)
-        
-        # For group chats, check permission
-        if is_group_chat(message.chat.type):
-            has_permission = await check_group_permission(client, message.chat.id)
-            
-            if not has_permission:
-                await message.reply_text(
-                    "⚠️ **Unauthorized Group**\n\n"
-                    "This bot is not authorized to work in this group.\n"
-                    "Please contact the admin to request access."
-                )
-                return
-        
-        return await func(client, message)
-    return wrapper
+    return middleware_chain(group_permission_step)(func)
 
-async def check_rate_limit(user_id: int) -> dict:
+async def check_rate_limit(user_id: int, user: dict = None) -> dict:
     """Check if user has exceeded rate limit"""
-    user = await db.get_user(user_id)
+    if user is None:
+        user = await db.get_user(user_id)
     
     if not user:
         return {"allowed": False, "message": "User not found"}
@@ -173,7 +204,7 @@ async def check_rate_limit(user_id: int) -> dict:
         return {"allowed": True, "remaining": "Unlimited"}
     
     # Check daily limit
-    used = user.get("links_bypassed_today", 0)
+    used = await db.get_usage_today(user)
     limit = user.get("daily_limit", Config.FREE_USER_LIMIT)
     
     if used >= limit:
@@ -191,50 +222,49 @@ async def check_rate_limit(user_id: int) -> dict:
         "limit": limit
     }
 
+async def rate_limit_step(client: Client, message: Message, ctx: RequestContext) -> bool:
+    """Middleware step: stop users over their daily limit"""
+    ctx.rate_limit = await check_rate_limit(ctx.user_id, ctx.user)
+    
+    if not ctx.rate_limit["allowed"]:
+        text = f"⚠️ **{ctx.rate_limit['message']}**\n\n"
+        text += "Upgrade to premium for unlimited bypassing!\n"
+        text += "Or use a reset key to reset your limit.\n\n"
+        text += "Contact admin for more info."
+        
+        await message.reply_text(text)
+        return False
+    
+    return True
+
 def rate_limit_required(func):
     """Decorator to check rate limit before executing"""
-    @wraps(func)
-    async def wrapper(client: Client, message: Message):
-        rate_check = await check_rate_limit(message.from_user.id)
-        
-        if not rate_check["allowed"]:
-            text = f"⚠️ **{rate_check['message']}**\n\n"
-            text += "Upgrade to premium for unlimited bypassing!\n"
-            text += "Or use a reset key to reset your limit.\n\n"
-            text += "Contact admin for more info."
-            
-            await message.reply_text(text)
-            return
-        
-        return await func(client, message)
-    return wrapper
+    return middleware_chain(rate_limit_step)(func)
 
 async def is_user_banned(user_id: int) -> bool:
     """Check if user is banned"""
-    user = await db.get_user(user_id)
-    return user.get("is_banned", False) if user else False
+    return await db.is_user_banned(user_id)
+
+async def ban_step(client: Client, message: Message, ctx: RequestContext) -> bool:
+    """Middleware step: stop banned users"""
+    if await db.is_user_banned(ctx.user_id, ctx.user):
+        await message.reply_text(
+            "🚫 **You are banned from using this bot**\n\n"
+            "Contact admin if you think this is a mistake."
+        )
+        return False
+    return True
 
 def ban_check(func):
     """Decorator to check if user is banned"""
-    @wraps(func)
-    async def wrapper(client: Client, message: Message):
-        if await is_user_banned(message.from_user.id):
-            await message.reply_text(
-                "🚫 **You are banned from using this bot**\n\n"
-                "Contact admin if you think this is a mistake."
-            )
-            return
-        return await func(client, message)
-    return wrapper
+    return middleware_chain(ban_step)(func)
+
+async def user_step(client: Client, message: Message, ctx: RequestContext) -> bool:
+    """Middleware step: create the user or expire their premium"""
+    await check_user(client, message)
+    return True
 
-# Combined decorator for all checks
+# Combined decorator for all checks, sharing one user lookup per update
 def protected_command(func):
     """Combined protection decorator"""
-    @wraps(func)
-    @ban_check
-    @subscription_required
-    @group_permission_required
-    async def wrapper(client: Client, message: Message):
-        await check_user(client, message)
-        return await func(client, message)
-    return wrapper
+    return middleware_chain(ban_step, subscription_step, group_permission_step, user_step)(func)
@@ -0,0 +1,81 @@
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Awaitable, Callable, Optional
+from pyrogram import Client
+from pyrogram.types import Message
+from database.mongodb import db
+from monitoring.watchdog import label_task
+
+logger = logging.getLogger(__name__)
+
+# User fields the middlewares and handlers read; everything else stays in MongoDB
+USER_CONTEXT_FIELDS = {
+    "_id": 0,
+    "user_id": 1,
+    "username": 1,
+    "first_name": 1,
+    "is_premium": 1,
+    "subscription_end_date": 1,
+    "daily_limit": 1,
+    "links_bypassed_today": 1,
+    "total_links_bypassed": 1,
+    "last_reset": 1,
+    "is_banned": 1,
+    "total_referrals": 1
+}
+
+@dataclass
+class RequestContext:
+    """State of the update being handled, shared by middlewares and handlers"""
+    update_key: tuple
+    user_id: int
+    user: Optional[dict] = None
+    is_new_user: bool = False
+    rate_limit: Optional[dict] = None
+    extras: dict = field(default_factory=dict)
+
+_current_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+def get_context() -> Optional[RequestContext]:
+    """Context of the update being handled, if a middleware chain loaded one"""
+    return _current_context.get()
+
+def _update_key(message: Message) -> tuple:
+    return (message.chat.id if message.chat else None, message.id, message.from_user.id)
+
+async def load_context(message: Message) -> RequestContext:
+    """Get the context for this update, loading the user document once"""
+    key = _update_key(message)
+    ctx = _current_context.get()
+    if ctx and ctx.update_key == key:
+        return ctx
+
+    user_id = message.from_user.id
+    user = await db.get_user(user_id, projection=USER_CONTEXT_FIELDS)
+    return RequestContext(update_key=key, user_id=user_id, user=user)
+
+# A middleware step returns False to stop the update
+Middleware = Callable[[Client, Message, RequestContext], Awaitable[bool]]
+
+def middleware_chain(*steps: Middleware):
+    """Decorator running middleware steps in order before the handler"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(client: Client, message: Message):
+            ctx = await load_context(message)
+            # Only the outermost chain owns the context, so nested chains share it
+            token = _current_context.set(ctx) if _current_context.get() is not ctx else None
+            if token:
+                label_task(handler=func.__name__)
+            try:
+                for step in steps:
+                    if not await step(client, message, ctx):
+                        return
+                return await func(client, message)
+            finally:
+                if token:
+                    _current_context.reset(token)
+        return wrapper
+    return decorator
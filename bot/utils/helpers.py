@@ -157,6 +157,29 @@ def format_bot_stats(stats: dict) -> str:
     text += f"✅ **Total Bypasses:** {stats.get('total_bypasses', 0)}\n"
     return text
 
+def format_domain_stats(stats: list, hours: int = 24) -> str:
+    """Format per-domain bypass latency and success rates"""
+    text = f"📈 **Domain Stats** (last {hours}h)\n\n"
+    
+    if not stats:
+        return text + "No bypass events recorded yet."
+    
+    for item in stats:
+        rate = item.get("success_rate")
+        p50 = item.get("p50_ms")
+        p95 = item.get("p95_ms")
+        text += f"🌐 `{item['domain']}`\n"
+        text += f"   ✅ {f'{rate * 100:.0f}%' if rate is not None else 'N/A'} of {item.get('attempts', 0)} bypasses"
+        text += f" • 💾 {item.get('cache_hits', 0)} cache hits\n"
+        if p50 is not None:
+            text += f"   ⏱ p50 {p50 / 1000:.1f}s • p95 {p95 / 1000:.1f}s\n"
+        strategies = item.get("strategies", {})
+        if strategies:
+            top = sorted(strategies.items(), key=lambda s: s[1], reverse=True)[:3]
+            text += "   🛠 " + ", ".join(f"{name} ({count})" for name, count in top) + "\n"
+    
+    return text
+
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe storage"""
     # Remove invalid characters
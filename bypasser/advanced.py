@@ -3,110 +3,95 @@ import re
 import time
 import asyncio
 from typing import Dict, Optional
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from .http import run_blocking, browser_pool
+from .patterns import DOWNLOAD_LINK, is_download_url
 
 logger = logging.getLogger(__name__)
 
+def _find_ready(driver, by, selector, clickable: bool = False):
+    """Element if present and displayed (and enabled when ``clickable``), else None; blocking"""
+    try:
+        element = driver.find_element(by, selector)
+    except NoSuchElementException:
+        return None
+    if element.is_displayed() and (not clickable or element.is_enabled()):
+        return element
+    return None
+
+def _current_url(driver) -> str:
+    """The browser's current URL; blocking"""
+    return driver.current_url
+
+def _page_source(driver) -> str:
+    """The current page's HTML; blocking"""
+    return driver.page_source
+
+def _link_hrefs(driver, selector: str) -> list:
+    """``href`` of every element matching a CSS selector; blocking"""
+    return [element.get_attribute('href') for element in driver.find_elements(By.CSS_SELECTOR, selector)]
+
 class AdvancedBypasser:
     """Advanced bypasser using browser automation for complex scenarios"""
     
-    def __init__(self):
-        self.driver = None
-    
-    def _get_driver(self):
-        """Get configured Selenium WebDriver"""
-        if self.driver:
-            return self.driver
-        
-        options = Options()
-        options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-blink-features=AutomationControlled')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--window-size=1920,1080')
-        options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
-        
-        try:
-            self.driver = webdriver.Chrome(options=options)
-            # Disable webdriver detection
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            return self.driver
-        except Exception as e:
-            logger.error(f"Error creating WebDriver: {e}")
-            return None
-    
     async def bypass_with_browser(self, url: str) -> Dict:
         """Bypass using browser automation - handles JavaScript, timers, captchas"""
-        driver = None
         try:
-            driver = self._get_driver()
-            if not driver:
-                return {"success": False, "error": "Failed to initialize browser"}
-            
-            logger.info(f"Browser bypass starting for: {url}")
-            driver.get(url)
-            
-            # Wait for page load
-            await asyncio.sleep(2)
-            
-            # Strategy 1: Wait for and click countdown/timer buttons
-            result = await self._handle_countdown_timers(driver)
-            if result:
-                return result
-            
-            # Strategy 2: Handle reCAPTCHA (if present)
-            result = await self._handle_recaptcha(driver)
-            if result:
-                return result
-            
-            # Strategy 3: Look for hidden forms that appear after delay
-            result = await self._handle_delayed_forms(driver)
-            if result:
-                return result
-            
-            # Strategy 4: Check for dynamically loaded content
-            result = await self._handle_dynamic_content(driver)
-            if result:
-                return result
-            
-            # Strategy 5: Execute page scripts and extract variables
-            result = await self._extract_from_page_context(driver)
-            if result:
-                return result
-            
-            # Strategy 6: Monitor network requests
-            result = await self._monitor_network_requests(driver)
-            if result:
-                return result
-            
-            # Final: Get current URL (might have been redirected)
-            current_url = driver.current_url
-            if current_url != url and self._is_download_url(current_url):
-                return {
-                    "success": True,
-                    "bypassed_url": current_url,
-                    "type": "browser_automation"
-                }
-            
-            return {"success": False, "error": "No bypass method succeeded"}
+            # Browsers come from the shared pool and are reused across bypasses
+            async with browser_pool.driver() as driver:
+                logger.info(f"Browser bypass starting for: {url}")
+                await run_blocking(driver.get, url)
+                
+                # Wait for page load
+                await asyncio.sleep(2)
+                
+                # Strategy 1: Wait for and click countdown/timer buttons
+                result = await self._handle_countdown_timers(driver)
+                if result:
+                    return result
+                
+                # Strategy 2: Handle reCAPTCHA (if present)
+                result = await self._handle_recaptcha(driver)
+                if result:
+                    return result
+                
+                # Strategy 3: Look for hidden forms that appear after delay
+                result = await self._handle_delayed_forms(driver)
+                if result:
+                    return result
+                
+                # Strategy 4: Check for dynamically loaded content
+                result = await self._handle_dynamic_content(driver)
+                if result:
+                    return result
+                
+                # Strategy 5: Execute page scripts and extract variables
+                result = await self._extract_from_page_context(driver)
+                if result:
+                    return result
+                
+                # Strategy 6: Monitor network requests
+                result = await self._monitor_network_requests(driver)
+                if result:
+                    return result
+                
+                # Final: Get current URL (might have been redirected)
+                current_url = await run_blocking(_current_url, driver)
+                if current_url != url and self._is_download_url(current_url):
+                    return {
+                        "success": True,
+                        "bypassed_url": current_url,
+                        "type": "browser_automation"
+                    }
+                
+                return {"success": False, "error": "No bypass method succeeded"}
             
         except Exception as e:
             logger.error(f"Browser bypass error: {str(e)}")
             return {"success": False, "error": str(e)}
-        finally:
-            if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
     
     async def _handle_countdown_timers(self, driver) -> Optional[Dict]:
         """Handle countdown timers and wait for buttons to become clickable"""
@@ -123,14 +108,10 @@ class AdvancedBypasser:
             # Check if countdown exists
             countdown_found = False
             for by, selector in countdown_selectors:
-                try:
-                    element = driver.find_element(by, selector)
-                    if element.is_displayed():
-                        countdown_found = True
-                        logger.info("Countdown detected, waiting...")
-                        break
-                except NoSuchElementException:
-                    continue
+                if await run_blocking(_find_ready, driver, by, selector):
+                    countdown_found = True
+                    logger.info("Countdown detected, waiting...")
+                    break
             
             if countdown_found:
                 # Wait for countdown to finish (max 60 seconds)
@@ -149,22 +130,19 @@ class AdvancedBypasser:
                     ]
                     
                     for by, selector in button_selectors:
-                        try:
-                            button = driver.find_element(by, selector)
-                            if button.is_displayed() and button.is_enabled():
-                                logger.info("Clicking continue button")
-                                button.click()
-                                await asyncio.sleep(2)
-                                
-                                current_url = driver.current_url
-                                if self._is_download_url(current_url):
-                                    return {
-                                        "success": True,
-                                        "bypassed_url": current_url,
-                                        "type": "countdown_bypass"
-                                    }
-                        except NoSuchElementException:
-                            continue
+                        button = await run_blocking(_find_ready, driver, by, selector, clickable=True)
+                        if button:
+                            logger.info("Clicking continue button")
+                            await run_blocking(button.click)
+                            await asyncio.sleep(2)
+                            
+                            current_url = await run_blocking(_current_url, driver)
+                            if self._is_download_url(current_url):
+                                return {
+                                    "success": True,
+                                    "bypassed_url": current_url,
+                                    "type": "countdown_bypass"
+                                }
             
             return None
             
@@ -176,13 +154,14 @@ class AdvancedBypasser:
         """Detect and handle reCAPTCHA"""
         try:
             # Check for reCAPTCHA iframe
-            recaptcha_iframes = driver.find_elements(By.XPATH, "//iframe[contains(@src, 'recaptcha')]")
+            recaptcha_iframes = await run_blocking(driver.find_elements, By.XPATH, "//iframe[contains(@src, 'recaptcha')]")
             
             if recaptcha_iframes:
                 logger.info("reCAPTCHA detected - cannot bypass automatically")
                 return {
                     "success": False,
-                    "error": "Site protected by reCAPTCHA - manual verification required"
+                    "error": "Site protected by reCAPTCHA - manual verification required",
+                    "failure": "recaptcha"
                 }
             
             return None
@@ -197,22 +176,23 @@ class AdvancedBypasser:
             # Wait for forms to appear (max 30 seconds)
             wait = WebDriverWait(driver, 30)
             
-            form_appeared = wait.until(
+            form_appeared = await run_blocking(
+                wait.until,
                 EC.presence_of_element_located((By.TAG_NAME, "form"))
             )
             
             if form_appeared:
                 # Find and submit the form
-                forms = driver.find_elements(By.TAG_NAME, "form")
+                forms = await run_blocking(driver.find_elements, By.TAG_NAME, "form")
                 for form in forms:
                     # Check if form has submit button
-                    submit_buttons = form.find_elements(By.XPATH, ".//button[@type='submit'] | .//input[@type='submit']")
+                    submit_buttons = await run_blocking(form.find_elements, By.XPATH, ".//button[@type='submit'] | .//input[@type='submit']")
                     
                     if submit_buttons:
-                        submit_buttons[0].click()
+                        await run_blocking(submit_buttons[0].click)
                         await asyncio.sleep(2)
                         
-                        current_url = driver.current_url
+                        current_url = await run_blocking(_current_url, driver)
                         if self._is_download_url(current_url):
                             return {
                                 "success": True,
@@ -232,7 +212,7 @@ class AdvancedBypasser:
         """Handle dynamically loaded content"""
         try:
             # Scroll to load lazy content
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            await run_blocking(driver.execute_script, "window.scrollTo(0, document.body.scrollHeight);")
             await asyncio.sleep(2)
             
             # Check for dynamically added download links
@@ -246,9 +226,8 @@ class AdvancedBypasser:
             
             for selector in download_selectors:
                 try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    for element in elements:
-                        href = element.get_attribute('href')
+                    hrefs = await run_blocking(_link_hrefs, driver, selector)
+                    for href in hrefs:
                         if href and self._is_download_url(href):
                             return {
                                 "success": True,
@@ -276,7 +255,7 @@ class AdvancedBypasser:
             
             for var_name in var_names:
                 try:
-                    result = driver.execute_script(f"return window.{var_name};")
+                    result = await run_blocking(driver.execute_script, f"return window.{var_name};")
                     if result and isinstance(result, str) and self._is_download_url(result):
                         return {
                             "success": True,
@@ -287,14 +266,13 @@ class AdvancedBypasser:
                     continue
             
             # Try to extract from page source
-            page_source = driver.page_source
-            url_pattern = r'https?://[^\s<>"]+\.(mp4|mkv|avi|zip|rar|pdf|exe|apk)'
-            matches = re.findall(url_pattern, page_source, re.IGNORECASE)
+            page_source = await run_blocking(_page_source, driver)
+            match = DOWNLOAD_LINK.search(page_source)
             
-            if matches:
+            if match:
                 return {
                     "success": True,
-                    "bypassed_url": matches[0],
+                    "bypassed_url": match.group(),
                     "type": "page_source_extraction"
                 }
             
@@ -308,7 +286,7 @@ class AdvancedBypasser:
         """Monitor network requests for download URLs"""
         try:
             # Get performance logs (Chrome only)
-            logs = driver.get_log('performance')
+            logs = await run_blocking(driver.get_log, 'performance')
             
             for log in logs:
                 message = log.get('message', '')
@@ -333,26 +311,11 @@ class AdvancedBypasser:
     
     def _is_download_url(self, url: str) -> bool:
         """Check if URL is a download link"""
-        if not url or not isinstance(url, str):
-            return False
-        
-        download_indicators = [
-            '.mp4', '.mkv', '.avi', '.zip', '.rar', '.pdf',
-            '.doc', '.docx', '.exe', '.apk', '.mp3', '.iso',
-            '/download/', '/file/', '/get/', 'download=', 'file='
-        ]
-        
-        url_lower = url.lower()
-        return any(indicator in url_lower for indicator in download_indicators)
+        return is_download_url(url)
     
-    def cleanup(self):
+    async def cleanup(self):
         """Cleanup browser resources"""
-        if self.driver:
-            try:
-                self.driver.quit()
-            except:
-                pass
-            self.driver = None
+        await browser_pool.close()
 
 # Global instance
 advanced_bypasser = AdvancedBypasser()
@@ -1,11 +1,31 @@
+import re
 import logging
 import asyncio
 import cloudscraper
 from typing import Dict
 from config import Config
+from .health import host_health, CircuitOpenError
+from .http import run_blocking, browser_pool, read_page
+from .scanner import LinkScanner, scan_html
+from .patterns import DOWNLOAD_LINK
+from .transport import install as install_transport
 
 logger = logging.getLogger(__name__)
 
+# Default request timeout (seconds); hosts with latency history get a tighter one
+REQUEST_TIMEOUT = 30
+
+# Link patterns over the raw page, in priority order
+LINK_TEXT_RULES = {
+    'file': (DOWNLOAD_LINK, lambda m: m.group()),
+    'download_href': (re.compile(r'href=["\']([^"\']+)["\'].*?download', re.I), lambda m: m.group(1)),
+    'data_url': (re.compile(r'data-url=["\']([^"\']+)["\']', re.I), lambda m: m.group(1)),
+}
+
+def _never_direct(link: str) -> bool:
+    # Only the text rules, meta refresh and script redirects are used here
+    return False
+
 class CloudflareBypasser:
     """Bypass Cloudflare protection"""
     
@@ -17,23 +37,27 @@ class CloudflareBypasser:
                 'mobile': False
             }
         )
+        install_transport(self.scraper)
     
     async def bypass(self, url: str) -> Dict:
         """Bypass Cloudflare protected URL"""
         try:
             logger.info(f"Attempting Cloudflare bypass for: {url}")
             
-            # Run in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                self._make_request,
-                url
-            )
+            # Run on the shared executor to avoid blocking
+            response = await run_blocking(self._make_request, url)
+            
+            if response and response.status_code == 200 and response.direct:
+                # The protected URL served the file itself
+                return {
+                    "success": True,
+                    "bypassed_url": response.url,
+                    "type": "cloudflare"
+                }
             
             if response and response.status_code == 200:
                 # Try to extract direct link from response
-                direct_link = self._extract_link(response.text, url)
+                direct_link = self._link_from(response.scan)
                 
                 if direct_link:
                     return {
@@ -62,7 +86,7 @@ class CloudflareBypasser:
             }
     
     def _make_request(self, url: str):
-        """Make request with Cloudflare bypass"""
+        """Make request with Cloudflare bypass; the body is streamed and size-capped"""
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -78,57 +102,44 @@ class CloudflareBypasser:
             if Config.CLOUDFLARE_COOKIE:
                 cookies['cf_clearance'] = Config.CLOUDFLARE_COOKIE
             
-            response = self.scraper.get(
-                url,
-                headers=headers,
-                cookies=cookies,
-                timeout=30,
-                allow_redirects=True
-            )
-            
-            return response
-            
+            with host_health.track(url, REQUEST_TIMEOUT) as tracked:
+                response = tracked.observe(self.scraper.get(
+                    url,
+                    headers=headers,
+                    cookies=cookies,
+                    timeout=tracked.timeout,
+                    allow_redirects=True,
+                    stream=True
+                ))
+                # cloudscraper only reads the body of challenge responses
+                return read_page(response, scan=lambda charset: LinkScanner(_never_direct, LINK_TEXT_RULES, charset, ranked=True))
+            
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Request error: {str(e)}")
             return None
     
     def _extract_link(self, html: str, original_url: str) -> str:
         """Extract direct link from HTML"""
-        import re
-        from bs4 import BeautifulSoup
-        
+        return self._link_from(scan_html(html, _never_direct, LINK_TEXT_RULES, ranked=True))
+    
+    def _link_from(self, scan: LinkScanner) -> str:
+        """Direct link from a scanned page"""
         try:
-            soup = BeautifulSoup(html, 'lxml')
-            
             # Try to find download button or direct link
-            patterns = [
-                r'https?://[^\s<>"]+?(?:\.mp4|\.mkv|\.avi|\.zip|\.rar|\.pdf|\.doc|\.docx)',
-                r'href=["\']([^"\']+)["\'].*?download',
-                r'data-url=["\']([^"\']+)["\']',
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                if matches:
-                    return matches[0] if isinstance(matches[0], str) else matches[0][0]
+            for name in LINK_TEXT_RULES:
+                if name in scan.text_hits:
+                    return scan.text_hits[name]
             
             # Check for meta refresh
-            meta_refresh = soup.find('meta', attrs={'http-equiv': 'refresh'})
-            if meta_refresh and meta_refresh.get('content'):
-                content = meta_refresh.get('content')
-                url_match = re.search(r'url=(.*)', content, re.IGNORECASE)
+            if scan.meta_refresh:
+                url_match = re.search(r'url=(.*)', scan.meta_refresh, re.IGNORECASE)
                 if url_match:
                     return url_match.group(1)
             
             # Check for JavaScript redirects
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string:
-                    redirect_match = re.search(r'window\.location\.href\s*=\s*["\']([^"\']+)["\']', script.string)
-                    if redirect_match:
-                        return redirect_match.group(1)
-            
-            return None
+            return scan.script_redirect
             
         except Exception as e:
             logger.error(f"Link extraction error: {str(e)}")
@@ -137,36 +148,25 @@ class CloudflareBypasser:
     async def bypass_with_selenium(self, url: str) -> Dict:
         """Bypass using Selenium (for tougher protection)"""
         try:
-            from selenium import webdriver
-            from selenium.webdriver.chrome.options import Options
             from selenium.webdriver.common.by import By
             from selenium.webdriver.support.ui import WebDriverWait
             from selenium.webdriver.support import expected_conditions as EC
             
-            options = Options()
-            options.add_argument('--headless')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option('useAutomationExtension', False)
-            
-            driver = webdriver.Chrome(options=options)
-            driver.get(url)
-            
-            # Wait for page load
-            await asyncio.sleep(5)
-            
-            # Try to find download link
-            try:
-                download_btn = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//a[contains(@class, 'download')]"))
-                )
-                direct_link = download_btn.get_attribute('href')
-            except:
-                direct_link = driver.current_url
-            
-            driver.quit()
+            async with browser_pool.driver() as driver:
+                await run_blocking(driver.get, url)
+                
+                # Wait for page load
+                await asyncio.sleep(5)
+                
+                # Try to find download link
+                try:
+                    download_btn = await run_blocking(
+                        WebDriverWait(driver, 10).until,
+                        EC.presence_of_element_located((By.XPATH, "//a[contains(@class, 'download')]"))
+                    )
+                    direct_link = download_btn.get_attribute('href')
+                except:
+                    direct_link = driver.current_url
             
             return {
                 "success": True,
@@ -1,18 +1,31 @@
 import logging
 import re
+import time
 import asyncio
 from urllib.parse import urlparse, parse_qs
 from typing import Dict, Optional
 from config import Config
+from database.cache import shared_cache
 from .cloudflare import CloudflareBypasser
 from .advanced import advanced_bypasser
 from .sites import gdtot, sharerw, universal
+from .telemetry import BypassTrace, event_recorder
+from .scoreboard import strategy_scoreboard
+from .health import host_health, CircuitOpenError
+from .patterns import is_direct_link
+from .http import new_session, probe, file_info
+from .negative_cache import negative_cache, classify_failure
 
 logger = logging.getLogger(__name__)
 
 class LinkBypasser:
     """Main link bypasser class"""
     
+    # Site types whose result is just the next link
+    SHORTENER_TYPES = ('linkvertise', 'adfly', 'gplinks', 'ouo', 'shortingly', 'droplink')
+    # Site types whose links are always pages, so a pre-flight probe never pays off
+    PAGE_TYPES = ('gdtot', 'sharerw', 'uptobox', 'terabox')
+    
     def __init__(self):
         self.cf_bypasser = CloudflareBypasser()
         self.supported_sites = {
@@ -35,43 +48,117 @@ class LinkBypasser:
     
     async def bypass(self, url: str) -> Dict:
         """Main bypass method"""
+        # Links that failed recently fail again without another bypass
+        failure = await negative_cache.get(url)
+        if failure:
+            return failure
+        
+        # Concurrent requests for the same URL share one bypass, across workers too
+        return await shared_cache.singleflight(f"bypass:{url}", lambda: self._run_bypass(url))
+    
+    async def _run_bypass(self, url: str) -> Dict:
+        """Run and record a single bypass"""
+        trace = BypassTrace(url)
         try:
-            logger.info(f"Starting bypass for: {url}")
-            
-            # Identify site type
+            result = await self._bypass(url, trace)
+        except Exception as e:
+            logger.error(f"Error bypassing {url}: {str(e)}")
+            result = {
+                "success": False,
+                "error": f"Bypass failed: {str(e)}"
+            }
+        
+        trace.finish(result)
+        event_recorder.record(trace)
+        return result
+    
+    async def _bypass(self, url: str, trace: BypassTrace) -> Dict:
+        """Identify the site and route to the matching bypasser"""
+        logger.info(f"Starting bypass for: {url}")
+        
+        # Identify site type
+        with trace.stage("identify"):
             site_type = self._identify_site(url)
-            
-            if not site_type:
-                return {
-                    "success": False,
-                    "error": "Unsupported site or unable to identify link type"
-                }
-            
-            logger.info(f"Identified site type: {site_type}")
-            
-            # Route to appropriate bypasser
-            if site_type == 'gdtot':
+        
+        if not site_type:
+            return {
+                "success": False,
+                "error": "Unsupported site or unable to identify link type"
+            }
+        
+        trace.site_type = site_type
+        logger.info(f"Identified site type: {site_type}")
+        
+        # Fail fast when the host is known to be down, here or in another worker
+        host = host_health.get_host(url)
+        try:
+            retry_in = await shared_cache.ttl(f"circuit:{host}")
+            if retry_in:
+                raise CircuitOpenError(host, retry_in)
+            host_health.check(url, probe=False)
+        except CircuitOpenError as e:
+            logger.info(f"Skipping bypass for {url}: {e}")
+            return {"success": False, "error": str(e)}
+        
+        # Links that already lead to a file need no bypass
+        if Config.PREFLIGHT_ENABLED and site_type not in self.PAGE_TYPES:
+            with trace.stage("preflight"):
+                result = await self._preflight(url)
+            if result:
+                trace.strategy = "preflight"
+                return result
+        
+        # Route to appropriate bypasser
+        if site_type == 'gdtot':
+            with trace.stage(site_type):
                 result = await self._bypass_gdtot(url)
-            elif site_type == 'sharerw':
+        elif site_type == 'sharerw':
+            with trace.stage(site_type):
                 result = await self._bypass_sharerw(url)
-            elif site_type == 'uptobox':
+        elif site_type == 'uptobox':
+            with trace.stage(site_type):
                 result = await self._bypass_uptobox(url)
-            elif site_type == 'terabox':
+        elif site_type == 'terabox':
+            with trace.stage(site_type):
                 result = await self._bypass_terabox(url)
-            elif site_type in ['linkvertise', 'adfly', 'gplinks', 'ouo', 'shortingly', 'droplink']:
+        elif site_type in self.SHORTENER_TYPES:
+            with trace.stage("shortener"):
                 result = await self._bypass_shortener(url, site_type)
-            else:
-                # Try universal bypasser
-                result = await self._bypass_universal(url)
-            
-            return result
-            
+        else:
+            # Try universal bypasser
+            result = await self._bypass_universal(url, trace)
+        
+        # Share a newly opened circuit with the other workers
+        retry_in = host_health.retry_in(url)
+        if retry_in:
+            await shared_cache.set(f"circuit:{host}", "open", ttl=retry_in)
+        
+        return result
+    
+    async def _preflight(self, url: str) -> Optional[Dict]:
+        """Direct file result when a HEAD or one-byte request shows the URL is a download"""
+        try:
+            page = await probe(new_session(), url, Config.PREFLIGHT_TIMEOUT)
         except Exception as e:
-            logger.error(f"Error bypassing {url}: {str(e)}")
-            return {
-                "success": False,
-                "error": f"Bypass failed: {str(e)}"
-            }
+            # The bypass itself reports what went wrong
+            logger.debug(f"Pre-flight probe failed for {url}: {e}")
+            return None
+        
+        if page.status_code >= 400:
+            return None
+        # No Content-Type at all: trust the final URL
+        if not page.direct and (page.headers.get('Content-Type') or not is_direct_link(page.url)):
+            return None
+        
+        file_name, file_size = file_info(page)
+        logger.info(f"Pre-flight found a direct file for {url}: {page.url}")
+        return {
+            "success": True,
+            "bypassed_url": page.url,
+            "type": "direct_file",
+            "file_name": file_name,
+            "file_size": file_size
+        }
     
     def _identify_site(self, url: str) -> Optional[str]:
         """Identify the type of site from URL"""
@@ -144,45 +231,75 @@ class LinkBypasser:
             logger.error(f"Shortener bypass error: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    async def _bypass_universal(self, url: str) -> Dict:
+    async def _bypass_universal(self, url: str, trace: Optional[BypassTrace] = None) -> Dict:
         """Universal bypass method for unknown sites"""
+        trace = trace or BypassTrace(url)
+        domain = trace.domain
+        
+        # Direct extractors are scored per domain as "extract:<name>"
+        def order_extractors(names):
+            ranked = strategy_scoreboard.order(domain, [f"extract:{name}" for name in names])
+            return [name.split(":", 1)[1] for name in ranked]
+        
+        def record_extractor(name, success, duration_ms):
+            strategy_scoreboard.record(domain, f"extract:{name}", success, duration_ms)
+        
+        failures = []
         try:
-            # Try multiple strategies in order
-            
-            # 1. Try direct extraction with all methods (HTML, CSS, JS, etc.)
-            logger.info("Trying direct extraction with multiple methods...")
-            result = await universal.extract_direct_link(url)
-            if result["success"]:
-                return result
+            # Strategies in their default order, reordered per domain by past outcomes
+            strategies = {
+                # 1. Direct extraction with all methods (HTML, CSS, JS, etc.)
+                "direct": ("direct extraction with multiple methods", lambda: universal.extract_direct_link(
+                    url, order=order_extractors, on_attempt=record_extractor
+                )),
+                # 2. Cloudflare bypass
+                "cloudflare": ("Cloudflare bypass", lambda: self.cf_bypasser.bypass(url)),
+                # 3. Generic bypass methods
+                "generic": ("generic bypass", lambda: universal.generic_bypass(url)),
+                # 4. Advanced browser automation (for complex JS sites)
+                "browser": ("advanced browser automation", lambda: advanced_bypasser.bypass_with_browser(url)),
+            }
+            if not Config.CLOUDFLARE_COOKIE:
+                del strategies["cloudflare"]
             
-            # 2. Try Cloudflare bypass
-            if Config.CLOUDFLARE_COOKIE:
-                logger.info("Trying Cloudflare bypass...")
-                result = await self.cf_bypasser.bypass(url)
+            for name in strategy_scoreboard.order(domain, list(strategies)):
+                description, run = strategies[name]
+                logger.info(f"Trying {description}...")
+                
+                started = time.perf_counter()
+                with trace.stage(name):
+                    result = await run()
+                strategy_scoreboard.record(
+                    domain, name, result["success"], (time.perf_counter() - started) * 1000
+                )
+                
                 if result["success"]:
+                    trace.strategy = name
                     return result
+                failures.append(result)
             
-            # 3. Try generic bypass methods
-            logger.info("Trying generic bypass...")
-            result = await universal.generic_bypass(url)
-            if result["success"]:
-                return result
-            
-            # 4. Try advanced browser automation (for complex JS sites)
-            logger.info("Trying advanced browser automation...")
-            result = await advanced_bypasser.bypass_with_browser(url)
-            if result["success"]:
-                return result
-            
-            return {
-                "success": False,
-                "error": "All bypass methods failed. Site may not be supported yet."
-            }
+            # Remembered for a while, so the next request for this link skips the cascade
+            kind = classify_failure(url, failures)
+            logger.info(f"All bypass methods failed for {url} ({kind})")
+            return await negative_cache.record(url, kind)
             
         except Exception as e:
             logger.error(f"Universal bypass error: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    def is_chain_hop(self, url: str, previous_url: str) -> bool:
+        """Whether a bypass result is another link to bypass rather than the destination
+        
+        Shortener results always are; other sites only when the result leaves
+        them, since their own download hosts match the same domains.
+        """
+        if is_direct_link(url):
+            return False
+        site_type = self._identify_site(url)
+        if not site_type:
+            return False
+        return site_type in self.SHORTENER_TYPES or site_type != self._identify_site(previous_url)
+    
     def get_supported_sites(self) -> list:
         """Get list of all supported sites"""
         sites = []
@@ -0,0 +1,206 @@
+import logging
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import requests
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the host itself is unhealthy (not just a bad link)
+HOST_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+# Gateway answers meaning the origin behind a proxy or CDN is down or unreachable.
+# 500/503 are left out: a broken page or a challenge ("checking your browser"
+# is a 503 from Cloudflare) says nothing about the host being down.
+HOST_ERROR_STATUSES = frozenset({502, 504, 520, 521, 522, 523, 524, 525, 526, 530})
+
+def is_host_error_status(status: int) -> bool:
+    """Whether a response status means the host itself is down"""
+    return status in HOST_ERROR_STATUSES
+
+class CircuitOpenError(Exception):
+    """Raised when requests to a host are short-circuited"""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(
+            f"{host} is not responding, skipped without waiting (retrying in {int(retry_in) + 1}s)"
+        )
+
+class HostHealth:
+    """Latency samples and circuit state of a single host"""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=Config.HOST_LATENCY_SAMPLES)
+        self.failures = 0
+        self.state = "closed"  # closed, open, half_open
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile (ms) of recent successful requests"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile))
+        return ordered[index]
+
+class TrackedRequest:
+    """What track() yields: the timeout to use, and the status once the response arrives"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.status: Optional[int] = None
+
+    def observe(self, response):
+        """Note the response's status for the host's health and return the response"""
+        self.status = response.status_code
+        return response
+
+class HostHealthTracker:
+    """Per-host circuit breaker with timeouts derived from observed latency"""
+
+    def __init__(self):
+        self._hosts: Dict[str, HostHealth] = {}
+        # Requests also run in executor threads (cloudscraper, Selenium)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_host(url: str) -> str:
+        """Host key for a URL"""
+        host = urlparse(url).netloc.lower()
+        return host[4:] if host.startswith('www.') else host
+
+    def _get(self, host: str) -> HostHealth:
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = HostHealth()
+        return health
+
+    def check(self, url: str, probe: bool = True):
+        """Raise CircuitOpenError if the host should not be contacted now
+
+        With ``probe`` the caller is about to send a request and may take the
+        half-open probe slot; without it the state is only inspected.
+        """
+        host = self.get_host(url)
+        now = time.monotonic()
+        with self._lock:
+            health = self._hosts.get(host)
+            if health is None or health.state == "closed":
+                return
+
+            if health.state == "open":
+                retry_in = health.opened_at + Config.CIRCUIT_COOLDOWN - now
+                if retry_in > 0:
+                    raise CircuitOpenError(host, retry_in)
+                if probe:
+                    # Cooldown over: let a single probe through
+                    health.state = "half_open"
+                    health.probe_started = now
+                    logger.info(f"Circuit half-open for {host}, probing")
+                return
+
+            # Half-open: one probe at a time, give up on a probe that never reported
+            if now - health.probe_started < Config.CIRCUIT_COOLDOWN:
+                raise CircuitOpenError(host, health.probe_started + Config.CIRCUIT_COOLDOWN - now)
+            if probe:
+                health.probe_started = now
+
+    def timeout_for(self, url: str, default: float) -> float:
+        """Request timeout (seconds) for a host, capped at the handler default"""
+        with self._lock:
+            health = self._hosts.get(self.get_host(url))
+            if not health or len(health.latencies) < Config.HOST_MIN_SAMPLES:
+                return default
+            p95 = health.percentile(0.95)
+        timeout = p95 / 1000 * Config.HOST_TIMEOUT_MULTIPLIER
+        return round(max(Config.HOST_TIMEOUT_MIN, min(timeout, default)), 1)
+
+    def record_success(self, url: str, duration_ms: float, sample: bool = True):
+        """Record a completed request; ``sample`` adds its latency to the timeout window"""
+        host = self.get_host(url)
+        with self._lock:
+            health = self._get(host)
+            if sample:
+                health.latencies.append(duration_ms)
+            health.failures = 0
+            if health.state != "closed":
+                health.state = "closed"
+                logger.info(f"Circuit closed for {host}")
+
+    def record_failure(self, url: str):
+        """Record a connection failure or timeout"""
+        host = self.get_host(url)
+        with self._lock:
+            health = self._get(host)
+            health.failures += 1
+            if health.state == "half_open" or (
+                    health.state == "closed" and health.failures >= Config.CIRCUIT_FAILURE_THRESHOLD):
+                health.state = "open"
+                health.opened_at = time.monotonic()
+                logger.warning(f"Circuit opened for {host} after {health.failures} failures")
+
+    def release_probe(self, url: str):
+        """Free the half-open probe slot after a request that said nothing about the host"""
+        with self._lock:
+            health = self._hosts.get(self.get_host(url))
+            if health and health.state == "half_open":
+                health.probe_started = 0.0
+
+    def retry_in(self, url: str) -> Optional[float]:
+        """Seconds until an open circuit lets a probe through, None if not open"""
+        with self._lock:
+            health = self._hosts.get(self.get_host(url))
+            if not health or health.state != "open":
+                return None
+            remaining = health.opened_at + Config.CIRCUIT_COOLDOWN - time.monotonic()
+            return remaining if remaining > 0 else None
+
+    @contextmanager
+    def track(self, url: str, default_timeout: float, sample: bool = True):
+        """Guard a request to a host and yield a TrackedRequest with the timeout to use
+
+        Raises CircuitOpenError immediately when the host is known to be down.
+        Responses passed to ``observe()`` with a gateway error status count as failures.
+        Without ``sample`` the latency stays out of the window page timeouts
+        are derived from (HEAD probes are far faster than page loads).
+        """
+        self.check(url)
+        tracked = TrackedRequest(self.timeout_for(url, default_timeout))
+        started = time.perf_counter()
+        try:
+            yield tracked
+        except HOST_ERRORS:
+            self.record_failure(url)
+            raise
+        except BaseException:
+            # Redirect loops, broken bodies, cancellation: not a verdict on the host
+            self.release_probe(url)
+            raise
+        if tracked.status is not None and is_host_error_status(tracked.status):
+            self.record_failure(url)
+        else:
+            self.record_success(url, (time.perf_counter() - started) * 1000, sample)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Current state of every tracked host"""
+        with self._lock:
+            return {
+                host: {
+                    "state": health.state,
+                    "failures": health.failures,
+                    "samples": len(health.latencies),
+                    "p50_ms": health.percentile(0.50),
+                    "p95_ms": health.percentile(0.95)
+                }
+                for host, health in self._hosts.items()
+            }
+
+# Global instance
+host_health = HostHealthTracker()
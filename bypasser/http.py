@@ -0,0 +1,252 @@
+import re
+import logging
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from .health import host_health
+from .transport import wrap_adapter
+
+logger = logging.getLogger(__name__)
+
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Content types read as a page; any other response is the file itself
+PAGE_CONTENT_TYPES = ('text/', 'application/xhtml', 'application/xml', 'application/json', 'application/javascript')
+
+# Threads for blocking calls (requests, cloudscraper, Selenium), shared by the process
+executor = ThreadPoolExecutor(max_workers=Config.HTTP_EXECUTOR_WORKERS, thread_name_prefix="bypass-io")
+
+# One connection pool per host shared by every session; urllib3 pools are thread-safe.
+# HTTP_TRANSPORT_MODE can record its traffic to a cassette or replay it offline.
+_adapter = wrap_adapter(HTTPAdapter(pool_connections=Config.HTTP_POOL_HOSTS, pool_maxsize=Config.HTTP_POOL_SIZE))
+
+def new_session() -> requests.Session:
+    """Session with its own cookies on the shared connection pool"""
+    session = requests.Session()
+    session.mount('http://', _adapter)
+    session.mount('https://', _adapter)
+    return session
+
+async def run_blocking(func: Callable, *args, **kwargs):
+    """Run a blocking call on the shared executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+async def fetch(session: requests.Session, method: str, url: str, default_timeout: float, sample: bool = True, **kwargs) -> requests.Response:
+    """Send a request off the event loop, guarded by the host's circuit breaker"""
+    def send():
+        with host_health.track(url, default_timeout, sample) as tracked:
+            return tracked.observe(session.request(method, url, timeout=tracked.timeout, **kwargs))
+    return await run_blocking(send)
+
+def declared_charset(response: requests.Response) -> str:
+    """Charset from Content-Type, else UTF-8; guessing one means scanning the whole body"""
+    if 'charset' in response.headers.get('Content-Type', '').lower():
+        return requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+    return 'utf-8'
+
+class Page:
+    """A response read up to HTTP_MAX_PAGE_BYTES; ``direct`` when it was a file and left unread
+
+    When read into a scanner, ``scan`` holds it and ``content``/``text`` stay empty.
+    """
+
+    def __init__(self, response: requests.Response, content: bytes = b"", direct: bool = False, truncated: bool = False, scan: Any = None):
+        self.url = response.url
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = content
+        self.direct = direct
+        self.truncated = truncated
+        self.scan = scan
+        self.text = content.decode(declared_charset(response), errors='replace')
+
+def is_download(response: requests.Response) -> bool:
+    """Whether the response is a file rather than a page, judged from its headers"""
+    if 'attachment' in response.headers.get('Content-Disposition', '').lower():
+        return True
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    return bool(content_type) and not content_type.startswith(PAGE_CONTENT_TYPES)
+
+def read_page(
+    response: requests.Response,
+    stop: Optional[Callable[[bytes], bool]] = None,
+    scan: Optional[Callable[[str], Any]] = None
+) -> Page:
+    """Read a streamed response in chunks, up to the byte cap or until ``stop`` matches a chunk
+
+    ``scan(charset)`` makes a parser (feed/close, e.g. a LinkScanner) that gets
+    the chunks instead of keeping the body in memory.
+    """
+    try:
+        if is_download(response):
+            return Page(response, direct=True)
+
+        limit = Config.HTTP_MAX_PAGE_BYTES
+        sink = scan(declared_charset(response)) if scan else None
+        chunks, size, tail, truncated = [], 0, b"", False
+        for chunk in response.iter_content(Config.HTTP_READ_CHUNK):
+            if size + len(chunk) > limit:
+                chunk = chunk[:limit - size]
+                truncated = True
+            size += len(chunk)
+            if sink:
+                sink.feed(chunk)
+            else:
+                chunks.append(chunk)
+            if truncated:
+                break
+            # Keep the end of the previous chunk so a link split across chunks still matches
+            if stop and stop(tail + chunk):
+                break
+            tail = chunk[-512:]
+        if sink:
+            sink.close()
+        return Page(response, b"".join(chunks), truncated=truncated, scan=sink)
+    finally:
+        # Releases the connection when fully read, drops it otherwise
+        response.close()
+
+async def fetch_page(
+    session: requests.Session,
+    url: str,
+    default_timeout: float,
+    method: str = 'GET',
+    stop: Optional[Callable[[bytes], bool]] = None,
+    scan: Optional[Callable[[str], Any]] = None,
+    sample: bool = True,
+    **kwargs
+) -> Page:
+    """Like fetch(), but streams the body: files are not downloaded and pages are size-capped"""
+    def send():
+        with host_health.track(url, default_timeout, sample) as tracked:
+            response = tracked.observe(session.request(method, url, timeout=tracked.timeout, stream=True, **kwargs))
+            return read_page(response, stop, scan)
+    return await run_blocking(send)
+
+# Answers to HEAD from servers that only implement GET
+HEAD_UNSUPPORTED = (403, 405, 501)
+
+CONTENT_DISPOSITION_NAME = re.compile(r'filename\*\s*=\s*[^\']*\'[^\']*\'([^;]+)|filename\s*=\s*"([^"]+)"|filename\s*=\s*([^;]+)', re.I)
+CONTENT_RANGE_TOTAL = re.compile(r'/\s*(\d+)\s*$')
+
+async def probe(session: requests.Session, url: str, default_timeout: float, **kwargs) -> Page:
+    """Headers of what the URL ends up at, without its body: HEAD, else a one-byte ranged GET
+
+    Probes still count towards the host's circuit, but not its latency window.
+    """
+    response = await fetch(session, 'HEAD', url, default_timeout, sample=False, allow_redirects=True, **kwargs)
+    response.close()
+    if response.status_code not in HEAD_UNSUPPORTED and response.headers.get('Content-Type'):
+        return Page(response, direct=response.ok and is_download(response))
+
+    headers = {**kwargs.pop('headers', {}), 'Range': 'bytes=0-0'}
+    # Servers ignoring Range send the whole page; one chunk of it is enough
+    return await fetch_page(session, url, default_timeout, stop=lambda chunk: True, sample=False, headers=headers, allow_redirects=True, **kwargs)
+
+def file_info(page: Page) -> Tuple[Optional[str], Optional[int]]:
+    """File name and size of a download, from its headers or else its URL"""
+    name = None
+    disposition = CONTENT_DISPOSITION_NAME.search(page.headers.get('Content-Disposition', ''))
+    if disposition:
+        encoded, quoted, bare = disposition.groups()
+        name = unquote(encoded.strip()) if encoded else (quoted or bare).strip()
+    if not name:
+        name = unquote(urlparse(page.url).path.rsplit('/', 1)[-1]) or None
+
+    size = None
+    total = CONTENT_RANGE_TOTAL.search(page.headers.get('Content-Range', ''))
+    if total:
+        size = int(total.group(1))
+    elif page.status_code == 200 and page.headers.get('Content-Length', '').isdigit():
+        size = int(page.headers['Content-Length'])
+    return name, size
+
+def create_driver():
+    """Headless Chrome configured to look like a regular browser"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument(f'--user-agent={BROWSER_USER_AGENT}')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+
+    driver = webdriver.Chrome(options=options)
+    driver.set_page_load_timeout(Config.BROWSER_PAGE_TIMEOUT)
+    # Disable webdriver detection
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    return driver
+
+class BrowserPool:
+    """Bounded pool of reusable browsers; starting Chrome costs seconds and ~100 MB"""
+
+    def __init__(self, size: int, max_uses: int):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: List = []
+        self._uses = {}
+        self._slots = None
+        self.busy = 0
+
+    @asynccontextmanager
+    async def driver(self):
+        """Borrow a browser; it is reset and returned to the pool afterwards"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            self.busy += 1
+            try:
+                driver = self._idle.pop() if self._idle else await run_blocking(create_driver)
+                healthy = False
+                try:
+                    yield driver
+                    healthy = True
+                finally:
+                    await self._release(driver, healthy)
+            finally:
+                self.busy -= 1
+
+    async def _release(self, driver, healthy: bool):
+        uses = self._uses.pop(id(driver), 0) + 1
+        if healthy and uses < self.max_uses:
+            try:
+                # Drop state so the next bypass starts clean
+                await run_blocking(driver.delete_all_cookies)
+                await run_blocking(driver.get, 'about:blank')
+                self._uses[id(driver)] = uses
+                self._idle.append(driver)
+                return
+            except Exception as e:
+                logger.warning(f"Browser reset failed, discarding it: {e}")
+        await run_blocking(self._quit, driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    async def close(self):
+        """Quit every idle browser"""
+        idle, self._idle = self._idle, []
+        self._uses.clear()
+        for driver in idle:
+            await run_blocking(self._quit, driver)
+
+# Global instance
+browser_pool = BrowserPool(Config.BROWSER_POOL_SIZE, Config.BROWSER_MAX_USES)
@@ -0,0 +1,176 @@
+import socket
+import logging
+import asyncio
+import ipaddress
+from typing import List, Optional, Set
+from urllib.parse import urlsplit
+import aiohttp
+from aiohttp.resolver import ThreadedResolver
+from config import Config
+from .service import bypass_service
+
+logger = logging.getLogger(__name__)
+
+def is_public_address(address: str) -> bool:
+    """Whether an IP address is on the public internet (not loopback, private, link-local, ...)"""
+    try:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+async def check_callback_url(url: str) -> Optional[str]:
+    """Why a callback URL cannot be used, or None; only http(s) to public hosts is allowed"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return "callback_url must be an http or https URL"
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError):
+        return "callback_url host does not resolve"
+    if not infos or not all(is_public_address(info[4][0]) for info in infos):
+        return "callback_url must point to a public address"
+    return None
+
+class PublicResolver(ThreadedResolver):
+    """Refuses hosts that resolve to non-public addresses, in case DNS changed since the job was queued"""
+
+    async def resolve(self, *args, **kwargs):
+        hosts = await super().resolve(*args, **kwargs)
+        if not all(is_public_address(host["host"]) for host in hosts):
+            raise OSError(f"{args[0] if args else kwargs.get('host')} resolves to a non-public address")
+        return hosts
+
+class JobWorker:
+    """Runs queued bypass jobs from MongoDB and reports them to their callbacks"""
+
+    def __init__(self):
+        self.db = None
+        self._tasks: List[asyncio.Task] = []
+        # Callbacks run on their own, so a slow webhook does not hold a worker slot
+        self._callbacks: Set[asyncio.Task] = set()
+        self._wakeup = None
+
+    async def start(self, db):
+        """Start the worker tasks"""
+        self.db = db
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._work())
+            for _ in range(Config.JOB_WORKER_CONCURRENCY)
+        ]
+        self._tasks.append(asyncio.create_task(self._reap()))
+        logger.info(f"Job worker started with {Config.JOB_WORKER_CONCURRENCY} slots")
+
+    async def stop(self):
+        """Stop the worker; running jobs are picked up again once their lease expires"""
+        tasks = self._tasks + list(self._callbacks)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._callbacks.clear()
+
+    def notify(self):
+        """Wake idle workers after a job is queued in this process"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self.db.claim_job(Config.JOB_LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"Error claiming job: {e}")
+                job = None
+
+            if not job:
+                # Idle: poll, or wake up early when a job is queued here
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), Config.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: dict):
+        """Bypass a job's link and store the result"""
+        try:
+            result = await bypass_service.resolve(job["url"])
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} error: {e}")
+            result = {"success": False, "error": str(e)}
+
+        if not await self.db.finish_job(job, result):
+            # Ran past its lease and was claimed again; that run reports the job
+            logger.warning(f"Job {job['job_id']} attempt {job['attempts']} finished after losing its lease")
+            return
+        logger.info(f"Job {job['job_id']} {'done' if result.get('success') else 'failed'}")
+
+        # API clients pay for successful bypasses only
+        if result.get("success") and job.get("user_id") is not None:
+            try:
+                await self.db.increment_user_usage(job["user_id"])
+            except Exception as e:
+                logger.error(f"Error charging job {job['job_id']}: {e}")
+
+        if job.get("callback_url"):
+            task = asyncio.create_task(self._callback(job["callback_url"], await self.db.get_job(job["job_id"])))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _callback(self, callback_url: str, job: dict):
+        """POST the finished job to its callback URL, with retries
+
+        Redirects are not followed: a public URL could redirect to an internal one.
+        """
+        # Checked again: aiohttp does not pass IP-literal hosts through the resolver
+        error = await check_callback_url(callback_url)
+        if error:
+            logger.error(f"Not calling back for job {job['job_id']}: {error}")
+            return
+
+        payload = {
+            key: value.isoformat() if hasattr(value, "isoformat") else value
+            for key, value in job.items()
+        }
+        timeout = aiohttp.ClientTimeout(total=Config.JOB_CALLBACK_TIMEOUT)
+        for attempt in range(Config.JOB_CALLBACK_RETRIES):
+            try:
+                connector = aiohttp.TCPConnector(resolver=PublicResolver())
+                async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                    async with session.post(callback_url, json=payload, allow_redirects=False) as response:
+                        if 300 <= response.status < 400:
+                            logger.error(f"Callback for job {job['job_id']} redirected (HTTP {response.status}), not delivered")
+                            return
+                        if response.status < 500:
+                            return
+                        logger.warning(f"Callback for job {job['job_id']} got HTTP {response.status}")
+            except Exception as e:
+                logger.warning(f"Callback for job {job['job_id']} failed: {e}")
+            if attempt + 1 < Config.JOB_CALLBACK_RETRIES:
+                await asyncio.sleep(2 ** attempt)
+        logger.error(f"Giving up on callback for job {job['job_id']}")
+
+    async def _reap(self):
+        """Fail jobs whose workers died on every attempt"""
+        while True:
+            await asyncio.sleep(Config.JOB_LEASE_SECONDS)
+            try:
+                failed = await self.db.fail_stale_jobs()
+                if failed:
+                    logger.warning(f"Marked {failed} stale jobs as failed")
+            except Exception as e:
+                logger.error(f"Error reaping jobs: {e}")
+
+# Global instance
+job_worker = JobWorker()
@@ -0,0 +1,60 @@
+import logging
+from typing import Dict, List, Optional
+from config import Config
+from database.cache import shared_cache
+from .health import host_health
+
+logger = logging.getLogger(__name__)
+
+# Failure kinds in the order they explain a failed bypass, with the reply for each
+FAILURE_ERRORS = {
+    "expired": "Link not found or expired",
+    "recaptcha": "Site protected by reCAPTCHA - manual verification required",
+    "host_down": "Site is not responding, try again later",
+    "unsupported": "All bypass methods failed. Site may not be supported yet.",
+}
+
+def failure_ttl(kind: str) -> int:
+    """Seconds a failure of this kind is remembered, 0 to not remember it"""
+    return {
+        "expired": Config.NEGATIVE_TTL_EXPIRED,
+        "recaptcha": Config.NEGATIVE_TTL_RECAPTCHA,
+        "host_down": Config.NEGATIVE_TTL_HOST_DOWN,
+        "unsupported": Config.NEGATIVE_TTL_UNSUPPORTED,
+    }.get(kind, 0)
+
+def classify_failure(url: str, results: List[Dict]) -> str:
+    """Failure kind behind a set of failed strategy results"""
+    kinds = {result.get("failure") for result in results}
+    if host_health.retry_in(url):
+        kinds.add("host_down")
+    for kind in FAILURE_ERRORS:
+        if kind in kinds:
+            return kind
+    return "unsupported"
+
+class NegativeCache:
+    """Recent bypass failures shared by all workers, so repeats cost one lookup"""
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return f"fail:{url}"
+
+    async def get(self, url: str) -> Optional[Dict]:
+        """Failed result remembered for the URL, or None"""
+        failure = await shared_cache.get_json(self._key(url))
+        if not failure:
+            return None
+        logger.info(f"Negative cache hit for {url}: {failure['failure']}")
+        return {"success": False, "error": failure["error"], "failure": failure["failure"]}
+
+    async def record(self, url: str, kind: str) -> Dict:
+        """Remember a failure for its kind's TTL and return the failed result"""
+        error = FAILURE_ERRORS.get(kind, FAILURE_ERRORS["unsupported"])
+        ttl = failure_ttl(kind)
+        if ttl > 0:
+            await shared_cache.set_json(self._key(url), {"failure": kind, "error": error}, ttl=ttl)
+        return {"success": False, "error": error, "failure": kind}
+
+# Global instance
+negative_cache = NegativeCache()
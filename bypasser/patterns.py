@@ -0,0 +1,113 @@
+import re
+import base64
+import binascii
+from functools import lru_cache
+from typing import Optional
+
+# File extensions by category; images are page assets more often than downloads
+EXTENSIONS = {
+    'video': ('mp4', 'mkv', 'avi', 'mov', 'flv', 'wmv', 'webm', 'm4v'),
+    'audio': ('mp3', 'wav', 'flac', 'aac', 'ogg', 'm4a', 'wma'),
+    'archive': ('zip', 'rar', '7z', 'tar', 'gz', 'bz2', 'xz'),
+    'document': ('pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx'),
+    'executable': ('exe', 'msi', 'apk', 'dmg', 'deb', 'rpm'),
+    'image': ('jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp', 'svg'),
+    'disk_image': ('iso', 'img', 'bin'),
+}
+CATEGORIES = list(EXTENSIONS)
+DOWNLOAD_CATEGORIES = [category for category in CATEGORIES if category != 'image']
+
+_CATEGORY_OF = {ext: category for category, exts in EXTENSIONS.items() for ext in exts}
+
+def _extensions(categories) -> str:
+    # Longest first so 'docx' is not cut short at 'doc'
+    return '|'.join(sorted((re.escape(ext) for c in categories for ext in EXTENSIONS[c]), key=len, reverse=True))
+
+# An extension must end the name: '.doc' does not match '.docs.example.com'
+_END = r'(?![a-z0-9])'
+
+# Absolute links to files in page text; the extension is the ``ext`` group
+FILE_LINK = re.compile(rf'https?://[^\s<>"\']+\.(?P<ext>{_extensions(CATEGORIES)}){_END}', re.I)
+DOWNLOAD_LINK = re.compile(rf'https?://[^\s<>"\']+\.(?P<ext>{_extensions(DOWNLOAD_CATEGORIES)}){_END}', re.I)
+# Same, over raw bytes, only once the link is complete (followed by a quote, space or tag)
+DOWNLOAD_LINK_BYTES = re.compile(rf'https?://[^\s<>"\']+\.(?:{_extensions(DOWNLOAD_CATEGORIES)})(?=["\'\s<])'.encode(), re.I)
+
+# URL patterns below run on the lowercased URL; re.I makes Python's re several times slower
+
+# Anything that marks a URL as a download: a file extension, a download path or parameter
+DOWNLOAD_INDICATOR = re.compile(
+    rf'\.(?:{_extensions(DOWNLOAD_CATEGORIES)}){_END}'
+    r'|/(?:download|get|file|direct)/'
+    r'|(?:download|file|url)='
+)
+
+# Links that are never the download
+SKIP = re.compile(
+    r'javascript:|mailto:|#|void\(0\)'
+    r'|facebook\.com|twitter\.com|instagram\.com'
+    r'|login|signin|register|signup'
+    r'|icon|logo|banner'
+)
+# Ad hosts and paths: 'ad' only as a whole word, so 'download' passes. Starting
+# with the literal lets re skip ahead instead of trying every position.
+AD_WORD = re.compile(r'ad(?<![a-z0-9]ad)(?:s|server|service|vert[a-z]*)?(?![a-z0-9])')
+
+# Page assets that file pattern matching passes over
+ASSET = re.compile(r'icon|logo|thumb|preview', re.I)
+
+# Base64 of anything starting with 'http' starts with 'aHR0c' ('YUhSMGN' when
+# encoded twice), so only those runs are candidates; URL-safe '-' and '_' allowed.
+# One pattern per prefix: a literal prefix lets re skip ahead, an alternation does not.
+BASE64_PREFIXES = ('aHR0c', 'YUhSMGN')
+BASE64_URL = re.compile(r'aHR0c[A-Za-z0-9+/_-]{15,}={0,2}')
+BASE64_TWICE_URL = re.compile(r'YUhSMGN[A-Za-z0-9+/_-]{15,}={0,2}')
+# Longer runs are inline files and bundles, not links (~3 KB of URL encoded twice)
+MAX_BASE64_CANDIDATE = 4096
+
+def category(ext: str) -> Optional[str]:
+    """Category of a file extension, e.g. 'mkv' -> 'video'"""
+    return _CATEGORY_OF.get(ext.lower())
+
+def is_download_url(url: str) -> bool:
+    """Whether the URL looks like a download, without the skip list"""
+    return bool(url) and isinstance(url, str) and DOWNLOAD_INDICATOR.search(url.lower()) is not None
+
+def _b64decode(value: str) -> str:
+    value = value.rstrip('=')
+    value += '=' * (-len(value) % 4)
+    altchars = b'-_' if '-' in value or '_' in value else None
+    return base64.b64decode(value, altchars=altchars).decode('utf-8')
+
+@lru_cache(maxsize=4096)
+def decode_base64_link(candidate: str) -> Optional[str]:
+    """Direct link in a base64 string (standard or URL-safe, up to twice encoded), or None"""
+    if len(candidate) > MAX_BASE64_CANDIDATE or not candidate.startswith(BASE64_PREFIXES):
+        return None
+    value = candidate
+    for _ in range(2):
+        try:
+            value = _b64decode(value)
+        except (binascii.Error, ValueError):
+            return None
+        if value.startswith('http'):
+            return value if is_direct_link(value) else None
+        if not value.startswith(BASE64_PREFIXES[0]):
+            return None
+    return None
+
+def is_direct_link(url: str) -> bool:
+    """Check if URL is a direct download link"""
+    if not url or not isinstance(url, str):
+        return False
+
+    # Must be valid HTTP/HTTPS URL
+    if not url.startswith(('http://', 'https://')):
+        return False
+
+    url_lower = url.lower()
+    # Most links on a page are not downloads, so the indicator goes first
+    return (
+        DOWNLOAD_INDICATOR.search(url_lower) is not None
+        and SKIP.search(url_lower) is None
+        and AD_WORD.search(url_lower) is None
+    )
@@ -0,0 +1,282 @@
+import re
+import codecs
+import logging
+from typing import Callable, Dict, List, Match, Optional, Pattern, Tuple, Union
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# Characters of the previous chunk kept so text rules can match across chunk borders
+TEXT_OVERLAP = 4096
+# Longest script or anchor text kept while its element is open
+MAX_SCRIPT_CHARS = 1024 * 1024
+MAX_ANCHOR_CHARS = 256
+
+# Scripts worth running through js2py, as extract_from_javascript always did
+JS_EXEC_MARKERS = ('downloadLink', 'download_url')
+
+JS_REDIRECT_PATTERNS = [re.compile(p, re.I) for p in (
+    r'window\.location\.href\s*=\s*["\']([^"\']+)["\']',
+    r'window\.location\s*=\s*["\']([^"\']+)["\']',
+    r'document\.location\.href\s*=\s*["\']([^"\']+)["\']',
+    r'location\.replace\(["\']([^"\']+)["\']\)',
+    r'location\.href\s*=\s*["\']([^"\']+)["\']',
+)]
+JS_VAR_PATTERNS = [re.compile(p) for p in (
+    r'var\s+\w+\s*=\s*["\']([^"\']+)["\']',
+    r'let\s+\w+\s*=\s*["\']([^"\']+)["\']',
+    r'const\s+\w+\s*=\s*["\']([^"\']+)["\']',
+)]
+JS_ATOB = re.compile(r'atob\(["\']([^"\']+)["\']\)')
+JS_HREF_ASSIGNMENT = re.compile(r'window\.location\.href\s*=\s*["\']([^"\']+)["\']')
+
+HIDDEN_STYLE = re.compile(r'display:\s*none|visibility:\s*hidden', re.I)
+HIDDEN_CLASS = re.compile(r'hidden|(?:^|\s)d-none(?:\s|$)', re.I)
+DOWNLOAD = re.compile(r'download', re.I)
+SKIP_ANCHOR_IDS = ('skip_button', 'proceed', 'continue')
+ANCHOR_TEXT_WORDS = ('download', 'get', 'fetch', 'retrieve')
+
+# Download button selectors in priority order: (tag, attribute, test)
+BUTTON_SELECTORS: List[Tuple[str, str, Callable[[str], bool]]] = [
+    ('a', 'class', lambda v: bool(DOWNLOAD.search(v))),
+    ('a', 'id', lambda v: bool(DOWNLOAD.search(v))),
+    ('button', 'class', lambda v: bool(DOWNLOAD.search(v))),
+    ('a', 'class', lambda v: 'btn-primary' in v.split()),
+    ('a', 'class', lambda v: 'btn-success' in v.split()),
+    ('a', 'role', lambda v: v == 'button'),
+    ('a', 'title', lambda v: bool(DOWNLOAD.search(v))),
+]
+ONCLICK_URL = re.compile(r'["\']([^"\']+)["\']')
+
+# name -> (pattern over the raw page text, accept(match) -> link or None).
+# accept may return (key, link) instead: the first link per key is kept under
+# "<name>_<key>" and the rule keeps running, so one pass serves several keys.
+TextRules = Dict[str, Tuple[Pattern, Callable[[Match], Union[str, Tuple[str, str], None]]]]
+
+class LinkScanner:
+    """lxml parser target that collects link candidates while a page streams in
+
+    Only the first candidate of each rule (and the page's forms) is kept, so
+    memory stays flat however large the page is. ``text_rules`` run over the
+    raw text for links that are not in a tag attribute; with ``ranked`` they
+    are in priority order and rules below a hit stop running.
+    """
+
+    def __init__(
+        self,
+        is_direct: Callable[[str], bool],
+        text_rules: Optional[TextRules] = None,
+        encoding: str = 'utf-8',
+        ranked: bool = False
+    ):
+        self.is_direct = is_direct
+        self.text_rules = text_rules or {}
+        self.ranked = ranked
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = 'utf-8'
+        self._parser = etree.HTMLParser(target=self, encoding=encoding, recover=True)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._tail = ""
+        self._offset = 0
+        self._checked = 0
+        self._stack: List[Tuple[str, bool]] = []
+        self._hidden_depth = 0
+        self._form: Optional[Dict] = None
+        self._script: Optional[List[str]] = None
+        self._script_size = 0
+        self._anchor: Optional[Tuple[str, List[str]]] = None
+        self.closed = False
+
+        # Candidates, first match in document order unless noted
+        self.forms: List[Dict] = []
+        self.hidden_link: Optional[str] = None
+        self.scripts: List[Tuple[str, str]] = []  # (kind, link or script text) in document order
+        self.script_redirect: Optional[str] = None
+        self.meta_refresh: Optional[str] = None
+        self.embeds: Dict[str, str] = {}  # iframe/embed/object -> first direct link
+        self.buttons: Dict[int, Tuple[str, str]] = {}  # selector index -> (kind, link)
+        self.data_link: Optional[str] = None
+        self.download_anchor: Optional[str] = None
+        self.skip_anchor: Optional[str] = None
+        self.text_anchor: Optional[str] = None
+        self.text_hits: Dict[str, str] = {}
+        self.recaptcha = False  # A reCAPTCHA widget or script is on the page
+
+    # Feeding
+
+    def feed(self, chunk: bytes):
+        """Parse the next chunk of the page"""
+        self._parser.feed(chunk)
+        if self.text_rules:
+            self._scan_text(self._decoder.decode(chunk), final=False)
+
+    def close(self):
+        """Finish parsing; candidates are complete afterwards"""
+        # lxml calls close() on its target too, from inside _parser.close()
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._parser.close()
+        except etree.LxmlError as e:
+            # Empty or non-HTML body; whatever was collected still stands
+            logger.debug(f"Scanner close: {e}")
+        if self.text_rules:
+            self._scan_text(self._decoder.decode(b"", final=True), final=True)
+
+    def _scan_text(self, text: str, final: bool):
+        buffer = self._tail + text
+        start = self._offset - len(self._tail)
+        for name, (pattern, accept) in self.text_rules.items():
+            if name in self.text_hits:
+                continue
+            # Rules ranked below a hit cannot win any more
+            if self.ranked and self.text_hits:
+                break
+            for match in pattern.finditer(buffer):
+                # Checked in an earlier chunk
+                if start + match.end() <= self._checked:
+                    continue
+                # May continue in the next chunk
+                if not final and match.end() == len(buffer):
+                    break
+                link = accept(match)
+                if isinstance(link, tuple):
+                    self.text_hits.setdefault(f"{name}_{link[0]}", link[1])
+                elif link:
+                    self.text_hits[name] = link
+                    break
+        self._offset += len(text)
+        self._checked = self._offset - 1
+        self._tail = buffer[-TEXT_OVERLAP:]
+
+    # lxml target interface
+
+    def start(self, tag, attrib):
+        attrs = dict(attrib)
+        hidden = bool(HIDDEN_STYLE.search(attrs.get('style', '')) or HIDDEN_CLASS.search(attrs.get('class', '')))
+        self._stack.append((tag, hidden))
+        if hidden:
+            self._hidden_depth += 1
+            for name, value in attrs.items():
+                if self.hidden_link is None and ('url' in name.lower() or 'link' in name.lower()) and self.is_direct(value):
+                    self.hidden_link = value
+
+        if not self.recaptcha and (
+                'g-recaptcha' in attrs.get('class', '') or 'recaptcha' in attrs.get('src', '')):
+            self.recaptcha = True
+
+        if tag == 'a':
+            self._start_anchor(attrs)
+        elif tag == 'form':
+            self._form = {"action": attrs.get('action', ''), "method": attrs.get('method', 'get').lower(), "inputs": []}
+            self.forms.append(self._form)
+        elif tag == 'input' and self._form is not None:
+            self._form["inputs"].append((attrs.get('name'), attrs.get('value', ''), attrs.get('type', 'text'), 'checked' in attrs))
+        elif tag == 'script':
+            self._script, self._script_size = [], 0
+        elif tag == 'meta' and self.meta_refresh is None:
+            if 'refresh' in attrs.get('http-equiv', '').lower() and attrs.get('content'):
+                self.meta_refresh = attrs['content']
+        elif tag in ('iframe', 'embed', 'object') and tag not in self.embeds:
+            source = attrs.get('data' if tag == 'object' else 'src')
+            if source and self.is_direct(source):
+                self.embeds[tag] = source
+
+        if tag in ('a', 'button'):
+            self._match_buttons(tag, attrs)
+
+        if self.data_link is None:
+            for name, value in attrs.items():
+                if name.startswith('data-') and self.is_direct(value):
+                    self.data_link = value
+                    break
+
+    def _start_anchor(self, attrs: Dict[str, str]):
+        href = attrs.get('href')
+        if not href:
+            return
+        if self._hidden_depth and self.hidden_link is None and self.is_direct(href):
+            self.hidden_link = href
+        if self.download_anchor is None and DOWNLOAD.search(attrs.get('class', '')):
+            self.download_anchor = href
+        if self.skip_anchor is None and attrs.get('id') in SKIP_ANCHOR_IDS:
+            self.skip_anchor = href
+        if self.text_anchor is None and href.startswith('http'):
+            self._anchor = (href, [])
+
+    def _match_buttons(self, tag: str, attrs: Dict[str, str]):
+        for index, (selector_tag, name, test) in enumerate(BUTTON_SELECTORS):
+            if index in self.buttons or selector_tag != tag or name not in attrs or not test(attrs[name]):
+                continue
+            href = attrs.get('href')
+            if href and self.is_direct(href):
+                self.buttons[index] = ("button_extraction", href)
+                continue
+            onclick = ONCLICK_URL.search(attrs.get('onclick', ''))
+            if onclick and self.is_direct(onclick.group(1)):
+                self.buttons[index] = ("button_onclick", onclick.group(1))
+
+    def data(self, data):
+        if self._script is not None:
+            if self._script_size < MAX_SCRIPT_CHARS:
+                self._script.append(data)
+                self._script_size += len(data)
+        elif self._anchor is not None:
+            text = self._anchor[1]
+            if sum(map(len, text)) < MAX_ANCHOR_CHARS:
+                text.append(data)
+
+    def end(self, tag):
+        # Implicitly closed elements end here too
+        while self._stack:
+            open_tag, hidden = self._stack.pop()
+            if hidden:
+                self._hidden_depth -= 1
+            self._end(open_tag)
+            if open_tag == tag:
+                break
+
+    def _end(self, tag):
+        if tag == 'script' and self._script is not None:
+            self._end_script("".join(self._script))
+            self._script = None
+        elif tag == 'form':
+            self._form = None
+        elif tag == 'a' and self._anchor is not None:
+            href, text = self._anchor
+            self._anchor = None
+            words = "".join(text).strip().lower()
+            if any(word in words for word in ANCHOR_TEXT_WORDS):
+                self.text_anchor = href
+
+    def _end_script(self, script: str):
+        if not script:
+            return
+        if self.script_redirect is None:
+            redirect = JS_HREF_ASSIGNMENT.search(script)
+            if redirect:
+                self.script_redirect = redirect.group(1)
+
+        # Same order extract_from_javascript tries them in: assignments, js2py, atob
+        for pattern in JS_REDIRECT_PATTERNS + JS_VAR_PATTERNS:
+            for match in pattern.findall(script):
+                if self.is_direct(match):
+                    self.scripts.append(("link", match))
+                    return
+        if any(marker in script for marker in JS_EXEC_MARKERS):
+            self.scripts.append(("exec", script))
+        for encoded in JS_ATOB.findall(script):
+            self.scripts.append(("atob", encoded))
+
+    def comment(self, text):
+        pass
+
+def scan_html(html: str, is_direct: Callable[[str], bool], text_rules: Optional[TextRules] = None, ranked: bool = False) -> LinkScanner:
+    """Scan a page that is already in memory"""
+    scanner = LinkScanner(is_direct, text_rules, ranked=ranked)
+    scanner.feed(html.encode('utf-8'))
+    scanner.close()
+    return scanner
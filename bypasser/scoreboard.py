@@ -0,0 +1,114 @@
+import logging
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class StrategyScoreboard:
+    """Per-domain success rate and latency of each bypass strategy"""
+
+    def __init__(self):
+        self.db = None
+        # domain -> strategy -> {"attempts", "successes", "total_ms", "last_attempt"}
+        self._scores: Dict[str, Dict[str, Dict]] = {}
+        # Increments not yet written to MongoDB
+        self._pending: Dict[Tuple[str, str], Dict] = {}
+        self._task = None
+
+    async def start(self, db):
+        """Load persisted scores and start the background writer"""
+        self.db = db
+        try:
+            for doc in await db.load_strategy_scores():
+                self._scores.setdefault(doc["domain"], {})[doc["strategy"]] = {
+                    "attempts": doc.get("attempts", 0),
+                    "successes": doc.get("successes", 0),
+                    "total_ms": doc.get("total_ms", 0),
+                    "last_attempt": doc.get("last_attempt")
+                }
+            logger.info(f"Strategy scoreboard loaded for {len(self._scores)} domains")
+        except Exception as e:
+            logger.error(f"Error loading strategy scores: {e}")
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the writer and persist pending scores"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(self, domain: str, strategy: str, success: bool, duration_ms: float):
+        """Record the outcome of one strategy attempt"""
+        if not domain:
+            return
+
+        now = datetime.utcnow()
+        domain_scores = self._scores.setdefault(domain, {})
+        for score in (domain_scores.setdefault(strategy, {}), self._pending.setdefault((domain, strategy), {})):
+            score["attempts"] = score.get("attempts", 0) + 1
+            score["successes"] = score.get("successes", 0) + (1 if success else 0)
+            score["total_ms"] = score.get("total_ms", 0) + round(duration_ms)
+            score["last_attempt"] = now
+
+    def order(self, domain: str, strategies: List[str]) -> List[str]:
+        """Order strategies best-first and drop the ones that never work here"""
+        scores = self._scores.get(domain)
+        if not scores:
+            return list(strategies)
+
+        retry_before = datetime.utcnow() - timedelta(hours=Config.STRATEGY_RETRY_HOURS)
+        candidates = []
+        for position, strategy in enumerate(strategies):
+            score = scores.get(strategy)
+            if not score:
+                # Unknown strategy: neutral rate, keep its default position
+                candidates.append((0.5, float("inf"), position, strategy))
+                continue
+
+            attempts = score["attempts"]
+            successes = score["successes"]
+            last_attempt = score.get("last_attempt")
+            if (attempts >= Config.STRATEGY_SKIP_AFTER and successes == 0
+                    and last_attempt and last_attempt > retry_before):
+                continue  # Never succeeded for this domain, retried once the window passes
+
+            # Laplace-smoothed success rate, ties broken by mean latency
+            rate = (successes + 1) / (attempts + 2)
+            candidates.append((rate, score["total_ms"] / attempts, position, strategy))
+
+        if not candidates:
+            return list(strategies)
+
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        return [c[3] for c in candidates]
+
+    def get_scores(self, domain: str) -> Dict[str, Dict]:
+        """Get the scores recorded for a domain"""
+        return self._scores.get(domain, {})
+
+    async def flush(self):
+        """Persist pending increments"""
+        if not self._pending or self.db is None:
+            return
+
+        pending, self._pending = self._pending, {}
+        try:
+            await self.db.save_strategy_scores(pending)
+        except Exception as e:
+            logger.error(f"Error saving strategy scores: {e}")
+
+    async def _flush_loop(self):
+        """Persist scores periodically"""
+        while True:
+            await asyncio.sleep(Config.EVENT_FLUSH_INTERVAL)
+            await self.flush()
+
+# Global instance
+strategy_scoreboard = StrategyScoreboard()
@@ -0,0 +1,192 @@
+import logging
+import asyncio
+import weakref
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+from config import Config
+from database.mongodb import db
+from .core import LinkBypasser
+from .telemetry import event_recorder
+from monitoring.watchdog import label_task
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change where a link leads
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "yclid", "mc_cid", "mc_eid")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so equivalent links share one cache entry"""
+    url = url.strip()
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+
+    # Drop tracking parameters without re-encoding the rest
+    query = "&".join(
+        param for param in parts.query.split("&")
+        if param and not param.split("=", 1)[0].lower().startswith(TRACKING_PARAMS)
+    )
+    # The fragment stays: some hosts keep the file key there (mega.nz/file/ID#KEY)
+    return urlunsplit((scheme, host, parts.path or "/", query, parts.fragment))
+
+def unique_urls(urls: List[str]) -> List[str]:
+    """Canonical URLs in first-seen order, without duplicates"""
+    return list(dict.fromkeys(canonicalize_url(url) for url in urls))
+
+class BypassService:
+    """Cache-aware bypassing of one link or a batch of links"""
+
+    def __init__(self, bypasser: LinkBypasser = None, database=None):
+        self.bypasser = bypasser or LinkBypasser()
+        self.db = database or db
+        # client key -> semaphore, kept only while one of the client's batches runs
+        self._client_slots = weakref.WeakValueDictionary()
+
+    def _slots(self, client_key, concurrency: int) -> asyncio.Semaphore:
+        """Semaphore capping concurrent fresh bypasses for a user or API client"""
+        if client_key is None:
+            return asyncio.Semaphore(concurrency)
+        slots = self._client_slots.get(client_key)
+        if slots is None:
+            slots = asyncio.Semaphore(concurrency)
+            self._client_slots[client_key] = slots
+        return slots
+
+    @staticmethod
+    def _from_cache(url: str, cached: dict) -> Dict:
+        event_recorder.record_cache_hit(url, cached.get("bypass_type"))
+        return {
+            "success": True,
+            "url": url,
+            "bypassed_url": cached["bypassed_link"],
+            "type": cached.get("bypass_type", "unknown"),
+            "source": "cache"
+        }
+
+    async def _bypass_hop(self, url: str) -> Dict:
+        try:
+            return await self.bypasser.bypass(url)
+        except Exception as e:
+            logger.error(f"Error bypassing {url}: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    async def _bypass_fresh(self, url: str) -> Dict:
+        label_task(url=url)
+        result = await self._bypass_hop(url)
+        if not result["success"]:
+            return {**result, "url": url, "source": "fresh"}
+
+        # Shortener -> shortener -> host: bypass each hop the router handles,
+        # finishing from cache as soon as a hop was resolved before
+        chain = [url]
+        cached_hop = None
+        while True:
+            hop = canonicalize_url(result["bypassed_url"])
+            if not self.bypasser.is_chain_hop(hop, chain[-1]):
+                break
+            if hop in chain:
+                logger.warning(f"Link loop after {len(chain)} hops: {' -> '.join(chain + [hop])}")
+                return {"success": False, "url": url, "source": "fresh", "error": "Link loops back to an earlier link"}
+            if len(chain) > Config.CHAIN_MAX_HOPS:
+                # Too deep to finish; hand out where it got without caching it
+                logger.warning(f"Stopped following {url} after {len(chain) - 1} hops")
+                return {**result, "url": url, "source": "fresh", "hops": chain[1:]}
+            # A restricted site stays off limits when reached through a shortener
+            if await self.db.is_site_restricted(hop):
+                logger.info(f"Chain from {url} reached restricted {hop}")
+                return {"success": False, "url": url, "source": "fresh", "error": "Site restricted", "restricted": True}
+            chain.append(hop)
+
+            cached = await self.db.get_cached_link(hop)
+            if cached:
+                await self.db.increment_link_usage(hop)
+                event_recorder.record_cache_hit(hop, cached.get("bypass_type"))
+                result = {"success": True, "bypassed_url": cached["bypassed_link"], "type": cached.get("bypass_type", "unknown")}
+                cached_hop = hop
+                continue
+
+            hop_result = await self._bypass_hop(hop)
+            if not hop_result["success"]:
+                # The earlier hop's link still beats nothing; left uncached so it is retried
+                logger.info(f"Chain from {url} stopped at {hop}: {hop_result.get('error')}")
+                return {**result, "url": url, "source": "fresh", "hops": chain[1:]}
+            result = hop_result
+            cached_hop = None
+
+        # Every hop leads to the same link now, so later chains through any of them stop there
+        for link in chain:
+            if link != cached_hop:
+                await self.db.save_bypass_result(link, result["bypassed_url"], result.get("type", "unknown"))
+        if len(chain) > 1:
+            result = {**result, "hops": chain[1:]}
+        return {**result, "url": url, "source": "fresh"}
+
+    async def resolve(self, url: str) -> Dict:
+        """Bypass a link, serving it from cache when possible"""
+        url = canonicalize_url(url)
+        if await self.db.is_site_restricted(url):
+            return {"success": False, "url": url, "error": "Site restricted", "restricted": True}
+        cached = await self.db.get_cached_link(url)
+        if cached:
+            await self.db.increment_link_usage(url)
+            return self._from_cache(url, cached)
+        return await self._bypass_fresh(url)
+
+    async def resolve_many(self, urls: List[str], user_id=None,
+                           on_result: Callable[[int, Dict], Awaitable[None]] = None,
+                           concurrency: int = None) -> List[Dict]:
+        """Bypass many links: one cache lookup, misses bypassed concurrently
+
+        Results follow the order of the deduplicated canonical URLs; ``on_result``
+        is awaited with (index, result) as each one completes. ``user_id`` is any
+        key identifying the client whose fresh bypasses share ``concurrency`` slots.
+        """
+        urls = unique_urls(urls)
+        results: List[Optional[Dict]] = [None] * len(urls)
+
+        async def finish(index: int, result: Dict):
+            results[index] = result
+            if on_result:
+                try:
+                    await on_result(index, result)
+                except Exception as e:
+                    logger.error(f"Batch result callback error: {e}")
+
+        pending = []
+        for index, url in enumerate(urls):
+            if await self.db.is_site_restricted(url):
+                await finish(index, {"success": False, "url": url, "error": "Site restricted", "restricted": True})
+            else:
+                pending.append(index)
+
+        cached = await self.db.get_cached_links([urls[index] for index in pending])
+        if cached:
+            await self.db.increment_links_usage(list(cached))
+
+        misses = []
+        for index in pending:
+            if urls[index] in cached:
+                await finish(index, self._from_cache(urls[index], cached[urls[index]]))
+            else:
+                misses.append(index)
+
+        slots = self._slots(user_id, concurrency or Config.BATCH_USER_CONCURRENCY)
+
+        async def bypass_one(index: int):
+            async with slots:
+                result = await self._bypass_fresh(urls[index])
+            await finish(index, result)
+
+        await asyncio.gather(*(bypass_one(index) for index in misses))
+        return results
+
+# Global instance
+bypass_service = BypassService()
@@ -1,20 +1,23 @@
 import logging
 import re
-import requests
 from typing import Dict
 from urllib.parse import urlparse
+from ..http import new_session, fetch
 
 logger = logging.getLogger(__name__)
 
+# Default request timeout (seconds); hosts with latency history get a tighter one
+REQUEST_TIMEOUT = 20
+
 async def bypass(url: str, crypt: str) -> Dict:
     """Bypass GDToT links"""
     try:
         logger.info(f"Bypassing GDToT: {url}")
         
-        client = requests.Session()
+        client = new_session()
         client.cookies.update({'crypt': crypt})
         
-        res = client.get(url)
+        res = await fetch(client, 'GET', url, REQUEST_TIMEOUT)
         
         # Extract token from page
         token_match = re.findall(r'name="token" value="(.*?)"', res.text)
@@ -38,7 +41,7 @@ async def bypass(url: str, crypt: str) -> Dict:
             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         
-        response = client.post(post_url, data=data, headers=headers, allow_redirects=False)
+        response = await fetch(client, 'POST', post_url, REQUEST_TIMEOUT, data=data, headers=headers, allow_redirects=False)
         
         # Extract download URL from response
         if 'Location' in response.headers:
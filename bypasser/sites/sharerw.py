@@ -1,16 +1,19 @@
 import logging
 import re
-import requests
 from typing import Dict
+from ..http import new_session, fetch
 
 logger = logging.getLogger(__name__)
 
+# Default request timeout (seconds); hosts with latency history get a tighter one
+REQUEST_TIMEOUT = 20
+
 async def bypass(url: str, xsrf_token: str, laravel_session: str) -> Dict:
     """Bypass Sharer.pw links"""
     try:
         logger.info(f"Bypassing Sharer.pw: {url}")
         
-        client = requests.Session()
+        client = new_session()
         
         cookies = {
             'XSRF-TOKEN': xsrf_token,
@@ -25,7 +28,7 @@ async def bypass(url: str, xsrf_token: str, laravel_session: str) -> Dict:
         client.cookies.update(cookies)
         
         # Get page
-        response = client.get(url, headers=headers)
+        response = await fetch(client, 'GET', url, REQUEST_TIMEOUT, headers=headers)
         
         # Extract token
         token_match = re.findall(r'_token:\s*"([^"]+)"', response.text)
@@ -48,7 +51,7 @@ async def bypass(url: str, xsrf_token: str, laravel_session: str) -> Dict:
             'id': link_id
         }
         
-        api_response = client.post(api_url, data=data, headers=headers)
+        api_response = await fetch(client, 'POST', api_url, REQUEST_TIMEOUT, data=data, headers=headers)
         result = api_response.json()
         
         if result.get('status') == 'success':
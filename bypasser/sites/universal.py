@@ -1,19 +1,106 @@
 import logging
 import re
-import requests
 import time
-import base64
-from typing import Dict, List, Optional
-from bs4 import BeautifulSoup
+from typing import Callable, Dict, List, Optional
 from urllib.parse import urlparse, urljoin, parse_qs, unquote
 import js2py
+from config import Config
+from ..http import Page, new_session, fetch, fetch_page
+from ..health import HOST_ERRORS, CircuitOpenError
+from ..scanner import LinkScanner
+from ..patterns import (
+    CATEGORIES, ASSET, BASE64_URL, BASE64_TWICE_URL, DOWNLOAD_LINK, DOWNLOAD_LINK_BYTES, FILE_LINK,
+    MAX_BASE64_CANDIDATE, category, decode_base64_link, is_direct_link
+)
 
 logger = logging.getLogger(__name__)
 
-async def extract_direct_link(url: str) -> Dict:
-    """Try to extract direct download link from page using multiple methods"""
+# Default request timeout (seconds); hosts with latency history get a tighter one
+REQUEST_TIMEOUT = 15
+
+# Statuses meaning the link is dead rather than protected
+GONE_STATUSES = (404, 410)
+
+def found_file_link(chunk: bytes) -> bool:
+    """Early-stop check for fetch_page(): the chunk holds a complete direct file link"""
+    return any(is_direct_link(match.group().decode('ascii', 'ignore')) for match in DOWNLOAD_LINK_BYTES.finditer(chunk))
+
+def early_stop():
+    return found_file_link if Config.HTTP_EARLY_STOP else None
+
+def direct_file(url: str, kind: str) -> Dict:
+    """Result for a response that was already the file"""
+    return {
+        "success": True,
+        "bypassed_url": url,
+        "type": kind
+    }
+
+def gone(page: Page) -> Dict:
+    """Failed result for a page the host says no longer exists"""
+    return {"success": False, "error": f"Link not found or expired (HTTP {page.status_code})", "failure": "expired"}
+
+def request_failed(error: Exception) -> Dict:
+    """Failed result for an exception, marked when the host itself is unreachable"""
+    result = {"success": False, "error": str(error)}
+    if isinstance(error, HOST_ERRORS + (CircuitOpenError,)):
+        result["failure"] = "host_down"
+    return result
+
+# Direct extraction methods in their default order
+DIRECT_EXTRACTORS = [
+    'html_form', 'css_hidden', 'javascript', 'meta_refresh', 'iframe',
+    'base64', 'url_params', 'buttons', 'data_attributes', 'file_patterns'
+]
+
+def _file_link(match):
+    # First link per category in one pass; file_patterns tries categories in order
+    link = match.group()
+    return None if ASSET.search(link) else (category(match.group('ext')), link)
+
+def _base64_link(match) -> Optional[str]:
+    if match.end() - match.start() > MAX_BASE64_CANDIDATE:
+        return None
+    return decode_base64_link(match.group())
+
+def first_file_link(scan: LinkScanner) -> Optional[str]:
+    """File link of the first category the 'file' rule found"""
+    for kind in CATEGORIES:
+        link = scan.text_hits.get(f'file_{kind}')
+        if link:
+            return link
+    return None
+
+# Rules run over the raw page text while it streams (see LinkScanner)
+DIRECT_TEXT_RULES = {
+    # Links to files anywhere in the page, e.g. in hidden text
+    'css_hidden': (DOWNLOAD_LINK, lambda m: m.group()),
+    # Only runs that can decode to a link; long ones are skipped without slicing them out
+    'base64': (BASE64_URL, _base64_link),
+    'base64_twice': (BASE64_TWICE_URL, _base64_link),
+    'file': (FILE_LINK, _file_link),
+}
+GENERIC_TEXT_RULES = {
+    'file': (FILE_LINK, _file_link),
+}
+
+def link_scanner(text_rules=None):
+    """scan= factory for fetch_page(): a LinkScanner using is_direct_link"""
+    return lambda charset: LinkScanner(is_direct_link, text_rules, charset)
+
+async def extract_direct_link(
+    url: str,
+    order: Optional[Callable[[List[str]], List[str]]] = None,
+    on_attempt: Optional[Callable[[str, bool, float], None]] = None
+) -> Dict:
+    """Try to extract direct download link from page using multiple methods
+    
+    ``order`` may reorder or drop extractor names; ``on_attempt`` is called
+    with (name, success, duration_ms) after each extractor runs. The page is
+    scanned once while it streams in; the extractors pick from its candidates.
+    """
     try:
-        session = requests.Session()
+        session = new_session()
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -21,88 +108,70 @@ async def extract_direct_link(url: str) -> Dict:
             'Referer': url
         }
         
-        response = session.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.text, 'lxml')
-        
-        # Method 1: HTML Form Bypass
-        form_result = await extract_from_html_form(soup, url, session, headers)
-        if form_result["success"]:
-            return form_result
-        
-        # Method 2: CSS Hidden Elements
-        css_result = await extract_from_css_hidden(soup, url, response.text)
-        if css_result["success"]:
-            return css_result
-        
-        # Method 3: JavaScript Execution
-        js_result = await extract_from_javascript(soup, url, response.text)
-        if js_result["success"]:
-            return js_result
-        
-        # Method 4: Meta Refresh
-        meta_result = await extract_from_meta_refresh(soup, url)
-        if meta_result["success"]:
-            return meta_result
-        
-        # Method 5: iframe/embed extraction
-        iframe_result = await extract_from_iframe(soup, url)
-        if iframe_result["success"]:
-            return iframe_result
-        
-        # Method 6: Base64 encoded links
-        base64_result = await extract_from_base64(response.text, url)
-        if base64_result["success"]:
-            return base64_result
-        
-        # Method 7: URL parameter extraction
-        param_result = await extract_from_url_params(url, response.url)
-        if param_result["success"]:
-            return param_result
-        
-        # Method 8: Common download button selectors
-        button_result = await extract_from_buttons(soup, url)
-        if button_result["success"]:
-            return button_result
-        
-        # Method 9: Data attributes
-        data_result = await extract_from_data_attributes(soup, url)
-        if data_result["success"]:
-            return data_result
-        
-        # Method 10: File pattern matching
-        file_result = await extract_file_patterns(response.text)
-        if file_result["success"]:
-            return file_result
+        page = await fetch_page(session, url, REQUEST_TIMEOUT, headers=headers, stop=early_stop(), scan=link_scanner(DIRECT_TEXT_RULES))
+        if page.direct:
+            return direct_file(page.url, "direct_file")
+        if page.status_code in GONE_STATUSES:
+            return gone(page)
+        scan = page.scan
+        
+        extractors = {
+            # Method 1: HTML Form Bypass
+            'html_form': lambda: extract_from_html_form(scan, url, session, headers),
+            # Method 2: CSS Hidden Elements
+            'css_hidden': lambda: extract_from_css_hidden(scan, url),
+            # Method 3: JavaScript Execution
+            'javascript': lambda: extract_from_javascript(scan, url),
+            # Method 4: Meta Refresh
+            'meta_refresh': lambda: extract_from_meta_refresh(scan, url),
+            # Method 5: iframe/embed extraction
+            'iframe': lambda: extract_from_iframe(scan, url),
+            # Method 6: Base64 encoded links
+            'base64': lambda: extract_from_base64(scan, url),
+            # Method 7: URL parameter extraction
+            'url_params': lambda: extract_from_url_params(url, page.url),
+            # Method 8: Common download button selectors
+            'buttons': lambda: extract_from_buttons(scan, url),
+            # Method 9: Data attributes
+            'data_attributes': lambda: extract_from_data_attributes(scan, url),
+            # Method 10: File pattern matching
+            'file_patterns': lambda: extract_file_patterns(scan),
+        }
         
+        names = order(DIRECT_EXTRACTORS) if order else DIRECT_EXTRACTORS
+        for name in names:
+            started = time.perf_counter()
+            result = await extractors[name]()
+            if on_attempt:
+                on_attempt(name, result["success"], (time.perf_counter() - started) * 1000)
+            if result["success"]:
+                result["extractor"] = name
+                return result
+        
+        if scan.recaptcha:
+            return {"success": False, "error": "No direct link found, page has a reCAPTCHA", "failure": "recaptcha"}
         return {"success": False, "error": "No direct link found using any method"}
         
     except Exception as e:
         logger.error(f"Direct extraction error: {str(e)}")
-        return {"success": False, "error": str(e)}
+        return request_failed(e)
 
-async def extract_from_html_form(soup: BeautifulSoup, url: str, session, headers: dict) -> Dict:
+async def extract_from_html_form(scan: LinkScanner, url: str, session, headers: dict) -> Dict:
     """Extract link by submitting HTML forms"""
     try:
-        # Find all forms on the page
-        forms = soup.find_all('form')
-        
-        for form in forms:
+        for form in scan.forms:
             # Check if form likely leads to download
-            form_action = form.get('action', '')
-            form_method = form.get('method', 'get').lower()
+            form_action = form["action"]
+            form_method = form["method"]
             
             # Build form data
             form_data = {}
-            for input_tag in form.find_all('input'):
-                input_name = input_tag.get('name')
-                input_value = input_tag.get('value', '')
-                input_type = input_tag.get('type', 'text')
-                
+            for input_name, input_value, input_type, checked in form["inputs"]:
                 if input_name:
                     # Handle different input types
-                    if input_type == 'checkbox' and input_tag.has_attr('checked'):
+                    if input_type == 'checkbox' and checked:
                         form_data[input_name] = input_value or 'on'
-                    elif input_type == 'radio' and input_tag.has_attr('checked'):
+                    elif input_type == 'radio' and checked:
                         form_data[input_name] = input_value
                     elif input_type not in ['submit', 'button', 'reset', 'image']:
                         form_data[input_name] = input_value
@@ -112,9 +181,13 @@ async def extract_from_html_form(soup: BeautifulSoup, url: str, session, headers
             
             try:
                 if form_method == 'post':
-                    form_response = session.post(form_url, data=form_data, headers=headers, timeout=15, allow_redirects=True)
+                    form_response = await fetch_page(session, form_url, REQUEST_TIMEOUT, method='POST', data=form_data, headers=headers, allow_redirects=True, scan=link_scanner())
                 else:
-                    form_response = session.get(form_url, params=form_data, headers=headers, timeout=15, allow_redirects=True)
+                    form_response = await fetch_page(session, form_url, REQUEST_TIMEOUT, params=form_data, headers=headers, allow_redirects=True, scan=link_scanner())
+                
+                # The form answered with the file itself
+                if form_response.direct:
+                    return direct_file(form_response.url, "html_form")
                 
                 # Check if we got redirected to a download link
                 if form_response.url != url and is_direct_link(form_response.url):
@@ -125,10 +198,8 @@ async def extract_from_html_form(soup: BeautifulSoup, url: str, session, headers
                     }
                 
                 # Check response content for links
-                form_soup = BeautifulSoup(form_response.text, 'lxml')
-                download_link = form_soup.find('a', {'class': re.compile(r'download', re.I)})
-                if download_link and download_link.get('href'):
-                    link = urljoin(url, download_link['href'])
+                if form_response.scan.download_anchor:
+                    link = urljoin(url, form_response.scan.download_anchor)
                     return {
                         "success": True,
                         "bypassed_url": link,
@@ -143,50 +214,23 @@ async def extract_from_html_form(soup: BeautifulSoup, url: str, session, headers
         logger.error(f"HTML form extraction error: {str(e)}")
         return {"success": False, "error": str(e)}
 
-async def extract_from_css_hidden(soup: BeautifulSoup, url: str, html: str) -> Dict:
+async def extract_from_css_hidden(scan: LinkScanner, url: str) -> Dict:
     """Extract links hidden by CSS (display:none, visibility:hidden, etc)"""
     try:
-        # Find elements with CSS hiding
-        hidden_patterns = [
-            {'style': re.compile(r'display:\s*none', re.I)},
-            {'style': re.compile(r'visibility:\s*hidden', re.I)},
-            {'class': re.compile(r'hidden', re.I)},
-            {'class': 'd-none'},
-        ]
-        
-        for pattern in hidden_patterns:
-            hidden_elements = soup.find_all(attrs=pattern)
-            
-            for element in hidden_elements:
-                # Look for links in hidden elements
-                links = element.find_all('a', href=True)
-                for link in links:
-                    href = link.get('href')
-                    if href and is_direct_link(href):
-                        return {
-                            "success": True,
-                            "bypassed_url": urljoin(url, href),
-                            "type": "css_hidden"
-                        }
-                
-                # Check data attributes
-                for attr in element.attrs:
-                    if 'url' in attr.lower() or 'link' in attr.lower():
-                        value = element[attr]
-                        if is_direct_link(value):
-                            return {
-                                "success": True,
-                                "bypassed_url": urljoin(url, value),
-                                "type": "css_hidden"
-                            }
+        # Links and url/link attributes inside hidden elements
+        if scan.hidden_link:
+            return {
+                "success": True,
+                "bypassed_url": urljoin(url, scan.hidden_link),
+                "type": "css_hidden"
+            }
         
         # Check for CSS-hidden text containing URLs
-        url_pattern = r'https?://[^\s<>"\']+\.(mp4|mkv|avi|zip|rar|pdf|doc|docx|exe|apk)'
-        hidden_urls = re.findall(url_pattern, html, re.I)
-        if hidden_urls:
+        hidden_url = scan.text_hits.get('css_hidden')
+        if hidden_url:
             return {
                 "success": True,
-                "bypassed_url": hidden_urls[0],
+                "bypassed_url": hidden_url,
                 "type": "css_hidden"
             }
         
@@ -196,61 +240,25 @@ async def extract_from_css_hidden(soup: BeautifulSoup, url: str, html: str) -> D
         logger.error(f"CSS hidden extraction error: {str(e)}")
         return {"success": False, "error": str(e)}
 
-async def extract_from_javascript(soup: BeautifulSoup, url: str, html: str) -> Dict:
+async def extract_from_javascript(scan: LinkScanner, url: str) -> Dict:
     """Execute JavaScript to extract links"""
     try:
-        # Find all script tags
-        scripts = soup.find_all('script')
-        
-        for script in scripts:
-            if not script.string:
-                continue
-            
-            script_content = script.string
-            
-            # Method 1: Direct JavaScript URL assignment
-            js_patterns = [
-                r'window\.location\.href\s*=\s*["\']([^"\']+)["\']',
-                r'window\.location\s*=\s*["\']([^"\']+)["\']',
-                r'document\.location\.href\s*=\s*["\']([^"\']+)["\']',
-                r'location\.replace\(["\']([^"\']+)["\']\)',
-                r'location\.href\s*=\s*["\']([^"\']+)["\']',
-            ]
-            
-            for pattern in js_patterns:
-                matches = re.findall(pattern, script_content, re.I)
-                for match in matches:
-                    if is_direct_link(match):
-                        return {
-                            "success": True,
-                            "bypassed_url": urljoin(url, match),
-                            "type": "javascript"
-                        }
-            
-            # Method 2: Variable assignments containing URLs
-            var_patterns = [
-                r'var\s+\w+\s*=\s*["\']([^"\']+)["\']',
-                r'let\s+\w+\s*=\s*["\']([^"\']+)["\']',
-                r'const\s+\w+\s*=\s*["\']([^"\']+)["\']',
-            ]
-            
-            for pattern in var_patterns:
-                matches = re.findall(pattern, script_content)
-                for match in matches:
-                    if is_direct_link(match):
-                        return {
-                            "success": True,
-                            "bypassed_url": urljoin(url, match),
-                            "type": "javascript"
-                        }
+        # Script candidates in document order
+        for kind, value in scan.scripts:
+            # Method 1/2: URL assignments found while scanning
+            if kind == "link":
+                return {
+                    "success": True,
+                    "bypassed_url": urljoin(url, value),
+                    "type": "javascript"
+                }
             
             # Method 3: Try to execute simple JavaScript
-            try:
-                # Extract simple variable assignments
-                if 'downloadLink' in script_content or 'download_url' in script_content:
+            if kind == "exec":
+                try:
                     # Try js2py execution
                     context = js2py.EvalJs()
-                    context.execute(script_content)
+                    context.execute(value)
                     
                     # Check common variable names
                     var_names = ['downloadLink', 'download_url', 'fileUrl', 'directLink', 'url']
@@ -265,23 +273,18 @@ async def extract_from_javascript(soup: BeautifulSoup, url: str, html: str) -> D
                                 }
                         except:
                             continue
-            except:
-                pass
+                except:
+                    pass
             
             # Method 4: Atob (base64) decoding in JavaScript
-            atob_pattern = r'atob\(["\']([^"\']+)["\']\)'
-            atob_matches = re.findall(atob_pattern, script_content)
-            for encoded in atob_matches:
-                try:
-                    decoded = base64.b64decode(encoded).decode('utf-8')
-                    if is_direct_link(decoded):
-                        return {
-                            "success": True,
-                            "bypassed_url": urljoin(url, decoded),
-                            "type": "javascript_base64"
-                        }
-                except:
-                    continue
+            if kind == "atob":
+                decoded = decode_base64_link(value)
+                if decoded:
+                    return {
+                        "success": True,
+                        "bypassed_url": urljoin(url, decoded),
+                        "type": "javascript_base64"
+                    }
         
         return {"success": False, "error": "No JavaScript links found"}
         
@@ -289,14 +292,12 @@ async def extract_from_javascript(soup: BeautifulSoup, url: str, html: str) -> D
         logger.error(f"JavaScript extraction error: {str(e)}")
         return {"success": False, "error": str(e)}
 
-async def extract_from_meta_refresh(soup: BeautifulSoup, url: str) -> Dict:
+async def extract_from_meta_refresh(scan: LinkScanner, url: str) -> Dict:
     """Extract from meta refresh redirects"""
     try:
-        meta_refresh = soup.find('meta', attrs={'http-equiv': re.compile(r'refresh', re.I)})
-        if meta_refresh and meta_refresh.get('content'):
-            content = meta_refresh.get('content')
+        if scan.meta_refresh:
             # Extract URL from content (format: "5;url=http://example.com")
-            url_match = re.search(r'url\s*=\s*["\']?([^"\'\s]+)', content, re.I)
+            url_match = re.search(r'url\s*=\s*["\']?([^"\'\s]+)', scan.meta_refresh, re.I)
             if url_match:
                 redirect_url = url_match.group(1)
                 return {
@@ -310,40 +311,16 @@ async def extract_from_meta_refresh(soup: BeautifulSoup, url: str) -> Dict:
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-async def extract_from_iframe(soup: BeautifulSoup, url: str) -> Dict:
+async def extract_from_iframe(scan: LinkScanner, url: str) -> Dict:
     """Extract from iframes and embeds"""
     try:
-        # Check iframes
-        iframes = soup.find_all('iframe', src=True)
-        for iframe in iframes:
-            src = iframe.get('src')
-            if is_direct_link(src):
-                return {
-                    "success": True,
-                    "bypassed_url": urljoin(url, src),
-                    "type": "iframe"
-                }
-        
-        # Check embed tags
-        embeds = soup.find_all('embed', src=True)
-        for embed in embeds:
-            src = embed.get('src')
-            if is_direct_link(src):
-                return {
-                    "success": True,
-                    "bypassed_url": urljoin(url, src),
-                    "type": "embed"
-                }
-        
-        # Check object tags
-        objects = soup.find_all('object', data=True)
-        for obj in objects:
-            data = obj.get('data')
-            if is_direct_link(data):
+        # iframes first, then embed and object tags
+        for tag, kind in (('iframe', 'iframe'), ('embed', 'embed'), ('object', 'object')):
+            if tag in scan.embeds:
                 return {
                     "success": True,
-                    "bypassed_url": urljoin(url, data),
-                    "type": "object"
+                    "bypassed_url": urljoin(url, scan.embeds[tag]),
+                    "type": kind
                 }
         
         return {"success": False, "error": "No iframe/embed links found"}
@@ -351,24 +328,16 @@ async def extract_from_iframe(soup: BeautifulSoup, url: str) -> Dict:
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-async def extract_from_base64(html: str, url: str) -> Dict:
+async def extract_from_base64(scan: LinkScanner, url: str) -> Dict:
     """Extract base64 encoded links"""
     try:
-        # Pattern for base64 encoded strings
-        base64_pattern = r'[A-Za-z0-9+/]{20,}={0,2}'
-        matches = re.findall(base64_pattern, html)
-        
-        for match in matches:
-            try:
-                decoded = base64.b64decode(match).decode('utf-8', errors='ignore')
-                if is_direct_link(decoded):
-                    return {
-                        "success": True,
-                        "bypassed_url": decoded,
-                        "type": "base64"
-                    }
-            except:
-                continue
+        decoded = scan.text_hits.get('base64') or scan.text_hits.get('base64_twice')
+        if decoded:
+            return {
+                "success": True,
+                "bypassed_url": decoded,
+                "type": "base64"
+            }
         
         return {"success": False, "error": "No base64 links found"}
         
@@ -409,133 +378,55 @@ async def extract_from_url_params(original_url: str, final_url: str) -> Dict:
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-async def extract_from_buttons(soup: BeautifulSoup, url: str) -> Dict:
+async def extract_from_buttons(scan: LinkScanner, url: str) -> Dict:
     """Extract from download buttons with various selectors"""
     try:
-        # Common download button selectors
-        selectors = [
-            ('a', {'class': re.compile(r'download', re.I)}),
-            ('a', {'id': re.compile(r'download', re.I)}),
-            ('button', {'class': re.compile(r'download', re.I)}),
-            ('a', {'class': 'btn-primary'}),
-            ('a', {'class': 'btn-success'}),
-            ('a', {'role': 'button'}),
-            ('a', {'title': re.compile(r'download', re.I)}),
-        ]
-        
-        for tag, attrs in selectors:
-            elements = soup.find_all(tag, attrs)
-            for element in elements:
-                href = element.get('href')
-                if href and is_direct_link(href):
-                    return {
-                        "success": True,
-                        "bypassed_url": urljoin(url, href),
-                        "type": "button_extraction"
-                    }
-                
-                # Check onclick attribute
-                onclick = element.get('onclick', '')
-                if onclick:
-                    url_match = re.search(r'["\']([^"\']+)["\']', onclick)
-                    if url_match:
-                        potential_url = url_match.group(1)
-                        if is_direct_link(potential_url):
-                            return {
-                                "success": True,
-                                "bypassed_url": urljoin(url, potential_url),
-                                "type": "button_onclick"
-                            }
+        # First match of the highest priority selector
+        for index in sorted(scan.buttons):
+            kind, link = scan.buttons[index]
+            return {
+                "success": True,
+                "bypassed_url": urljoin(url, link),
+                "type": kind
+            }
         
         return {"success": False, "error": "No button links found"}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-async def extract_from_data_attributes(soup: BeautifulSoup, url: str) -> Dict:
+async def extract_from_data_attributes(scan: LinkScanner, url: str) -> Dict:
     """Extract from HTML5 data attributes"""
     try:
-        # Find all elements with data attributes
-        all_elements = soup.find_all(True)
-        
-        for element in all_elements:
-            for attr, value in element.attrs.items():
-                # Check data-* attributes
-                if attr.startswith('data-') and isinstance(value, str):
-                    if is_direct_link(value):
-                        return {
-                            "success": True,
-                            "bypassed_url": urljoin(url, value),
-                            "type": "data_attribute"
-                        }
+        if scan.data_link:
+            return {
+                "success": True,
+                "bypassed_url": urljoin(url, scan.data_link),
+                "type": "data_attribute"
+            }
         
         return {"success": False, "error": "No data attribute links found"}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-async def extract_file_patterns(html: str) -> Dict:
+async def extract_file_patterns(scan: LinkScanner) -> Dict:
     """Extract direct file links using pattern matching"""
     try:
-        # Comprehensive file extension patterns
-        file_patterns = [
-            r'https?://[^\s<>"\']+\.(?:mp4|mkv|avi|mov|flv|wmv|webm|m4v)',  # Video
-            r'https?://[^\s<>"\']+\.(?:mp3|wav|flac|aac|ogg|m4a|wma)',  # Audio
-            r'https?://[^\s<>"\']+\.(?:zip|rar|7z|tar|gz|bz2|xz)',  # Archives
-            r'https?://[^\s<>"\']+\.(?:pdf|doc|docx|xls|xlsx|ppt|pptx)',  # Documents
-            r'https?://[^\s<>"\']+\.(?:exe|msi|apk|dmg|deb|rpm)',  # Executables
-            r'https?://[^\s<>"\']+\.(?:jpg|jpeg|png|gif|bmp|webp|svg)',  # Images
-            r'https?://[^\s<>"\']+\.(?:iso|img|bin)',  # Disk images
-        ]
-        
-        for pattern in file_patterns:
-            matches = re.findall(pattern, html, re.IGNORECASE)
-            if matches:
-                # Return the first valid match
-                for match in matches:
-                    if not any(skip in match.lower() for skip in ['icon', 'logo', 'thumb', 'preview']):
-                        return {
-                            "success": True,
-                            "bypassed_url": match,
-                            "type": "file_pattern"
-                        }
+        # First link of the first category that has one
+        match = first_file_link(scan)
+        if match:
+            return {
+                "success": True,
+                "bypassed_url": match,
+                "type": "file_pattern"
+            }
         
         return {"success": False, "error": "No file patterns found"}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
 
-def is_direct_link(url: str) -> bool:
-    """Check if URL is a direct download link"""
-    if not url or not isinstance(url, str):
-        return False
-    
-    # Must be valid HTTP/HTTPS URL
-    if not url.startswith(('http://', 'https://')):
-        return False
-    
-    # Skip common non-download patterns
-    skip_patterns = [
-        'javascript:', 'mailto:', '#', 'void(0)',
-        'facebook.com', 'twitter.com', 'instagram.com',
-        'login', 'signin', 'register', 'signup',
-        'icon', 'logo', 'banner', 'ad'
-    ]
-    
-    url_lower = url.lower()
-    if any(pattern in url_lower for pattern in skip_patterns):
-        return False
-    
-    # Check for file extensions or download indicators
-    download_indicators = [
-        '.mp4', '.mkv', '.avi', '.zip', '.rar', '.pdf',
-        '.doc', '.docx', '.exe', '.apk', '.mp3', '.iso',
-        '/download/', '/get/', '/file/', '/direct/',
-        'download=', 'file=', 'url='
-    ]
-    
-    return any(indicator in url_lower for indicator in download_indicators)
-
 async def bypass_shortener(url: str, site_type: str) -> Dict:
     """Generic URL shortener bypass"""
     try:
@@ -544,9 +435,11 @@ async def bypass_shortener(url: str, site_type: str) -> Dict:
         }
         
         # Try to follow redirects
-        response = requests.get(url, headers=headers, allow_redirects=True, timeout=15)
+        response = await fetch_page(new_session(), url, REQUEST_TIMEOUT, headers=headers, allow_redirects=True, scan=link_scanner())
         
         final_url = response.url
+        if response.direct:
+            return direct_file(final_url, f"shortener_{site_type}")
         
         # Check if we got redirected to a different domain
         if urlparse(final_url).netloc != urlparse(url).netloc:
@@ -556,13 +449,9 @@ async def bypass_shortener(url: str, site_type: str) -> Dict:
                 "type": f"shortener_{site_type}"
             }
         
-        # Try to extract from page
-        soup = BeautifulSoup(response.text, 'lxml')
-        
         # Look for skip/continue buttons
-        skip_button = soup.find('a', {'id': ['skip_button', 'proceed', 'continue']})
-        if skip_button and skip_button.get('href'):
-            final_url = urljoin(url, skip_button['href'])
+        if response.scan.skip_anchor:
+            final_url = urljoin(url, response.scan.skip_anchor)
             return {
                 "success": True,
                 "bypassed_url": final_url,
@@ -591,7 +480,7 @@ async def bypass_uptobox(url: str, token: str = None) -> Dict:
         # Use Uptobox API
         api_url = f"https://uptobox.com/api/link?token={token}&file_code={file_id}"
         
-        response = requests.get(api_url, timeout=15)
+        response = await fetch(new_session(), 'GET', api_url, REQUEST_TIMEOUT)
         data = response.json()
         
         if data.get('statusCode') == 0:
@@ -619,7 +508,7 @@ async def bypass_terabox(url: str, cookie: str = None) -> Dict:
             'Cookie': f'ndus={cookie}'
         }
         
-        response = requests.get(url, headers=headers, timeout=15)
+        response = await fetch(new_session(), 'GET', url, REQUEST_TIMEOUT, headers=headers)
         
         # Extract download link from response
         dlink_match = re.search(r'"dlink":"([^"]+)"', response.text)
@@ -645,24 +534,20 @@ async def generic_bypass(url: str) -> Dict:
         }
         
         # Follow redirects and get final URL
-        response = requests.get(url, headers=headers, allow_redirects=True, timeout=15)
-        
-        # Try multiple extraction methods
-        soup = BeautifulSoup(response.text, 'lxml')
+        response = await fetch_page(new_session(), url, REQUEST_TIMEOUT, headers=headers, allow_redirects=True, stop=early_stop(), scan=link_scanner(GENERIC_TEXT_RULES))
+        if response.direct:
+            return direct_file(response.url, "generic_redirect")
+        if response.status_code in GONE_STATUSES:
+            return gone(response)
+        scan = response.scan
         
         # Method 1: Look for download links
-        download_links = soup.find_all('a', href=True)
-        for link in download_links:
-            href = link.get('href', '')
-            text = link.get_text(strip=True).lower()
-            
-            if any(word in text for word in ['download', 'get', 'fetch', 'retrieve']):
-                if href.startswith('http'):
-                    return {
-                        "success": True,
-                        "bypassed_url": href,
-                        "type": "generic"
-                    }
+        if scan.text_anchor:
+            return {
+                "success": True,
+                "bypassed_url": scan.text_anchor,
+                "type": "generic"
+            }
         
         # Method 2: Check if final URL is different
         if response.url != url:
@@ -673,16 +558,11 @@ async def generic_bypass(url: str) -> Dict:
             }
         
         # Method 3: Look for file links in page source
-        file_urls = re.findall(
-            r'https?://[^\s<>"]+?\.(?:mp4|mkv|avi|mp3|zip|rar|pdf|doc|docx|exe|apk|jpg|png)',
-            response.text,
-            re.IGNORECASE
-        )
-        
-        if file_urls:
+        file_url = first_file_link(scan)
+        if file_url:
             return {
                 "success": True,
-                "bypassed_url": file_urls[0],
+                "bypassed_url": file_url,
                 "type": "generic_file"
             }
         
@@ -690,7 +570,7 @@ async def generic_bypass(url: str) -> Dict:
         
     except Exception as e:
         logger.error(f"Generic bypass error: {str(e)}")
-        return {"success": False, "error": str(e)}
+        return request_failed(e)
 
 # Alternative methods when credentials are not available
 
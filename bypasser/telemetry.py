@@ -0,0 +1,185 @@
+import logging
+import time
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from config import Config
+from monitoring.metrics import observe_bypass
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram kept per domain and hour.
+# Percentiles are estimated from these buckets, so the aggregates never
+# need the raw events.
+LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000]
+
+def get_event_domain(url: str) -> str:
+    """Normalized domain used as the aggregation key"""
+    try:
+        domain = urlparse(url).netloc.lower()
+        return domain[4:] if domain.startswith('www.') else domain
+    except Exception:
+        return ""
+
+def latency_bucket(duration_ms: float) -> str:
+    """Histogram bucket label for a duration"""
+    for bound in LATENCY_BUCKETS_MS:
+        if duration_ms <= bound:
+            return str(bound)
+    return "inf"
+
+def estimate_percentile(buckets: Dict[str, int], percentile: float) -> Optional[float]:
+    """Estimate a latency percentile (ms) from histogram bucket counts"""
+    total = sum(buckets.values())
+    if not total:
+        return None
+
+    target = total * percentile
+    seen = 0
+    lower = 0
+    for bound in LATENCY_BUCKETS_MS + [None]:
+        key = str(bound) if bound is not None else "inf"
+        count = buckets.get(key, 0)
+        if count and seen + count >= target:
+            if bound is None:
+                return float(lower)
+            # Interpolate linearly inside the bucket
+            return lower + (bound - lower) * (target - seen) / count
+        seen += count
+        if bound is not None:
+            lower = bound
+    return float(lower)
+
+class BypassTrace:
+    """Collects timings and outcome of a single bypass"""
+
+    def __init__(self, url: str, site_type: Optional[str] = None):
+        self.url = url
+        self.domain = get_event_domain(url)
+        self.site_type = site_type
+        self.strategy = None
+        self.success = False
+        self.cache_hit = False
+        self.error = None
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._duration_ms = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a named stage of the bypass"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[name] = round(self.stages.get(name, 0) + elapsed, 1)
+
+    def finish(self, result: Dict) -> Dict:
+        """Record the outcome from a bypass result dict"""
+        self._duration_ms = (time.perf_counter() - self._started) * 1000
+        self.success = bool(result.get("success"))
+        if self.success:
+            self.strategy = self.strategy or result.get("type")
+        else:
+            self.error = str(result.get("error", ""))[:200]
+        return result
+
+    @property
+    def duration_ms(self) -> float:
+        if self._duration_ms is not None:
+            return self._duration_ms
+        return (time.perf_counter() - self._started) * 1000
+
+    def to_event(self) -> Dict:
+        """Compact document stored in the event log"""
+        event = {
+            "ts": datetime.utcnow(),
+            "domain": self.domain,
+            "site_type": self.site_type or "unknown",
+            "strategy": self.strategy or "none",
+            "success": self.success,
+            "cache_hit": self.cache_hit,
+            "duration_ms": round(self.duration_ms, 1),
+            "stages": self.stages
+        }
+        if self.error:
+            event["error"] = self.error
+        return event
+
+class EventRecorder:
+    """Buffers bypass events and writes them to MongoDB in batches"""
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None, max_buffer: int = 10000):
+        self.batch_size = batch_size or Config.EVENT_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.EVENT_FLUSH_INTERVAL
+        self.max_buffer = max_buffer
+        self.db = None
+        self.dropped = 0
+        self._buffer: List[Dict] = []
+        self._wakeup = None
+        self._task = None
+
+    async def start(self, db):
+        """Start the background writer"""
+        self.db = db
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Bypass event recorder started")
+
+    async def stop(self):
+        """Stop the writer and flush what is left"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(self, trace: BypassTrace):
+        """Queue an event; never blocks and never does I/O"""
+        observe_bypass(trace)
+        if self.db is None:
+            return  # Writer not started in this process
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append(trace.to_event())
+        if self._wakeup and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def record_cache_hit(self, url: str, bypass_type: str = None):
+        """Queue an event for a result served from the link cache"""
+        trace = BypassTrace(url, site_type="cache")
+        trace.cache_hit = True
+        trace.strategy = bypass_type
+        trace.finish({"success": True})
+        self.record(trace)
+
+    async def flush(self):
+        """Write all buffered events"""
+        if not self._buffer or self.db is None:
+            return
+
+        batch, self._buffer = self._buffer, []
+        try:
+            await self.db.insert_bypass_events(batch)
+        except Exception as e:
+            logger.error(f"Error writing bypass events: {e}")
+
+    async def _flush_loop(self):
+        """Flush on interval or as soon as a batch is full"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+# Global instance
+event_recorder = EventRecorder()
@@ -0,0 +1,215 @@
+import io
+import os
+import gzip
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from http.client import HTTPMessage
+from typing import Dict, List, Optional
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Headers describing the wire encoding; cassettes store decoded bodies
+WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+def _body_digest(body) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, str):
+        body = body.encode()
+    if not isinstance(body, bytes):
+        return "stream"
+    return hashlib.sha256(body).hexdigest()[:16]
+
+def request_key(method: str, url: str, body=None) -> str:
+    """Key matching a replayed request to a recorded one"""
+    return f"{method.upper()} {url} {_body_digest(body)}"
+
+class Cassette:
+    """Recorded HTTP exchanges, one JSON line each (gzip when the path ends in .gz)
+
+    Exchanges are appended as they happen, so recording stays linear and a
+    crash loses nothing already recorded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions: List[Dict] = []
+        self._lock = threading.Lock()
+        # request key -> responses in recorded order, and how many were served
+        self._index: Dict[str, List[Dict]] = {}
+        self._served: Dict[str, int] = {}
+        if os.path.exists(path):
+            self.load()
+
+    def _open(self, mode: str):
+        return gzip.open(self.path, mode + "t") if self.path.endswith(".gz") else open(self.path, mode)
+
+    def load(self):
+        with self._open("r") as f:
+            self.interactions = [json.loads(line) for line in f if line.strip()]
+        self._index.clear()
+        self._served.clear()
+        for interaction in self.interactions:
+            self._index.setdefault(interaction["key"], []).append(interaction["response"])
+        logger.info(f"Loaded {len(self.interactions)} HTTP interactions from {self.path}")
+
+    def _append(self, interaction: Dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # gzip appends a new member; readers see one continuous stream
+        with self._open("a") as f:
+            f.write(json.dumps(interaction) + "\n")
+
+    @staticmethod
+    def _read_body(response: requests.Response):
+        """Body to record, read the way read_page() would: files not at all, pages up to the cap"""
+        # bypasser.http imports this module
+        from .http import is_download
+        if is_download(response):
+            return b"", True
+
+        limit = Config.HTTP_MAX_PAGE_BYTES
+        chunks, size = [], 0
+        for chunk in response.iter_content(Config.HTTP_READ_CHUNK):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > limit:
+                break
+        content = b"".join(chunks)
+        # The caller reads the same bytes from memory
+        response._content = content
+        response._content_consumed = True
+        # One byte past the cap, so read_page() marks the replayed page truncated too
+        return content[:limit + 1], size > limit
+
+    def record(self, request: requests.PreparedRequest, response: requests.Response):
+        """Store one exchange; called for every hop of a redirect chain"""
+        # Raw headers keep repeated Set-Cookie lines apart
+        source = response.raw.headers if response.raw is not None else response.headers
+        headers = [[name, value] for name, value in source.items() if name.lower() not in WIRE_HEADERS]
+        body, truncated = self._read_body(response)
+        interaction = {
+            "key": request_key(request.method, request.url, request.body),
+            "request": {"method": request.method, "url": request.url},
+            "response": {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": headers,
+                "body": base64.b64encode(body).decode(),
+                "truncated": truncated
+            }
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+            self._index.setdefault(interaction["key"], []).append(interaction["response"])
+            self._append(interaction)
+
+    def find(self, request: requests.PreparedRequest) -> Optional[Dict]:
+        """Next recorded response for a request; the last one repeats once exhausted"""
+        key = request_key(request.method, request.url, request.body)
+        with self._lock:
+            responses = self._index.get(key)
+            if not responses:
+                return None
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return responses[min(served, len(responses) - 1)]
+
+class _OriginalResponse:
+    """What requests reads Set-Cookie headers from"""
+
+    def __init__(self, headers: List[List[str]]):
+        self.msg = HTTPMessage()
+        for name, value in headers:
+            self.msg[name] = value
+
+    def isclosed(self):
+        return True
+
+class RecordingAdapter(BaseAdapter):
+    """Sends through the wrapped adapter and records each exchange"""
+
+    def __init__(self, adapter: BaseAdapter, cassette: Cassette):
+        super().__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        try:
+            self.cassette.record(request, response)
+        except Exception as e:
+            logger.error(f"Failed to record {request.method} {request.url}: {e}")
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+class ReplayAdapter(HTTPAdapter):
+    """Serves recorded responses without touching the network"""
+
+    def __init__(self, cassette: Cassette, latency: float = 0):
+        super().__init__()
+        self.cassette = cassette
+        self.latency = latency
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        recorded = self.cassette.find(request)
+        if recorded is None:
+            raise requests.ConnectionError(f"No recorded response for {request.method} {request.url}", request=request)
+
+        if self.latency:
+            # Runs on an executor thread, like a real request
+            time.sleep(self.latency)
+
+        body = base64.b64decode(recorded["body"])
+        headers = HTTPHeaderDict()
+        for name, value in recorded["headers"]:
+            headers.add(name, value)
+        headers["Content-Length"] = str(len(body))
+
+        raw = HTTPResponse(
+            body=io.BytesIO(body),
+            headers=headers,
+            status=recorded["status"],
+            reason=recorded.get("reason"),
+            preload_content=False,
+            decode_content=False,
+            original_response=_OriginalResponse(recorded["headers"])
+        )
+        return self.build_response(request, raw)
+
+_cassette: Optional[Cassette] = None
+
+def get_cassette() -> Cassette:
+    """The process-wide cassette named by HTTP_CASSETTE"""
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette(Config.HTTP_CASSETTE)
+    return _cassette
+
+def wrap_adapter(adapter: BaseAdapter) -> BaseAdapter:
+    """Adapter for HTTP_TRANSPORT_MODE: live, record or replay"""
+    mode = Config.HTTP_TRANSPORT_MODE
+    if mode == "record":
+        return RecordingAdapter(adapter, get_cassette())
+    if mode == "replay":
+        return ReplayAdapter(get_cassette(), Config.HTTP_REPLAY_LATENCY / 1000)
+    return adapter
+
+def install(session: requests.Session):
+    """Route a session that has its own adapters (e.g. cloudscraper) through the transport"""
+    if Config.HTTP_TRANSPORT_MODE == "live":
+        return
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, wrap_adapter(session.get_adapter(prefix)))
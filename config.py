@@ -16,19 +16,34 @@ class Config:
     MONGODB_URI = os.environ.get("MONGODB_URI", "")
     DATABASE_NAME = os.environ.get("DATABASE_NAME", "link_bypasser_db")
     
-    # Flask Configuration
+    # Web Configuration
     FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY", "your-secret-key-here")
     PORT = int(os.environ.get("PORT", 5000))
-    WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+    RUN_WEB_SERVER = os.environ.get("RUN_WEB_SERVER", "True").lower() == "true"  # Serve the API from main.py
+    API_BATCH_MAX_URLS = int(os.environ.get("API_BATCH_MAX_URLS", "1000"))  # URLs per /api/bypass/batch request
+    API_BATCH_CONCURRENCY = int(os.environ.get("API_BATCH_CONCURRENCY", "10"))  # Fresh bypasses running per API client
+    API_KEYS_REQUIRED = os.environ.get("API_KEYS_REQUIRED", "True").lower() == "true"  # Bypass endpoints need a key
+    API_KEY_CACHE_TTL = float(os.environ.get("API_KEY_CACHE_TTL", "60"))  # Seconds a key lookup is cached
+    API_FREE_RATE = float(os.environ.get("API_FREE_RATE", "0.2"))  # Requests per second, free key owners
+    API_FREE_BURST = float(os.environ.get("API_FREE_BURST", "5"))  # Bucket size, free key owners
+    API_PREMIUM_RATE = float(os.environ.get("API_PREMIUM_RATE", "5"))  # Requests per second, premium key owners
+    API_PREMIUM_BURST = float(os.environ.get("API_PREMIUM_BURST", "50"))  # Bucket size, premium key owners
     
     # Force Subscription Configuration
     FORCE_SUB_CHANNEL = os.environ.get("FORCE_SUB_CHANNEL", "")  # Channel username with @
     FORCE_SUB_GROUP = os.environ.get("FORCE_SUB_GROUP", "")  # Group username with @
+    MEMBERSHIP_CACHE_TTL = int(os.environ.get("MEMBERSHIP_CACHE_TTL", "21600"))  # Seconds a confirmed member is trusted
+    MEMBERSHIP_NEGATIVE_TTL = int(os.environ.get("MEMBERSHIP_NEGATIVE_TTL", "60"))  # Seconds a non-member result is kept
     
     # Rate Limiting Configuration
     FREE_USER_LIMIT = int(os.environ.get("FREE_USER_LIMIT", "10"))  # Links per day
     PREMIUM_USER_LIMIT = int(os.environ.get("PREMIUM_USER_LIMIT", "-1"))  # -1 = unlimited
     
+    # Batch Bypass
+    BATCH_MAX_LINKS = int(os.environ.get("BATCH_MAX_LINKS", "50"))  # Links handled per message
+    BATCH_USER_CONCURRENCY = int(os.environ.get("BATCH_USER_CONCURRENCY", "3"))  # Fresh bypasses running per user
+    BATCH_EDIT_INTERVAL = float(os.environ.get("BATCH_EDIT_INTERVAL", "3"))  # Seconds between progress edits
+    
     # Bot Working Mode
     WORK_IN_GROUPS_ONLY = os.environ.get("WORK_IN_GROUPS_ONLY", "False").lower() == "true"
     
@@ -46,19 +61,84 @@ class Config:
     
     # Cache Configuration
     CACHE_EXPIRY_DAYS = int(os.environ.get("CACHE_EXPIRY_DAYS", "30"))
+    REDIS_URL = os.environ.get("REDIS_URL", "")  # Optional, in-process cache is used when unset
+    LINK_CACHE_TTL = int(os.environ.get("LINK_CACHE_TTL", "3600"))  # Seconds a link stays in the hot cache
+    SHARED_CACHE_MAX_ITEMS = int(os.environ.get("SHARED_CACHE_MAX_ITEMS", "10000"))  # In-process cache size
+    SINGLEFLIGHT_LOCK_TTL = float(os.environ.get("SINGLEFLIGHT_LOCK_TTL", "120"))  # Max seconds a bypass holds its lock
+    SINGLEFLIGHT_RESULT_TTL = float(os.environ.get("SINGLEFLIGHT_RESULT_TTL", "60"))  # Seconds waiters can read a result
     
     # Logging
     LOG_CHANNEL = os.environ.get("LOG_CHANNEL", "")  # Channel ID for logging
     
+    # Bypass Event Log
+    EVENT_LOG_RETENTION_DAYS = int(os.environ.get("EVENT_LOG_RETENTION_DAYS", "14"))  # Raw events kept
+    EVENT_BATCH_SIZE = int(os.environ.get("EVENT_BATCH_SIZE", "100"))  # Events per write
+    EVENT_FLUSH_INTERVAL = float(os.environ.get("EVENT_FLUSH_INTERVAL", "5"))  # Seconds between writes
+    ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY", "")  # Key for admin-only web endpoints
+    
+    # Metrics
+    METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))  # Bot-only /metrics port when the web API is off
+    LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.5"))  # Seconds between event loop lag samples
+    WATCHDOG_ENABLED = os.environ.get("WATCHDOG_ENABLED", "True").lower() == "true"  # Log stacks of loop stalls
+    LOOP_STALL_THRESHOLD = float(os.environ.get("LOOP_STALL_THRESHOLD", "1"))  # Seconds blocked before reporting
+    WATCHDOG_CHECK_INTERVAL = float(os.environ.get("WATCHDOG_CHECK_INTERVAL", "0.25"))  # Watchdog thread period
+    WATCHDOG_STACK_DEPTH = int(os.environ.get("WATCHDOG_STACK_DEPTH", "15"))  # Frames logged per stall
+    
+    # Adaptive Strategy Ordering
+    STRATEGY_SKIP_AFTER = int(os.environ.get("STRATEGY_SKIP_AFTER", "5"))  # Failures before a strategy is skipped
+    STRATEGY_RETRY_HOURS = int(os.environ.get("STRATEGY_RETRY_HOURS", "24"))  # Skipped strategies are retried after this
+    
+    # Negative Cache (seconds a failed link is answered without a bypass, 0 = off)
+    NEGATIVE_TTL_EXPIRED = int(os.environ.get("NEGATIVE_TTL_EXPIRED", "21600"))  # Link returned 404/410
+    NEGATIVE_TTL_RECAPTCHA = int(os.environ.get("NEGATIVE_TTL_RECAPTCHA", "3600"))  # Page needs a reCAPTCHA solved
+    NEGATIVE_TTL_HOST_DOWN = int(os.environ.get("NEGATIVE_TTL_HOST_DOWN", "120"))  # Host refused or timed out
+    NEGATIVE_TTL_UNSUPPORTED = int(os.environ.get("NEGATIVE_TTL_UNSUPPORTED", "900"))  # Every strategy found nothing
+    
+    # Shortener Chains
+    CHAIN_MAX_HOPS = int(os.environ.get("CHAIN_MAX_HOPS", "5"))  # Links bypassed after the first one
+    
+    # Shared HTTP and Browser Pools
+    HTTP_EXECUTOR_WORKERS = int(os.environ.get("HTTP_EXECUTOR_WORKERS", "32"))  # Threads for blocking requests
+    HTTP_TRANSPORT_MODE = os.environ.get("HTTP_TRANSPORT_MODE", "live").lower()  # live, record or replay
+    HTTP_CASSETTE = os.environ.get("HTTP_CASSETTE", "cassettes/http.jsonl")  # Recorded exchanges (.jsonl or .jsonl.gz)
+    HTTP_REPLAY_LATENCY = float(os.environ.get("HTTP_REPLAY_LATENCY", "0"))  # Milliseconds added per replayed request
+    HTTP_POOL_HOSTS = int(os.environ.get("HTTP_POOL_HOSTS", "100"))  # Hosts with pooled connections
+    HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "20"))  # Keep-alive connections per host
+    HTTP_MAX_PAGE_BYTES = int(os.environ.get("HTTP_MAX_PAGE_BYTES", str(2 * 1024 * 1024)))  # Page bytes read before giving up on the rest
+    HTTP_READ_CHUNK = int(os.environ.get("HTTP_READ_CHUNK", "65536"))  # Bytes per streamed read
+    HTTP_EARLY_STOP = os.environ.get("HTTP_EARLY_STOP", "True").lower() == "true"  # Stop reading a page once a file link shows up
+    PREFLIGHT_ENABLED = os.environ.get("PREFLIGHT_ENABLED", "True").lower() == "true"  # HEAD-check links for a direct file first
+    PREFLIGHT_TIMEOUT = float(os.environ.get("PREFLIGHT_TIMEOUT", "5"))  # Seconds for the pre-flight request
+    BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))  # Headless browsers per process
+    BROWSER_MAX_USES = int(os.environ.get("BROWSER_MAX_USES", "50"))  # Bypasses before a browser is restarted
+    BROWSER_PAGE_TIMEOUT = int(os.environ.get("BROWSER_PAGE_TIMEOUT", "60"))  # Seconds for a browser page load
+    
+    # Host Health / Circuit Breaker
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))  # Consecutive failures to open
+    CIRCUIT_COOLDOWN = float(os.environ.get("CIRCUIT_COOLDOWN", "60"))  # Seconds before a half-open probe
+    HOST_LATENCY_SAMPLES = int(os.environ.get("HOST_LATENCY_SAMPLES", "100"))  # Latencies kept per host
+    HOST_MIN_SAMPLES = int(os.environ.get("HOST_MIN_SAMPLES", "10"))  # Samples before timeouts adapt
+    HOST_TIMEOUT_MULTIPLIER = float(os.environ.get("HOST_TIMEOUT_MULTIPLIER", "3"))  # Timeout = p95 x this
+    HOST_TIMEOUT_MIN = float(os.environ.get("HOST_TIMEOUT_MIN", "3"))  # Lower bound for adaptive timeouts
+    
+    # Bypass Jobs (POST /api/jobs)
+    JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", "4"))  # Jobs run at once per worker process
+    JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "2"))  # Seconds between queue polls when idle
+    JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "300"))  # A running job is retried after this
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))  # Attempts before a job is failed
+    JOB_RETENTION_HOURS = int(os.environ.get("JOB_RETENTION_HOURS", "24"))  # Finished jobs kept this long
+    JOB_CALLBACK_TIMEOUT = float(os.environ.get("JOB_CALLBACK_TIMEOUT", "10"))  # Seconds per webhook callback
+    JOB_CALLBACK_RETRIES = int(os.environ.get("JOB_CALLBACK_RETRIES", "3"))  # Webhook callback attempts
+    
+    # Admin-managed Lists
+    ADMIN_SETS_POLL_INTERVAL = int(os.environ.get("ADMIN_SETS_POLL_INTERVAL", "30"))  # Seconds between reloads without change streams
+    
     # Referral System
     REFERRAL_ENABLED = os.environ.get("REFERRAL_ENABLED", "True").lower() == "true"
     REFERRAL_BONUS_LINKS = int(os.environ.get("REFERRAL_BONUS_LINKS", "5"))  # Bonus links per referral
     REFERRAL_BONUS_DURATION_DAYS = int(os.environ.get("REFERRAL_BONUS_DURATION_DAYS", "1"))  # Bonus validity
     MIN_REFERRALS_FOR_PREMIUM = int(os.environ.get("MIN_REFERRALS_FOR_PREMIUM", "10"))  # Refs for 1 day premium
     
-    # Webhook Configuration
-    USE_WEBHOOK = os.environ.get("USE_WEBHOOK", "False").lower() == "true"
-    
     # Feedback System
     FEEDBACK_CHANNEL = os.environ.get("FEEDBACK_CHANNEL", "")  # Channel for user feedback
     
@@ -0,0 +1,182 @@
+import logging
+import asyncio
+from typing import Any, Callable, Dict, List, Set
+from urllib.parse import urlparse
+from pymongo.errors import OperationFailure
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Change events that leave nothing to apply incrementally
+RELOAD_EVENTS = ("drop", "rename", "dropDatabase", "invalidate")
+
+def normalize_domain(domain: str) -> str:
+    """Lowercase host of a domain or URL, without port and www."""
+    domain = domain.strip().lower()
+    if "//" in domain:
+        domain = urlparse(domain).netloc
+    domain = domain.split("/")[0].split(":")[0].rstrip(".")
+    return domain[4:] if domain.startswith("www.") else domain
+
+class WatchedSet:
+    """Keys of the active documents of one collection"""
+
+    def __init__(self, collection: str, key: str, query: dict,
+                 is_active: Callable[[dict], bool], pipeline: List[dict] = None,
+                 normalize: Callable[[Any], Any] = None):
+        self.collection = collection
+        self.key = key
+        self.query = query
+        self.is_active = is_active
+        self.pipeline = pipeline or []
+        self.normalize = normalize or (lambda value: value)
+        self.members: Set = set()
+        # Document _id -> key, so deletes (which carry only the _id) can be applied
+        self._ids: Dict[Any, Any] = {}
+
+    def load(self, docs: List[dict]):
+        """Replace the members with a full query result"""
+        ids = {doc["_id"]: self.normalize(doc[self.key]) for doc in docs if doc.get(self.key) is not None}
+        self._ids = ids
+        self.members = set(ids.values())
+
+    def add(self, value):
+        self.members.add(self.normalize(value))
+
+    def discard(self, value):
+        self.members.discard(self.normalize(value))
+
+    def apply(self, change: dict) -> bool:
+        """Apply a change event; False when the set must be reloaded"""
+        operation = change.get("operationType")
+        if operation in RELOAD_EVENTS:
+            return False
+
+        _id = change.get("documentKey", {}).get("_id")
+        previous = self._ids.pop(_id, None)
+        if previous is not None:
+            self.members.discard(previous)
+
+        doc = change.get("fullDocument")
+        if operation != "delete" and doc and self.is_active(doc) and doc.get(self.key) is not None:
+            value = self.normalize(doc[self.key])
+            self._ids[_id] = value
+            self.members.add(value)
+        return True
+
+class AdminSets:
+    """Admin-managed lists kept in memory and synced from MongoDB"""
+
+    def __init__(self):
+        self.db = None
+        self.ready = False
+        self.restricted_sites = WatchedSet(
+            "restricted_sites", "domain", {"is_active": True},
+            lambda doc: doc.get("is_active", False), normalize=normalize_domain
+        )
+        self.allowed_groups = WatchedSet(
+            "allowed_groups", "group_id", {"is_active": True},
+            lambda doc: doc.get("is_active", False)
+        )
+        self.banned_users = WatchedSet(
+            "users", "user_id", {"is_banned": True},
+            lambda doc: doc.get("is_banned", False),
+            # Only ban changes, not the usage counters updated on every bypass
+            pipeline=[{"$match": {"$or": [
+                {"operationType": {"$nin": ["update"]}},
+                {"updateDescription.updatedFields.is_banned": {"$exists": True}}
+            ]}}]
+        )
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def _sets(self) -> List[WatchedSet]:
+        return [self.restricted_sites, self.allowed_groups, self.banned_users]
+
+    async def start(self, db):
+        """Load every set and start syncing them"""
+        self.db = db
+        try:
+            for watched in self._sets:
+                await self._reload(watched)
+            self.ready = True
+            logger.info(
+                f"Admin sets loaded: {len(self.restricted_sites.members)} restricted sites, "
+                f"{len(self.allowed_groups.members)} allowed groups, "
+                f"{len(self.banned_users.members)} banned users"
+            )
+        except Exception as e:
+            # Checks keep querying MongoDB until the sets are available
+            logger.error(f"Error loading admin sets: {e}")
+            return
+        self._tasks = [asyncio.create_task(self._sync(watched)) for watched in self._sets]
+
+    async def stop(self):
+        """Stop syncing"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.ready = False
+
+    async def _reload(self, watched: WatchedSet):
+        collection = self.db.db[watched.collection]
+        docs = await collection.find(watched.query, {watched.key: 1}).to_list(length=None)
+        watched.load(docs)
+
+    async def _sync(self, watched: WatchedSet):
+        """Follow the collection's change stream, or poll where it is unsupported"""
+        collection = self.db.db[watched.collection]
+        while True:
+            try:
+                async with collection.watch(watched.pipeline, full_document="updateLookup") as stream:
+                    # Catch changes made between the initial load and the stream opening
+                    await self._reload(watched)
+                    async for change in stream:
+                        if not watched.apply(change):
+                            await self._reload(watched)
+            except asyncio.CancelledError:
+                raise
+            except (OperationFailure, NotImplementedError) as e:
+                # Standalone servers have no change streams
+                logger.info(
+                    f"Change streams unavailable for {watched.collection} ({e}), "
+                    f"polling every {Config.ADMIN_SETS_POLL_INTERVAL}s"
+                )
+                await self._poll(watched)
+                return
+            except Exception as e:
+                logger.error(f"Change stream error for {watched.collection}: {e}")
+                await asyncio.sleep(Config.ADMIN_SETS_POLL_INTERVAL)
+                try:
+                    await self._reload(watched)
+                except Exception as e:
+                    logger.error(f"Error reloading {watched.collection}: {e}")
+
+    async def _poll(self, watched: WatchedSet):
+        while True:
+            await asyncio.sleep(Config.ADMIN_SETS_POLL_INTERVAL)
+            try:
+                await self._reload(watched)
+            except Exception as e:
+                logger.error(f"Error polling {watched.collection}: {e}")
+
+    # Checks
+    def is_site_restricted(self, url: str) -> bool:
+        """Whether the URL's host or any parent domain is restricted"""
+        labels = normalize_domain(url).split(".")
+        members = self.restricted_sites.members
+        return any(".".join(labels[i:]) in members for i in range(len(labels)))
+
+    def is_group_allowed(self, group_id: int) -> bool:
+        return group_id in self.allowed_groups.members
+
+    def is_user_banned(self, user_id: int) -> bool:
+        return user_id in self.banned_users.members
+
+# Global instance
+admin_sets = AdminSets()
@@ -0,0 +1,301 @@
+import logging
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """In-process key/value store used when REDIS_URL is not set"""
+
+    def __init__(self, max_items: int = 10000):
+        self.max_items = max_items
+        # key -> (value, expires_at or None), oldest first
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _alive(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    def _store(self, key: str, value, ttl: Optional[float]):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self._alive(key)
+        return item[0] if item else None
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        if nx and self._alive(key):
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        item = self._alive(key)
+        if item:
+            value = int(item[0]) + amount
+            self._data[key] = (str(value), item[1])
+        else:
+            value = amount
+            self._store(key, str(value), ttl)
+        return value
+
+    async def ttl(self, key: str) -> Optional[float]:
+        item = self._alive(key)
+        if not item or item[1] is None:
+            return None
+        return item[1] - time.monotonic()
+
+    async def take_token(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        now = time.monotonic()
+        item = self._alive(key)
+        tokens, updated = item[0] if item else (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        # Forget the bucket once it would be full again
+        self._store(key, (tokens, now), capacity / rate)
+        return wait
+
+    async def close(self):
+        self._data.clear()
+
+# Token bucket refill and take in one round trip, timed by the Redis clock
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+class RedisBackend:
+    """Redis store shared by every bot and web worker"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url, decode_responses=True)
+        self._token_bucket = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(key)
+
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return await self.client.mget(keys) if keys else []
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        px = int(ttl * 1000) if ttl else None
+        return bool(await self.client.set(key, value, px=px, nx=nx))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = await self.client.incrby(key, amount)
+        if ttl and value == amount:
+            # New counter: start its expiry
+            await self.client.pexpire(key, int(ttl * 1000))
+        return int(value)
+
+    async def ttl(self, key: str) -> Optional[float]:
+        remaining = await self.client.pttl(key)
+        return remaining / 1000 if remaining and remaining > 0 else None
+
+    async def take_token(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        return float(await self._token_bucket(keys=[key], args=[rate, capacity, cost]))
+
+    async def close(self):
+        await self.client.aclose()
+
+class SharedCache:
+    """Hot state shared across workers: Redis when configured, memory otherwise"""
+
+    def __init__(self):
+        self.backend = MemoryBackend(Config.SHARED_CACHE_MAX_ITEMS)
+        # (loop id, key) -> future of the call in flight in this process
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    @property
+    def is_shared(self) -> bool:
+        return isinstance(self.backend, RedisBackend)
+
+    async def connect(self):
+        """Connect to Redis if REDIS_URL is set"""
+        if not Config.REDIS_URL:
+            logger.info("REDIS_URL not set, using in-process cache")
+            return
+
+        try:
+            backend = RedisBackend(Config.REDIS_URL)
+            await backend.client.ping()
+            self.backend = backend
+            logger.info("Redis connected successfully")
+        except Exception as e:
+            logger.error(f"Redis connection error, using in-process cache: {e}")
+
+    async def close(self):
+        """Close the backend connection"""
+        await self.backend.close()
+
+    # Plain values
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Cache get error for {key}: {e}")
+            return None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, nx: bool = False) -> bool:
+        try:
+            return await self.backend.set(key, value, ttl=ttl, nx=nx)
+        except Exception as e:
+            logger.error(f"Cache set error for {key}: {e}")
+            return False
+
+    async def delete(self, *keys: str):
+        try:
+            await self.backend.delete(*keys)
+        except Exception as e:
+            logger.error(f"Cache delete error: {e}")
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> Optional[int]:
+        try:
+            return await self.backend.incr(key, amount, ttl=ttl)
+        except Exception as e:
+            logger.error(f"Cache incr error for {key}: {e}")
+            return None
+
+    async def ttl(self, key: str) -> Optional[float]:
+        try:
+            return await self.backend.ttl(key)
+        except Exception as e:
+            logger.error(f"Cache ttl error for {key}: {e}")
+            return None
+
+    async def take_token(self, key: str, rate: float, capacity: float, cost: float = 1) -> float:
+        """Take ``cost`` tokens from a bucket refilled at ``rate`` per second
+
+        Returns 0 when allowed, otherwise the seconds until enough tokens are back.
+        Fails open when the backend is unreachable.
+        """
+        try:
+            return await self.backend.take_token(key, rate, capacity, cost)
+        except Exception as e:
+            logger.error(f"Cache token bucket error for {key}: {e}")
+            return 0.0
+
+    # JSON values
+    async def get_json(self, key: str) -> Any:
+        value = await self.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def get_many_json(self, keys: List[str]) -> Dict[str, Any]:
+        """Get several JSON values at once, missing keys are left out"""
+        try:
+            values = await self.backend.mget(keys)
+        except Exception as e:
+            logger.error(f"Cache mget error: {e}")
+            return {}
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set_json(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        return await self.set(key, json.dumps(value, default=str), ttl=ttl)
+
+    # Coordination
+    async def singleflight(self, key: str, factory: Callable[[], Awaitable[Any]],
+                           lock_ttl: float = None, wait_timeout: float = None) -> Any:
+        """Run ``factory`` once per key across tasks and workers; others share its result
+
+        The result must be JSON serializable so waiting workers can read it.
+        """
+        loop = asyncio.get_running_loop()
+        local_key = (id(loop), key)
+
+        # Same process: await the call already in flight
+        inflight = self._inflight.get(local_key)
+        if inflight:
+            return await asyncio.shield(inflight)
+
+        future = loop.create_future()
+        self._inflight[local_key] = future
+        try:
+            result = await self._singleflight_shared(key, factory, lock_ttl, wait_timeout)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not reported
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(local_key, None)
+
+    async def _singleflight_shared(self, key, factory, lock_ttl, wait_timeout):
+        """Cross-worker part of singleflight, coordinated through a lock key"""
+        lock_ttl = lock_ttl or Config.SINGLEFLIGHT_LOCK_TTL
+        wait_timeout = wait_timeout or lock_ttl
+        lock_key = f"sf:lock:{key}"
+        result_key = f"sf:result:{key}"
+        token = uuid.uuid4().hex
+
+        if not self.is_shared or await self.set(lock_key, token, ttl=lock_ttl, nx=True):
+            try:
+                result = await factory()
+                if self.is_shared:
+                    await self.set_json(result_key, result, ttl=Config.SINGLEFLIGHT_RESULT_TTL)
+                return result
+            finally:
+                if self.is_shared and await self.get(lock_key) == token:
+                    await self.delete(lock_key)
+
+        # Another worker holds the lock: wait for its result
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.25)
+            result = await self.get_json(result_key)
+            if result is not None:
+                return result
+            if await self.get(lock_key) is None:
+                break
+
+        result = await self.get_json(result_key)
+        return result if result is not None else await factory()
+
+# Global instance
+shared_cache = SharedCache()
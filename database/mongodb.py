@@ -1,11 +1,20 @@
 import logging
+import hashlib
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import CollectionInvalid, OperationFailure
 from config import Config
+from monitoring.metrics import mongo_listener
+from .cache import shared_cache
+from .admin_sets import admin_sets, normalize_domain
 
 logger = logging.getLogger(__name__)
 
+def hash_api_key(key: str) -> str:
+    """API keys are stored only as their SHA-256 digest"""
+    return hashlib.sha256(key.encode()).hexdigest()
+
 class Database:
     def __init__(self):
         self.client = None
@@ -16,11 +25,16 @@ class Database:
         self.allowed_groups = None
         self.restricted_sites = None
         self.stats = None
+        self.bypass_events = None
+        self.domain_stats = None
+        self.strategy_scores = None
+        self.jobs = None
+        self.api_keys = None
         
-    async def connect(self):
+    async def connect(self, create_indexes: bool = True):
         """Connect to MongoDB"""
         try:
-            self.client = AsyncIOMotorClient(Config.MONGODB_URI)
+            self.client = AsyncIOMotorClient(Config.MONGODB_URI, event_listeners=[mongo_listener])
             self.db = self.client[Config.DATABASE_NAME]
             
             # Initialize collections
@@ -33,9 +47,19 @@ class Database:
             self.referrals = self.db.referrals
             self.feedback = self.db.feedback
             self.site_requests = self.db.site_requests
+            self.domain_stats = self.db.domain_stats
+            self.strategy_scores = self.db.strategy_scores
+            self.jobs = self.db.jobs
+            self.api_keys = self.db.api_keys
+            
+            self.bypass_events = self.db.bypass_events
             
-            # Create indexes
-            await self._create_indexes()
+            if create_indexes:
+                # Bypass event log (time-series when the server supports it)
+                await self._create_event_collection()
+                
+                # Create indexes
+                await self._create_indexes()
             
             logger.info("MongoDB connected successfully")
             
@@ -50,6 +74,7 @@ class Database:
             await self.users.create_index("user_id", unique=True)
             await self.users.create_index("is_premium")
             await self.users.create_index("subscription_end_date")
+            await self.users.create_index("is_banned", partialFilterExpression={"is_banned": True})
             
             # Links collection indexes
             await self.links.create_index("original_link", unique=True)
@@ -81,11 +106,48 @@ class Database:
             await self.site_requests.create_index("domain")
             await self.site_requests.create_index("status")
             
+            # Domain stats indexes (hourly buckets, kept 90 days)
+            await self.domain_stats.create_index([("domain", ASCENDING), ("hour", ASCENDING)], unique=True)
+            await self.domain_stats.create_index("hour", expireAfterSeconds=90 * 86400)
+            
+            # Strategy scores indexes
+            await self.strategy_scores.create_index([("domain", ASCENDING), ("strategy", ASCENDING)], unique=True)
+            await self.strategy_scores.create_index("last_attempt")
+            
+            # Bypass jobs indexes (queue order, finished jobs expire)
+            await self.jobs.create_index("job_id", unique=True)
+            await self.jobs.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+            await self.jobs.create_index("finished_at", expireAfterSeconds=Config.JOB_RETENTION_HOURS * 3600)
+            
+            # API keys indexes
+            await self.api_keys.create_index("key_hash", unique=True)
+            await self.api_keys.create_index("prefix")
+            await self.api_keys.create_index("user_id")
+            
             logger.info("Database indexes created successfully")
             
         except Exception as e:
             logger.error(f"Error creating indexes: {e}")
     
+    async def _create_event_collection(self):
+        """Create the bypass event log as a time-series or capped collection"""
+        try:
+            await self.db.create_collection(
+                "bypass_events",
+                timeseries={"timeField": "ts", "metaField": "domain", "granularity": "minutes"},
+                expireAfterSeconds=Config.EVENT_LOG_RETENTION_DAYS * 86400
+            )
+        except CollectionInvalid:
+            pass  # Already exists
+        except OperationFailure:
+            # Time-series needs MongoDB 5.0+, fall back to a 64 MB capped collection
+            try:
+                await self.db.create_collection("bypass_events", capped=True, size=64 * 1024 * 1024)
+            except CollectionInvalid:
+                pass
+        except Exception as e:
+            logger.error(f"Error creating bypass event collection: {e}")
+    
     async def close(self):
         """Close MongoDB connection"""
         if self.client:
@@ -93,9 +155,9 @@ class Database:
             logger.info("MongoDB connection closed")
     
     # User Methods
-    async def get_user(self, user_id: int):
-        """Get user by ID"""
-        return await self.users.find_one({"user_id": user_id})
+    async def get_user(self, user_id: int, projection: dict = None):
+        """Get user by ID, optionally only the projected fields"""
+        return await self.users.find_one({"user_id": user_id}, projection)
     
     async def create_user(self, user_id: int, username: str = None, first_name: str = None):
         """Create new user"""
@@ -115,6 +177,23 @@ class Database:
         await self.users.insert_one(user)
         return user
     
+    async def set_user_banned(self, user_id: int, banned: bool):
+        """Ban or unban a user"""
+        result = await self.update_user(user_id, {"is_banned": banned})
+        if banned:
+            admin_sets.banned_users.add(user_id)
+        else:
+            admin_sets.banned_users.discard(user_id)
+        return result
+    
+    async def is_user_banned(self, user_id: int, user: dict = None) -> bool:
+        """Check if user is banned, from memory when the admin sets are loaded"""
+        if admin_sets.ready:
+            return admin_sets.is_user_banned(user_id)
+        if user is None:
+            user = await self.get_user(user_id, projection={"is_banned": 1})
+        return bool(user and user.get("is_banned", False))
+    
     async def update_user(self, user_id: int, update_data: dict):
         """Update user data"""
         return await self.users.update_one(
@@ -122,39 +201,56 @@ class Database:
             {"$set": update_data}
         )
     
-    async def increment_user_usage(self, user_id: int):
+    async def increment_user_usage(self, user_id: int, amount: int = 1):
         """Increment user's bypass count"""
         today = datetime.utcnow().date().isoformat()
-        user = await self.get_user(user_id)
         
-        if user and user.get("last_reset") != today:
+        # Common case: counter already belongs to today
+        result = await self.users.update_one(
+            {"user_id": user_id, "last_reset": today},
+            {
+                "$inc": {
+                    "links_bypassed_today": amount,
+                    "total_links_bypassed": amount
+                }
+            }
+        )
+        
+        if result.matched_count == 0:
             # Reset daily counter
             await self.users.update_one(
                 {"user_id": user_id},
                 {
                     "$set": {
-                        "links_bypassed_today": 1,
+                        "links_bypassed_today": amount,
                         "last_reset": today
                     },
-                    "$inc": {"total_links_bypassed": 1}
-                }
-            )
-        else:
-            await self.users.update_one(
-                {"user_id": user_id},
-                {
-                    "$inc": {
-                        "links_bypassed_today": 1,
-                        "total_links_bypassed": 1
-                    }
+                    "$inc": {"total_links_bypassed": amount}
                 }
             )
+        
+        # Shared quota counter read by the rate limiter
+        await shared_cache.incr(f"quota:{user_id}:{today}", amount, ttl=86400)
+    
+    async def get_usage_today(self, user: dict) -> int:
+        """Links used today, from the shared counter when available"""
+        today = datetime.utcnow().date().isoformat()
+        used = user.get("links_bypassed_today", 0) if user.get("last_reset") == today else 0
+        
+        counter = await shared_cache.get(f"quota:{user['user_id']}:{today}")
+        if counter is None:
+            # Seed the counter so other workers skip the document
+            await shared_cache.set(f"quota:{user['user_id']}:{today}", str(used), ttl=86400, nx=True)
+            return used
+        return max(used, int(counter))
     
     async def reset_user_limit(self, user_id: int):
         """Reset user's daily limit"""
+        today = datetime.utcnow().date().isoformat()
+        await shared_cache.delete(f"quota:{user_id}:{today}")
         return await self.users.update_one(
             {"user_id": user_id},
-            {"$set": {"links_bypassed_today": 0, "last_reset": datetime.utcnow().date().isoformat()}}
+            {"$set": {"links_bypassed_today": 0, "last_reset": today}}
         )
     
     async def set_premium(self, user_id: int, duration_days: int):
@@ -171,27 +267,37 @@ class Database:
             }
         )
     
-    async def check_premium_expired(self, user_id: int):
-        """Check and update premium status if expired"""
-        user = await self.get_user(user_id)
+    async def check_premium_expired(self, user_id: int, user: dict = None):
+        """Check and update premium status if expired
+        
+        A ``user`` document already loaded is checked instead of fetching it
+        again, and is updated in place when premium has expired.
+        """
+        if user is None:
+            user = await self.get_user(user_id)
         if user and user.get("is_premium"):
             if user.get("subscription_end_date") and user["subscription_end_date"] < datetime.utcnow():
+                expired = {
+                    "is_premium": False,
+                    "subscription_end_date": None,
+                    "daily_limit": Config.FREE_USER_LIMIT
+                }
                 await self.users.update_one(
                     {"user_id": user_id},
-                    {
-                        "$set": {
-                            "is_premium": False,
-                            "subscription_end_date": None,
-                            "daily_limit": Config.FREE_USER_LIMIT
-                        }
-                    }
+                    {"$set": expired}
                 )
+                user.update(expired)
                 return True
         return False
     
     # Link Methods
     async def get_cached_link(self, original_link: str):
         """Get cached bypass result"""
+        # Hot cache shared by all workers
+        cached = await shared_cache.get_json(f"link:{original_link}")
+        if cached:
+            return cached
+        
         result = await self.links.find_one({"original_link": original_link})
         if result:
             # Check if cache is expired
@@ -200,8 +306,42 @@ class Database:
                 if age.days > Config.CACHE_EXPIRY_DAYS:
                     await self.links.delete_one({"original_link": original_link})
                     return None
+            await self._cache_link(result)
         return result
     
+    async def get_cached_links(self, original_links: list) -> dict:
+        """Get cached bypass results for many links in one round trip, keyed by link"""
+        found = await shared_cache.get_many_json([f"link:{link}" for link in original_links])
+        cached = {doc["original_link"]: doc for doc in found.values()}
+        
+        missing = [link for link in original_links if link not in cached]
+        if missing:
+            now = datetime.utcnow()
+            expired = []
+            async for result in self.links.find({"original_link": {"$in": missing}}):
+                # Same expiry rule as get_cached_link
+                if result.get("created_at") and (now - result["created_at"]).days > Config.CACHE_EXPIRY_DAYS:
+                    expired.append(result["original_link"])
+                    continue
+                cached[result["original_link"]] = result
+                await self._cache_link(result)
+            if expired:
+                await self.links.delete_many({"original_link": {"$in": expired}})
+        
+        return cached
+    
+    async def _cache_link(self, link_data: dict):
+        """Put a link in the hot cache"""
+        await shared_cache.set_json(
+            f"link:{link_data['original_link']}",
+            {
+                "original_link": link_data["original_link"],
+                "bypassed_link": link_data["bypassed_link"],
+                "bypass_type": link_data.get("bypass_type", "unknown")
+            },
+            ttl=Config.LINK_CACHE_TTL
+        )
+    
     async def save_bypass_result(self, original_link: str, bypassed_link: str, bypass_type: str = "unknown"):
         """Save bypass result to cache"""
         link_data = {
@@ -216,6 +356,7 @@ class Database:
             {"$set": link_data},
             upsert=True
         )
+        await self._cache_link(link_data)
     
     async def increment_link_usage(self, original_link: str):
         """Increment usage count for cached link"""
@@ -224,6 +365,14 @@ class Database:
             {"$inc": {"usage_count": 1}}
         )
     
+    async def increment_links_usage(self, original_links: list):
+        """Increment usage count for several cached links"""
+        if original_links:
+            await self.links.update_many(
+                {"original_link": {"$in": original_links}},
+                {"$inc": {"usage_count": 1}}
+            )
+    
     # Token Methods
     async def create_token(self, duration_days: int, created_by: int):
         """Create access token"""
@@ -338,13 +487,17 @@ class Database:
             {"$set": group_data},
             upsert=True
         )
+        admin_sets.allowed_groups.add(group_id)
     
     async def remove_allowed_group(self, group_id: int):
         """Remove group from allowed list"""
+        admin_sets.allowed_groups.discard(group_id)
         return await self.allowed_groups.delete_one({"group_id": group_id})
     
     async def is_group_allowed(self, group_id: int):
         """Check if group is allowed"""
+        if admin_sets.ready:
+            return admin_sets.is_group_allowed(group_id)
         group = await self.allowed_groups.find_one({"group_id": group_id})
         return group and group.get("is_active", False)
     
@@ -366,17 +519,22 @@ class Database:
             {"$set": site_data},
             upsert=True
         )
+        admin_sets.restricted_sites.add(domain)
     
     async def remove_restricted_site(self, domain: str):
         """Remove site from restricted list"""
+        admin_sets.restricted_sites.discard(domain)
         return await self.restricted_sites.delete_one({"domain": domain.lower()})
     
     async def is_site_restricted(self, url: str):
-        """Check if site is restricted"""
-        from urllib.parse import urlparse
-        domain = urlparse(url).netloc.lower()
-        site = await self.restricted_sites.find_one({"domain": domain})
-        return site and site.get("is_active", False)
+        """Check if site or one of its parent domains is restricted"""
+        if admin_sets.ready:
+            return admin_sets.is_site_restricted(url)
+        labels = normalize_domain(url).split(".")
+        suffixes = [".".join(labels[i:]) for i in range(len(labels))]
+        suffixes += ["www." + suffix for suffix in suffixes]
+        site = await self.restricted_sites.find_one({"domain": {"$in": suffixes}, "is_active": True})
+        return site is not None
     
     async def get_all_restricted_sites(self):
         """Get all restricted sites"""
@@ -400,6 +558,109 @@ class Database:
             "total_bypasses": total_bypasses[0]["total"] if total_bypasses else 0
         }
     
+    # Bypass Events
+    async def insert_bypass_events(self, events: list):
+        """Store raw bypass events and fold them into hourly domain stats"""
+        from bypasser.telemetry import latency_bucket
+        
+        if not events:
+            return
+        
+        await self.bypass_events.insert_many(events, ordered=False)
+        
+        # Pre-aggregate per domain and hour
+        buckets = {}
+        for event in events:
+            hour = event["ts"].replace(minute=0, second=0, microsecond=0)
+            inc = buckets.setdefault((event["domain"], hour), {})
+            
+            if event.get("cache_hit"):
+                inc["cache_hits"] = inc.get("cache_hits", 0) + 1
+                continue
+            
+            inc["attempts"] = inc.get("attempts", 0) + 1
+            key = f"latency.{latency_bucket(event['duration_ms'])}"
+            inc[key] = inc.get(key, 0) + 1
+            key = f"site_types.{event['site_type']}"
+            inc[key] = inc.get(key, 0) + 1
+            if event.get("success"):
+                inc["successes"] = inc.get("successes", 0) + 1
+                key = f"strategies.{event['strategy']}"
+                inc[key] = inc.get(key, 0) + 1
+        
+        operations = [
+            UpdateOne({"domain": domain, "hour": hour}, {"$inc": inc}, upsert=True)
+            for (domain, hour), inc in buckets.items()
+        ]
+        await self.domain_stats.bulk_write(operations, ordered=False)
+    
+    async def get_domain_stats(self, domain: str = None, hours: int = 24, limit: int = 20):
+        """Get per-domain latency percentiles and success rates"""
+        from bypasser.telemetry import estimate_percentile
+        
+        query = {"hour": {"$gte": datetime.utcnow() - timedelta(hours=hours)}}
+        if domain:
+            query["domain"] = domain.lower()
+        
+        merged = {}
+        async for doc in self.domain_stats.find(query):
+            stats = merged.setdefault(doc["domain"], {
+                "domain": doc["domain"],
+                "attempts": 0,
+                "successes": 0,
+                "cache_hits": 0,
+                "latency": {},
+                "strategies": {}
+            })
+            stats["attempts"] += doc.get("attempts", 0)
+            stats["successes"] += doc.get("successes", 0)
+            stats["cache_hits"] += doc.get("cache_hits", 0)
+            for field in ("latency", "strategies"):
+                for key, count in doc.get(field, {}).items():
+                    stats[field][key] = stats[field].get(key, 0) + count
+        
+        results = []
+        for stats in merged.values():
+            attempts = stats["attempts"]
+            stats["success_rate"] = round(stats["successes"] / attempts, 3) if attempts else None
+            for key, percentile in (("p50_ms", 0.50), ("p95_ms", 0.95)):
+                value = estimate_percentile(stats["latency"], percentile)
+                stats[key] = round(value, 1) if value is not None else None
+            del stats["latency"]
+            results.append(stats)
+        
+        results.sort(key=lambda s: s["attempts"] + s["cache_hits"], reverse=True)
+        return results[:limit]
+    
+    # Strategy Scores
+    async def load_strategy_scores(self, days: int = 30):
+        """Get strategy scores of domains attempted recently"""
+        since = datetime.utcnow() - timedelta(days=days)
+        return await self.strategy_scores.find(
+            {"last_attempt": {"$gte": since}},
+            {"_id": 0}
+        ).to_list(length=None)
+    
+    async def save_strategy_scores(self, increments: dict):
+        """Add score increments keyed by (domain, strategy)"""
+        operations = [
+            UpdateOne(
+                {"domain": domain, "strategy": strategy},
+                {
+                    "$inc": {
+                        "attempts": score["attempts"],
+                        "successes": score["successes"],
+                        "total_ms": score["total_ms"]
+                    },
+                    "$max": {"last_attempt": score["last_attempt"]}
+                },
+                upsert=True
+            )
+            for (domain, strategy), score in increments.items()
+        ]
+        if operations:
+            await self.strategy_scores.bulk_write(operations, ordered=False)
+    
     # Broadcast
     async def get_all_users(self):
         """Get all active users for broadcast"""
@@ -552,6 +813,123 @@ class Database:
     async def site_request_exists(self, domain: str):
         """Check if site request already exists"""
         return await self.site_requests.find_one({"domain": domain.lower(), "status": {"$in": ["pending", "approved"]}})
+    
+    # Bypass Jobs
+    async def create_job(self, url: str, callback_url: str = None, client: str = None, user_id: int = None):
+        """Queue a bypass job; ``user_id`` is charged when it succeeds"""
+        import secrets
+        job = {
+            "job_id": secrets.token_hex(12),
+            "url": url,
+            "callback_url": callback_url,
+            "client": client,
+            "user_id": user_id,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            "lease_until": None
+        }
+        await self.jobs.insert_one(job)
+        return job
+    
+    async def get_job(self, job_id: str, client: str = None):
+        """Get a job without internal fields, only if ``client`` queued it when given"""
+        query = {"job_id": job_id}
+        if client is not None:
+            query["client"] = client
+        return await self.jobs.find_one(query, {"_id": 0, "lease_until": 0, "client": 0, "user_id": 0})
+    
+    async def claim_job(self, lease_seconds: float):
+        """Atomically take the oldest queued job, or one whose worker died"""
+        now = datetime.utcnow()
+        return await self.jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "lease_until": {"$lt": now}}
+                ],
+                "attempts": {"$lt": Config.JOB_MAX_ATTEMPTS}
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "started_at": now,
+                    "lease_until": now + timedelta(seconds=lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def finish_job(self, job: dict, result: dict) -> bool:
+        """Store a job result, unless the job was claimed again since; True when stored"""
+        update = await self.jobs.update_one(
+            {"job_id": job["job_id"], "attempts": job["attempts"], "status": "running"},
+            {
+                "$set": {
+                    "status": "done" if result.get("success") else "failed",
+                    "result": result,
+                    "finished_at": datetime.utcnow(),
+                    "lease_until": None
+                }
+            }
+        )
+        return update.modified_count == 1
+    
+    async def fail_stale_jobs(self):
+        """Fail running jobs that used up their attempts without finishing"""
+        now = datetime.utcnow()
+        result = await self.jobs.update_many(
+            {
+                "status": "running",
+                "lease_until": {"$lt": now},
+                "attempts": {"$gte": Config.JOB_MAX_ATTEMPTS}
+            },
+            {
+                "$set": {
+                    "status": "failed",
+                    "result": {"success": False, "error": "Job did not finish"},
+                    "finished_at": now,
+                    "lease_until": None
+                }
+            }
+        )
+        return result.modified_count
+    
+    # API Keys
+    async def create_api_key(self, user_id: int, name: str, created_by: int):
+        """Create an API key for a user; the plain key is only returned here"""
+        import secrets
+        key = f"nb_{secrets.token_urlsafe(32)}"
+        await self.api_keys.insert_one({
+            "key_hash": hash_api_key(key),
+            "prefix": key[:11],
+            "user_id": user_id,
+            "name": name,
+            "created_by": created_by,
+            "created_at": datetime.utcnow(),
+            "revoked": False
+        })
+        return key
+    
+    async def get_api_key(self, key: str):
+        """Get an active API key by its plain value"""
+        return await self.api_keys.find_one(
+            {"key_hash": hash_api_key(key), "revoked": False},
+            {"_id": 0}
+        )
+    
+    async def revoke_api_key(self, prefix: str):
+        """Revoke the active keys starting with a prefix"""
+        result = await self.api_keys.update_many(
+            {"prefix": prefix, "revoked": False},
+            {"$set": {"revoked": True, "revoked_at": datetime.utcnow()}}
+        )
+        return result.modified_count
 
 # Global database instance
 db = Database()
@@ -1,13 +1,26 @@
 import asyncio
 import logging
 from pyrogram import Client, idle
+from prometheus_client import start_http_server
+from hypercorn.asyncio import serve
+from hypercorn.config import Config as HypercornConfig
 from config import Config
-from database.mongodb import Database
+from database.mongodb import db
+from database.cache import shared_cache
+from database.admin_sets import admin_sets
 from bot.handlers import register_handlers
 from bot.handlers.notifications import init_notifications
+from bypasser.telemetry import event_recorder
+from bypasser.scoreboard import strategy_scoreboard
+from bypasser.jobs import job_worker
+from bypasser.http import browser_pool
+from app import app as web_app
+from monitoring.metrics import loop_monitor, install_flood_wait_counter
+from monitoring.watchdog import loop_watchdog
 
-# Configure logging
+# Configure logging; force replaces the console-only setup app.py made on import
 logging.basicConfig(
+    force=True,
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
@@ -31,11 +44,29 @@ class LinkBypasserBot:
             Config.validate()
             logger.info("Configuration validated successfully")
             
-            # Initialize database
-            self.db = Database()
+            # Connect shared cache (Redis when REDIS_URL is set)
+            await shared_cache.connect()
+            
+            # Initialize database (shared instance used by the handlers)
+            self.db = db
             await self.db.connect()
             logger.info("Database connected successfully")
             
+            # Load restricted sites, allowed groups and banned users into memory
+            await admin_sets.start(self.db)
+            
+            # Run bypass jobs queued through the web API
+            await job_worker.start(self.db)
+            
+            # Start bypass event writer and strategy scoreboard
+            await event_recorder.start(self.db)
+            await strategy_scoreboard.start(self.db)
+            
+            # Metrics: event loop lag and stalls, FloodWaits slept through by Pyrogram
+            await loop_monitor.start()
+            await loop_watchdog.start()
+            install_flood_wait_counter()
+            
             # Initialize Pyrogram client
             self.app = Client(
                 "link_bypasser_bot",
@@ -63,15 +94,6 @@ class LinkBypasserBot:
             await self.notification_system.start()
             logger.info("Notification system initialized")
             
-            # Setup webhook or polling
-            if Config.USE_WEBHOOK and Config.WEBHOOK_URL:
-                # Set webhook
-                webhook_url = f"{Config.WEBHOOK_URL}/webhook"
-                await self.app.set_webhook(webhook_url)
-                logger.info(f"Webhook set to: {webhook_url}")
-            else:
-                logger.info("Using polling mode")
-            
             # Send startup message to log channel
             if Config.LOG_CHANNEL:
                 try:
@@ -85,13 +107,30 @@ class LinkBypasserBot:
                 except Exception as e:
                     logger.error(f"Failed to send startup message: {e}")
             
-            # Keep the bot running
-            await idle()
+            # Keep the bot running, serving the web API on the same loop
+            if Config.RUN_WEB_SERVER:
+                await self.serve_web()
+            else:
+                if Config.METRICS_PORT:
+                    start_http_server(Config.METRICS_PORT)
+                    logger.info(f"Metrics served on port {Config.METRICS_PORT}")
+                await idle()
             
         except Exception as e:
             logger.error(f"Error starting bot: {e}")
             raise
         
+    async def serve_web(self):
+        """Serve the Quart app in this process until the bot receives a stop signal"""
+        # Services are already running here; the app must not start a second set
+        web_app.config['MANAGE_SERVICES'] = False
+        
+        config = HypercornConfig()
+        config.bind = [f"0.0.0.0:{Config.PORT}"]
+        config.accesslog = None
+        logger.info(f"Web API listening on port {Config.PORT}")
+        await serve(web_app, config, shutdown_trigger=idle)
+        
     async def stop(self):
         """Stop the bot gracefully"""
         try:
@@ -114,9 +153,19 @@ class LinkBypasserBot:
                 await self.app.stop()
                 logger.info("Bot stopped")
             
+            await job_worker.stop()
+            await event_recorder.stop()
+            await strategy_scoreboard.stop()
+            await loop_watchdog.stop()
+            await loop_monitor.stop()
+            await admin_sets.stop()
+            await browser_pool.close()
+            
             if self.db:
                 await self.db.close()
                 logger.info("Database connection closed")
+            
+            await shared_cache.close()
                 
         except Exception as e:
             logger.error(f"Error stopping bot: {e}")
@@ -0,0 +1,147 @@
+import logging
+import time
+import asyncio
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from pymongo import monitoring
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Seconds; bypasses range from cache-fast to multi-minute browser runs
+BYPASS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+BYPASS_LATENCY = Histogram(
+    "bypass_duration_seconds", "Time to bypass a link",
+    ["site_type", "strategy", "success"], buckets=BYPASS_BUCKETS
+)
+LINK_CACHE = Counter("link_cache_requests_total", "Link cache lookups by bypass", ["result"])
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency",
+    ["command"], buckets=MONGO_BUCKETS
+)
+MONGO_FAILURES = Counter("mongo_command_failures_total", "Failed MongoDB commands", ["command"])
+FLOOD_WAITS = Counter("telegram_flood_waits_total", "Telegram FloodWait errors", ["method"])
+FLOOD_WAIT_SECONDS = Counter("telegram_flood_wait_seconds_total", "Seconds Telegram asked us to wait", ["method"])
+LOOP_LAG = Histogram("event_loop_lag_seconds", "Delay of the event loop beyond a scheduled wakeup", buckets=LOOP_LAG_BUCKETS)
+LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Last measured event loop lag")
+LOOP_STALLS = Counter("event_loop_stalls_total", "Event loop stalls by blocking call site", ["call_site"])
+
+def observe_bypass(trace):
+    """Record a finished bypass trace; in-memory only"""
+    if trace.cache_hit:
+        LINK_CACHE.labels("hit").inc()
+        return
+    LINK_CACHE.labels("miss").inc()
+    BYPASS_LATENCY.labels(
+        trace.site_type or "unknown",
+        trace.strategy or "none",
+        "true" if trace.success else "false"
+    ).observe(trace.duration_ms / 1000)
+
+def record_flood_wait(method: str, seconds: float):
+    """Count a FloodWait returned by Telegram"""
+    FLOOD_WAITS.labels(method).inc()
+    FLOOD_WAIT_SECONDS.labels(method).inc(seconds)
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every MongoDB command from the driver's own events"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(event.command_name).inc()
+
+class FloodWaitLogHandler(logging.Handler):
+    """Counts the FloodWaits Pyrogram sleeps through, which it only logs"""
+
+    def emit(self, record: logging.LogRecord):
+        # '[%s] Waiting for %s seconds before continuing (required by "%s")'
+        if "Waiting for" in str(record.msg) and isinstance(record.args, tuple) and len(record.args) == 3:
+            try:
+                record_flood_wait(str(record.args[2]), float(record.args[1]))
+            except (TypeError, ValueError):
+                pass
+
+class PoolCollector:
+    """Reads pool and executor gauges when scraped, so requests pay nothing"""
+
+    def describe(self):
+        # Registering must not import the pools; they load the whole bypasser
+        return []
+
+    def collect(self):
+        from bypasser.http import executor, browser_pool
+
+        queue = GaugeMetricFamily("http_executor_queue_depth", "Blocking calls waiting for an executor thread")
+        queue.add_metric([], executor._work_queue.qsize())
+        yield queue
+
+        threads = GaugeMetricFamily("http_executor_threads", "Executor threads started")
+        threads.add_metric([], len(executor._threads))
+        yield threads
+
+        browsers = GaugeMetricFamily("browser_pool_browsers", "Pooled browsers by state", labels=["state"])
+        browsers.add_metric(["busy"], browser_pool.busy)
+        browsers.add_metric(["idle"], len(browser_pool._idle))
+        yield browsers
+
+        capacity = GaugeMetricFamily("browser_pool_size", "Maximum concurrent browsers")
+        capacity.add_metric([], browser_pool.size)
+        yield capacity
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_beat = None
+        self._task = None
+
+    async def start(self):
+        """Start sampling lag on the running loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        """Stop sampling"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self.last_beat = None
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+
+def render_metrics():
+    """Body and content type of the Prometheus text exposition"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def install_flood_wait_counter():
+    """Attach the log handler that counts FloodWaits slept through by Pyrogram"""
+    session_logger = logging.getLogger("pyrogram.session.session")
+    if not any(isinstance(handler, FloodWaitLogHandler) for handler in session_logger.handlers):
+        session_logger.addHandler(FloodWaitLogHandler())
+
+REGISTRY.register(PoolCollector())
+
+# Global instances
+mongo_listener = MongoCommandListener()
+loop_monitor = LoopLagMonitor(Config.LOOP_LAG_INTERVAL)
@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+import weakref
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from config import Config
+from .metrics import LOOP_STALLS, loop_monitor
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What the running task is doing, inherited by the tasks it spawns
+_labels: ContextVar[Dict[str, str]] = ContextVar("watchdog_labels", default={})
+# task -> labels; the watchdog thread cannot read another thread's context
+_task_labels: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, str]]" = weakref.WeakKeyDictionary()
+
+def label_task(**labels):
+    """Tag the current task (e.g. handler, url) for stall reports"""
+    merged = {**_labels.get(), **{key: str(value) for key, value in labels.items() if value is not None}}
+    _labels.set(merged)
+    task = asyncio.current_task()
+    if task is not None:
+        _task_labels[task] = merged
+
+def call_site(stack: List[traceback.FrameSummary]) -> str:
+    """Innermost frame in our own code, where the blocking call was made"""
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(PROJECT_ROOT) and "site-packages" not in path and not path.startswith(os.path.dirname(__file__)):
+            return f"{os.path.relpath(path, PROJECT_ROOT)}:{frame.lineno} {frame.name}"
+    frame = stack[-1] if stack else None
+    return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}" if frame else "unknown"
+
+class LoopWatchdog:
+    """Thread that notices a stalled event loop and logs the code blocking it"""
+
+    def __init__(self, threshold: float, check_interval: float):
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self._loop = None
+        self._loop_thread = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._reported_beat = None
+
+    async def start(self):
+        """Watch the running loop; the lag monitor provides its heartbeat"""
+        if self._thread or not Config.WATCHDOG_ENABLED:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        await loop_monitor.start()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Loop watchdog started (threshold {self.threshold}s)")
+
+    async def stop(self):
+        """Stop the watchdog thread"""
+        if self._thread:
+            self._stopped.set()
+            self._thread.join(timeout=self.check_interval * 2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.check_interval):
+            beat = loop_monitor.last_beat
+            if beat is None:
+                continue
+            stalled = time.monotonic() - beat - loop_monitor.interval
+            # One report per stall, taken while the loop is still blocked
+            if stalled >= self.threshold and beat != self._reported_beat:
+                self._reported_beat = beat
+                try:
+                    self._report(stalled)
+                except Exception as e:
+                    logger.error(f"Watchdog report error: {e}")
+
+    def _report(self, stalled: float):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        site = call_site(stack)
+        labels = self._current_labels()
+        LOOP_STALLS.labels(site).inc()
+
+        logger.warning(
+            f"Event loop blocked for {stalled:.1f}s at {site} "
+            f"(handler: {labels.get('handler', 'unknown')}, url: {labels.get('url', '-')})\n"
+            + "".join(traceback.format_list(stack[-Config.WATCHDOG_STACK_DEPTH:]))
+        )
+
+    def _current_labels(self) -> Dict[str, str]:
+        try:
+            task: Optional[asyncio.Task] = asyncio.current_task(self._loop)
+        except RuntimeError:
+            return {}
+        return _task_labels.get(task, {}) if task else {}
+
+# Global instance
+loop_watchdog = LoopWatchdog(Config.LOOP_STALL_THRESHOLD, Config.WATCHDOG_CHECK_INTERVAL)
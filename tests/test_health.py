@@ -0,0 +1,32 @@
+import pytest
+from config import Config
+from bypasser.health import HostHealthTracker, CircuitOpenError
+
+URL = "https://protected.example/file/123"
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def answer(tracker: HostHealthTracker, response: FakeResponse):
+    with tracker.track(URL, 15) as tracked:
+        tracked.observe(response)
+
+def test_cloudflare_challenge_does_not_open_circuit():
+    tracker = HostHealthTracker()
+    challenge = FakeResponse(503, {"Server": "cloudflare", "cf-mitigated": "challenge"})
+    for _ in range(Config.CIRCUIT_FAILURE_THRESHOLD * 2):
+        answer(tracker, challenge)
+
+    assert tracker.retry_in(URL) is None
+    tracker.check(URL)
+
+def test_gateway_errors_open_circuit():
+    tracker = HostHealthTracker()
+    for _ in range(Config.CIRCUIT_FAILURE_THRESHOLD):
+        answer(tracker, FakeResponse(522, {"Server": "cloudflare"}))
+
+    assert tracker.retry_in(URL) > 0
+    with pytest.raises(CircuitOpenError):
+        tracker.check(URL)
@@ -0,0 +1,117 @@
+import math
+import time
+import logging
+import functools
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from quart import request, jsonify, g
+from config import Config
+from database.mongodb import db, hash_api_key
+from database.cache import shared_cache
+from bot.middlewares.auth import check_rate_limit
+
+logger = logging.getLogger(__name__)
+
+class ApiKeyCache:
+    """Active API keys kept in memory for a short time, misses included"""
+
+    def __init__(self, ttl: float, max_items: int = 10000):
+        self.ttl = ttl
+        self.max_items = max_items
+        # key hash -> (key document or None, expires_at)
+        self._keys: Dict[str, tuple] = {}
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Key document for a plain key, or None when unknown or revoked"""
+        key_hash = hash_api_key(key)
+        item = self._keys.get(key_hash)
+        if item and item[1] > time.monotonic():
+            return item[0]
+
+        doc = await db.get_api_key(key)
+        if len(self._keys) >= self.max_items:
+            self._keys.clear()
+        self._keys[key_hash] = (doc, time.monotonic() + self.ttl)
+        return doc
+
+    def invalidate(self):
+        """Forget every cached key, e.g. after a revocation in this process"""
+        self._keys.clear()
+
+def seconds_until_midnight() -> int:
+    now = datetime.utcnow()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return int((midnight - now).total_seconds()) + 1
+
+def too_many_requests(message: str, retry_after: float):
+    response = jsonify({
+        'success': False,
+        'error': message,
+        'retry_after': math.ceil(retry_after)
+    })
+    return response, 429, {'Retry-After': str(math.ceil(retry_after))}
+
+def _request_key() -> Optional[str]:
+    key = request.headers.get('X-API-Key')
+    if key:
+        return key
+    auth = request.headers.get('Authorization', '')
+    if auth.lower().startswith('bearer '):
+        return auth[7:].strip()
+    return None
+
+def require_api_key(view=None, *, quota: bool = True):
+    """Authenticate the request's API key and apply its token bucket and daily quota
+
+    The key's owner is available as ``g.api_user`` and ``g.api_key``. With
+    ``quota=False`` (e.g. polling a job) an exhausted daily quota does not block.
+    """
+    if view is None:
+        return functools.partial(require_api_key, quota=quota)
+
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        if not Config.API_KEYS_REQUIRED:
+            g.api_key = g.api_user = g.api_quota = None
+            return await view(*args, **kwargs)
+
+        key = _request_key()
+        api_key = await api_key_cache.get(key) if key else None
+        if not api_key:
+            return jsonify({
+                'success': False,
+                'error': 'Valid API key required'
+            }), 401
+
+        user = await db.get_user(api_key['user_id'])
+        if not user or user.get('is_banned'):
+            return jsonify({
+                'success': False,
+                'error': 'API key owner is not allowed'
+            }), 403
+
+        # Burst control per key; premium owners get the larger bucket
+        if user.get('is_premium'):
+            rate, burst = Config.API_PREMIUM_RATE, Config.API_PREMIUM_BURST
+        else:
+            rate, burst = Config.API_FREE_RATE, Config.API_FREE_BURST
+        wait = await shared_cache.take_token(f"apibucket:{api_key['key_hash']}", rate, burst)
+        if wait > 0:
+            return too_many_requests('Rate limit exceeded', wait)
+
+        # Daily quota shared with the bot
+        usage = None
+        if quota:
+            usage = await check_rate_limit(user['user_id'], user)
+            if not usage['allowed']:
+                return too_many_requests(usage['message'], seconds_until_midnight())
+
+        g.api_key = api_key
+        g.api_user = user
+        g.api_quota = usage
+        return await view(*args, **kwargs)
+
+    return wrapper
+
+# Global instance
+api_key_cache = ApiKeyCache(Config.API_KEY_CACHE_TTL)
@@ -1,30 +1,54 @@
+import json
+import asyncio
 import logging
-from flask import request, jsonify, render_template_string
-from bypasser.core import LinkBypasser
+import validators
+from quart import request, jsonify, render_template_string, Response, g
+from config import Config
+from database.mongodb import db
+from bypasser.service import bypass_service, canonicalize_url
+from bypasser.jobs import job_worker, check_callback_url
+from .api_auth import require_api_key, too_many_requests, seconds_until_midnight
 
 logger = logging.getLogger(__name__)
 
+def _format_event(result: dict, event: str, sse: bool) -> str:
+    """Serialize one streamed result as an NDJSON line or an SSE event"""
+    data = json.dumps(result, default=str)
+    return f"event: {event}\ndata: {data}\n\n" if sse else data + "\n"
+
+def _client_key():
+    """Key sharing fresh-bypass slots: the API key owner, else the address"""
+    return f"api:{g.api_user['user_id']}" if g.api_user else f"api:{request.remote_addr}"
+
+async def _charge(user: dict, amount: int = 1):
+    """Count bypasses against the API key owner's daily quota"""
+    if user and amount:
+        await db.increment_user_usage(user['user_id'], amount)
+
 def setup_routes(app):
-    """Setup Flask routes"""
+    """Setup Quart routes"""
     
-    bypasser = LinkBypasser()
+    bypasser = bypass_service.bypasser
     
     @app.route('/api/bypass', methods=['POST'])
+    @require_api_key
     async def api_bypass():
         """API endpoint for bypassing links"""
         try:
-            data = request.get_json()
+            data = await request.get_json(silent=True)
             
-            if not data or 'url' not in data:
+            url = data.get('url') if isinstance(data, dict) else None
+            
+            if not isinstance(url, str) or not url.strip():
                 return jsonify({
                     'success': False,
-                    'error': 'URL is required'
+                    'error': 'url must be a non-empty string'
                 }), 400
             
-            url = data['url']
-            
-            # Perform bypass
-            result = await bypasser.bypass(url)
+            # Perform bypass (cache first)
+            result = await bypass_service.resolve(url)
+            if result['success']:
+                await _charge(g.api_user)
             
             return jsonify(result), 200 if result['success'] else 400
             
@@ -35,8 +59,165 @@ def setup_routes(app):
                 'error': str(e)
             }), 500
     
+    @app.route('/api/bypass/batch', methods=['POST'])
+    @require_api_key
+    async def api_bypass_batch():
+        """Bypass many links, streaming each result as it completes
+
+        Each result carries ``index``, the position of its URL in the request's
+        ``urls``, and that URL as ``input``. Duplicates (after canonicalization)
+        are bypassed once and reported at every position they appear.
+        """
+        data = await request.get_json(silent=True)
+        urls = data.get('urls') if isinstance(data, dict) else None
+        
+        if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+            return jsonify({
+                'success': False,
+                'error': 'urls must be a non-empty list of strings'
+            }), 400
+        
+        if len(urls) > Config.API_BATCH_MAX_URLS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {Config.API_BATCH_MAX_URLS} URLs per batch'
+            }), 400
+        
+        # Canonical URL -> positions in the request, in first-seen order
+        positions = {}
+        for position, url in enumerate(urls):
+            positions.setdefault(canonicalize_url(url), []).append(position)
+        unique = list(positions)
+        
+        remaining = g.api_quota.get('remaining') if g.api_quota else None
+        if isinstance(remaining, int) and len(unique) > remaining:
+            return too_many_requests(f"Daily limit: {remaining} links left today", seconds_until_midnight())
+        
+        sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+        user = g.api_user
+        results = asyncio.Queue()
+        
+        async def on_result(index, result):
+            # index points into ``unique``; report it against the client's own positions
+            results.put_nowait((result, [
+                {'index': position, 'input': urls[position], **result}
+                for position in positions[unique[index]]
+            ]))
+        
+        # Fresh-bypass slots are shared per client (see _client_key); cache hits are streamed immediately
+        task = asyncio.create_task(bypass_service.resolve_many(
+            unique,
+            user_id=_client_key(),
+            on_result=on_result,
+            concurrency=Config.API_BATCH_CONCURRENCY
+        ))
+        task.add_done_callback(lambda _: results.put_nowait(None))
+        
+        async def generate():
+            total = succeeded = charged = 0
+            try:
+                while True:
+                    item = await results.get()
+                    if item is None:
+                        break
+                    result, events = item
+                    # Duplicates are bypassed, and charged, once
+                    charged += 1 if result.get('success') else 0
+                    for event in events:
+                        total += 1
+                        succeeded += 1 if result.get('success') else 0
+                        yield _format_event(event, 'result', sse)
+                
+                summary = {'done': True, 'total': total, 'succeeded': succeeded}
+                if task.exception():
+                    logger.error(f"API batch error: {task.exception()}")
+                    summary['error'] = str(task.exception())
+                yield _format_event(summary, 'done', sse)
+            finally:
+                # Client went away: stop bypassing for it
+                task.cancel()
+                # Charged on every exit, or reading the results and disconnecting would be free
+                await asyncio.shield(_charge(user, charged))
+        
+        response = Response(
+            generate(),
+            mimetype='text/event-stream' if sse else 'application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        # Large batches stream for longer than the default response timeout
+        response.timeout = None
+        return response
+    
+    @app.route('/api/jobs', methods=['POST'])
+    @require_api_key
+    async def api_create_job():
+        """Queue a bypass and return its job id right away"""
+        data = await request.get_json(silent=True)
+        
+        if not isinstance(data, dict) or not isinstance(data.get('url'), str):
+            return jsonify({
+                'success': False,
+                'error': 'URL is required'
+            }), 400
+        
+        callback_url = data.get('callback_url')
+        if callback_url is not None:
+            # The worker POSTs here, so it must not reach loopback, private or metadata addresses
+            error = 'callback_url must be a valid URL'
+            if isinstance(callback_url, str) and validators.url(callback_url) is True:
+                error = await check_callback_url(callback_url)
+            if error:
+                return jsonify({
+                    'success': False,
+                    'error': error
+                }), 400
+        
+        try:
+            # Charged by the worker once the bypass succeeds, like /api/bypass
+            job = await db.create_job(
+                data['url'], callback_url, client=_client_key(),
+                user_id=g.api_user['user_id'] if g.api_user else None
+            )
+            # Start it now if this process runs the worker, not at the next poll
+            job_worker.notify()
+        except Exception as e:
+            logger.error(f"Job create error: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+        
+        return jsonify({
+            'success': True,
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'status_url': f"/api/jobs/{job['job_id']}"
+        }), 202
+    
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    @require_api_key(quota=False)
+    async def api_get_job(job_id):
+        """Get the status and result of a bypass job queued by the same client"""
+        try:
+            # Other clients' jobs look the same as missing ones
+            job = await db.get_job(job_id, client=_client_key())
+        except Exception as e:
+            logger.error(f"Job status error: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+        
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        return jsonify({'success': True, **job}), 200
+    
     @app.route('/api/supported-sites', methods=['GET'])
-    def api_supported_sites():
+    async def api_supported_sites():
         """Get list of supported sites"""
         try:
             sites = bypasser.get_supported_sites()
@@ -51,14 +232,35 @@ def setup_routes(app):
                 'error': str(e)
             }), 500
     
-    @app.route('/webhook', methods=['POST'])
-    def webhook():
-        """Webhook endpoint for Telegram"""
-        # This can be used for webhook mode instead of polling
-        return jsonify({'status': 'ok'}), 200
+    @app.route('/api/stats/domains', methods=['GET'])
+    async def api_domain_stats():
+        """Per-domain latency percentiles and success rates (admin only)"""
+        if not Config.ADMIN_API_KEY or request.headers.get('X-Admin-Key') != Config.ADMIN_API_KEY:
+            return jsonify({
+                'success': False,
+                'error': 'Unauthorized'
+            }), 401
+        
+        try:
+            stats = await db.get_domain_stats(
+                domain=request.args.get('domain'),
+                hours=request.args.get('hours', 24, type=int),
+                limit=request.args.get('limit', 20, type=int)
+            )
+            return jsonify({
+                'success': True,
+                'domains': stats,
+                'count': len(stats)
+            }), 200
+        except Exception as e:
+            logger.error(f"Domain stats error: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
     
     @app.route('/docs')
-    def api_docs():
+    async def api_docs():
         """API documentation page"""
         html = '''
         <!DOCTYPE html>
@@ -140,6 +342,48 @@ def setup_routes(app):
 }</code></pre>
                 </div>
                 
+                <div class="endpoint">
+                    <span class="method post">POST</span>
+                    <strong>/api/bypass/batch</strong>
+                    <p>Bypass up to 1000 links. Results stream back as NDJSON, one line per link as it completes,
+                    or as Server-Sent Events with <code>?format=sse</code> or <code>Accept: text/event-stream</code>.
+                    The last line is a summary with <code>"done": true</code>.</p>
+                    <h4>Request Body:</h4>
+                    <pre><code>{
+    "urls": ["https://example.com/a", "https://example.com/b"]
+}</code></pre>
+                    <h4>Response Lines:</h4>
+                    <pre><code>{"index": 1, "url": "https://example.com/b", "success": true, "bypassed_url": "...", "source": "cache"}
+{"index": 0, "url": "https://example.com/a", "success": false, "error": "...", "source": "fresh"}
+{"done": true, "total": 2, "succeeded": 1}</code></pre>
+                </div>
+                
+                <div class="endpoint">
+                    <span class="method post">POST</span>
+                    <strong>/api/jobs</strong>
+                    <p>Queue a slow bypass and get a job id immediately (HTTP 202). With <code>callback_url</code>,
+                    the finished job is POSTed there as JSON.</p>
+                    <h4>Request Body:</h4>
+                    <pre><code>{
+    "url": "https://example.com/short-link",
+    "callback_url": "https://your-app.com/hooks/bypass"
+}</code></pre>
+                    <h4>Response:</h4>
+                    <pre><code>{
+    "success": true,
+    "job_id": "5f1c0e...",
+    "status": "queued",
+    "status_url": "/api/jobs/5f1c0e..."
+}</code></pre>
+                </div>
+                
+                <div class="endpoint">
+                    <span class="method get">GET</span>
+                    <strong>/api/jobs/&lt;job_id&gt;</strong>
+                    <p>Job status: <code>queued</code>, <code>running</code>, <code>done</code> or <code>failed</code>,
+                    with the bypass <code>result</code> once finished.</p>
+                </div>
+                
                 <div class="endpoint">
                     <span class="method get">GET</span>
                     <strong>/api/supported-sites</strong>
@@ -152,18 +396,27 @@ def setup_routes(app):
 }</code></pre>
                 </div>
                 
+                <div class="endpoint">
+                    <span class="method get">GET</span>
+                    <strong>/api/stats/domains?domain=&amp;hours=24</strong>
+                    <p>Per-domain p50/p95 latency and success rate. Requires the <code>X-Admin-Key</code> header.</p>
+                </div>
+                
                 <div class="endpoint">
                     <span class="method get">GET</span>
                     <strong>/health</strong>
                     <p>Health check endpoint.</p>
                 </div>
                 
-                <h2>Rate Limiting</h2>
-                <p>API endpoints are rate-limited. Please don't exceed:</p>
+                <h2>Authentication &amp; Rate Limiting</h2>
+                <p>Bypass and job endpoints need an API key, sent as <code>X-API-Key: nb_...</code> or
+                <code>Authorization: Bearer nb_...</code>. Keys are issued by the bot admins.</p>
+                <p>Each key has a burst limit, and bypasses count against its owner's daily bot quota:</p>
                 <ul>
-                    <li>Free users: 10 requests per day</li>
-                    <li>Premium users: Unlimited</li>
+                    <li>Free users: 10 links per day</li>
+                    <li>Premium users: Unlimited, with a larger burst limit</li>
                 </ul>
+                <p>Over the limit the API answers <code>429</code> with a <code>Retry-After</code> header in seconds.</p>
                 
                 <h2>Support</h2>
                 <p>For support, contact <a href="https://t.me/YourUsername">@YourUsername</a></p>
@@ -171,6 +424,6 @@ def setup_routes(app):
         </body>
         </html>
         '''
-        return render_template_string(html)
+        return await render_template_string(html)
 
-    logger.info("Flask routes registered successfully")
+    logger.info("Quart routes registered successfully")